@@ -15,12 +15,28 @@ Created on Sun Jan 11 10:16:58 2026.
 @author: Bob
 """
 
-from setuptools import setup, find_packages
+import glob
+import os
+
+from setuptools import setup
+
+# The modules import each other by name, so they are installed from
+# src as top level modules, not as a package.
+MODULES = sorted(os.path.splitext(os.path.basename(path))[0]
+                 for path in glob.glob(os.path.join('src', '*.py'))
+                 if os.path.basename(path) != '__init__.py')
 
 setup(
     name='NGS_CD_Reader',
     version='1.0.0',
-    packages=find_packages(),
+    package_dir={'': 'src'},
+    py_modules=MODULES,
+    # Batch jobs over the magazines, see ngs_batch.py, and the HTTP
+    # page server, see ngs_server.py.
+    entry_points={
+        'console_scripts': ['ngs-batch = ngs_batch:main',
+                            'ngs-server = ngs_server:main'],
+    },
     author='Robert Bumpous',
     author_email='BBFlyer1@comcast.net',
     description='''A Python package to read the first 100 years of National
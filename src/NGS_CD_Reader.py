@@ -22,14 +22,64 @@ Change Notes:
 debug and print statements removed, unnecessary modules util_print
 and util_general removed.
 
+Command line options:
+    --startup-report  print the startup times and slowest imports
+                      when the window appears.
+    --startup-check   print the time the window appeared and exit,
+                      used by util_startup.check_startup_budget.
+    --log-level LEVEL log messages of LEVEL and above to stderr,
+                      DEBUG, INFO or WARNING (the default).
+    --trace FILE      save the page turn timings as a Chrome trace
+                      file on exit, see util_trace.
+    --metrics FILE    write the read, decode and cache counters to FILE
+                      every 10 seconds, Prometheus text for a .prom
+                      file, else JSON, see util_metrics.
+    --profile         profile the CD mounts, magazine openings and
+                      page turns, save the profiles in ngs_profile/
+                      and print the slowest functions on exit, see
+                      util_profile.
+    --memory          measure the memory growth of each page turn and
+                      magazine change and count the images alive,
+                      print the report on exit, see util_memory.
+    --watchdog        log the stack of anything that blocks the window
+                      and print a histogram of the stalls on exit, see
+                      util_watchdog.
+
 Created on Sun Nov 10 10:45:23 2024.
 
 @author: R. H. Bumpous
 """
-from ngs_class import NgsApp as appl
-from util_monitors import cdrom_drawer_monitor
-from util_files import get_compile_time as gct
-from os.path import abspath
+import logging
+import sys
+
+import util_startup
+
+
+def _option(name):
+    """Return the value following name on the command line, or None."""
+    if name in sys.argv[:-1]:
+        return sys.argv[sys.argv.index(name) + 1]
+    return None
+
+
+logging.basicConfig(level=(_option('--log-level') or 'WARNING').upper(),
+                    format='%(asctime)s %(name)s %(levelname)s %(message)s')
+if '--startup-report' in sys.argv:
+    util_startup.enable_import_timer()
+
+from ngs_class import NgsApp as appl  # noqa: E402
+from util_monitors import cdrom_drawer_monitor  # noqa: E402
+from util_files import get_compile_time as gct  # noqa: E402
+from os.path import abspath  # noqa: E402
+
+util_startup.mark('imports')
+
+if '--profile' in sys.argv:
+    from util_profile import profiler
+    profiler.enabled = True
+if '--memory' in sys.argv:
+    from util_memory import probe
+    probe.start()
 
 # %% Main routine for
 
@@ -47,10 +97,36 @@ Version {version}\n\
 title = "NGS Magazines on CD"
 
 app = appl(title=title, about=about)
+util_startup.mark('window created')
+util_startup.first_window(app, check='--startup-check' in sys.argv)
 
 cdrom_monitor = cdrom_drawer_monitor(app)
 cdrom_monitor.start()
 
-app.after(100, cdrom_monitor.monitor_queue)
+metrics_file = _option('--metrics')
+if metrics_file:
+    from util_metrics import MetricsWriter
+    MetricsWriter(metrics_file, workers=app.workers)
+
+if '--watchdog' in sys.argv:
+    from util_watchdog import StallWatchdog
+    app.watchdog = StallWatchdog(app, app.workers)
+    app.watchdog.start()
 
 app.mainloop()
+
+if app.watchdog is not None:
+    print('\n'.join(app.watchdog.report()), file=sys.stderr)
+
+if '--profile' in sys.argv:
+    print('\n'.join(profiler.summary()), file=sys.stderr)
+    for path in profiler.dump('ngs_profile'):
+        print(f"Saved {path}", file=sys.stderr)
+
+if '--memory' in sys.argv:
+    print('\n'.join(probe.report()), file=sys.stderr)
+
+trace_file = _option('--trace')
+if trace_file:
+    from util_trace import tracer
+    tracer.export_chrome(trace_file)
@@ -11,14 +11,16 @@ Created on Sun Nov 10 10:29:51 2024.
 # The following is the API for this application. We only want to
 # expose the main, so someone can programatically run the app.
 # We also want to expose the NgsApp and BaseApp classes so they
-# could be extended if necessary.
+# could be extended if necessary.  MagazineLibrary is the core of the
+# reader without a display, for tools that index or read the magazines.
 
 from app_class import BaseApp
 from ngs_class import NgsApp
 from NGS_CD_Reader import main
+from util_library import MagazineLibrary, PageDecoder
 # import util_files
 # import util_monitors
 # import util_ngs
 # import util_print
 
-__all__ = ['main', 'BaseApp', 'NgsApp']
+__all__ = ['main', 'BaseApp', 'NgsApp', 'MagazineLibrary', 'PageDecoder']
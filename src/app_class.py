@@ -28,9 +28,10 @@ from tkinter import filedialog
 from tkinter import messagebox, ttk
 from tkinter import Menu
 
-import threading
 import tkinter as tk
 
+from util_workers import WorkerService
+
 
 class BaseApp(tk.Tk):
     """
@@ -58,6 +59,12 @@ class BaseApp(tk.Tk):
         self.after_idle(self.wm_attributes, '-topmost', False)
         self.geometry('400x400')
 
+        # Every background thread and pool is started through the
+        # worker service, so exit() can stop them all.
+        self.workers = WorkerService()
+        # Closing the window stops them too.
+        self.protocol("WM_DELETE_WINDOW", self.exit)
+
         # Create three frames for the base application.
         self.frame = None  # ttk.Frame(self)
         self._create_header_frame()
@@ -364,23 +371,10 @@ class BaseApp(tk.Tk):
 
     def exit(self):
         """Close all open windows and exit the application."""
-        # If we have any threads running, stop them here.
-        try:
-            for thread in threading.enumerate():
-                if thread.name == "MainThread":
-                    pass
-                else:
-                    if threading.Lock().locked():
-                        thread.release()
-                    try:
-                        thread._stop()
-                    except AssertionError as error:
-                        error = error
-                        pass
-        except NameError as error:
-            error = error
-            pass
-
+        # Ask the background threads to stop, waiting at most 0.1
+        # seconds.  Any thread still busy, for example on a slow CD,
+        # is a daemon and ends with the application.
+        self.workers.shutdown(timeout=0.1)
         self.destroy()
 
     def open_dir(self):
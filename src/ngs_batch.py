@@ -0,0 +1,684 @@
+# -*- coding: utf-8 -*-
+"""
+Batch jobs over the NGS magazines, for the command line.
+
+    ngs-batch index  SOURCE [-o ngs_index.json]
+    ngs-batch thumbs SOURCE [-o thumbs] [--size 256]
+    ngs-batch verify SOURCE [-o verify.json]
+    ngs-batch export SOURCE [-o export]
+    ngs-batch dzi    SOURCE [-o dzi] [--tile-size 254]
+    ngs-batch transcode SOURCE [-o transcoded] [--codec webp] [--quality 80]
+    ngs-batch stats  SOURCE
+
+SOURCE is a mounted NGS CD, a CD image (.iso) or a library folder of
+CD images and copied CDs, see util_library.MagazineLibrary.
+ -- index writes the magazine index and the pages of each magazine as
+    JSON,
+ -- thumbs writes a JPEG thumbnail of every page,
+ -- verify decodes every page and lists the pages that fail,
+ -- export copies every page to YEAR/FOLDER/PAGE.JPG,
+ -- dzi writes a Deep Zoom pyramid of every page, YEAR/FOLDER/PAGE.dzi
+    and its tiles, see util_dzi,
+ -- transcode writes a WebP or progressive JPEG copy of every page,
+    FOLDER/PAGE.webp, and a manifest.json of the bytes and decode time
+    saved per magazine.  The reader uses the copies when the
+    NGS_TRANSCODED environment variable names the folder, see
+    util_files.transcoded_variant.  A copy that is not smaller than
+    the page is not kept, the page itself is read instead, and
+ -- stats counts the volumes, magazines, pages and bytes.
+
+Each job runs its pages in --jobs N processes, JPEG decoding is CPU
+bound, and prints its progress, with pages/s and MB/s, to stderr.
+Finished pages are recorded in a journal next to the output, one
+journal per SOURCE, with the arguments they were made with, a job
+that is stopped and started again skips them, unless the arguments,
+such as --size, changed.
+Start over with --restart.  A page that fails is recorded in the
+journal with its error, the job goes on with the other pages and exits
+with status 1 at the end, a job started again tries it again.
+
+Created on Sat Jan 24 08:41:55 2026.
+
+@author: Bob
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+
+from util_iso import as_path, open_image
+from util_library import MagazineLibrary
+from util_workers import atomic_write
+
+
+class Progress:
+    """
+    Print the progress of a job on one line.
+
+    Parameters
+    ----------
+    label : str
+        The job name.
+    total : int
+        The number of items in the job.
+    file : file object, optional
+        Where to print.  The default is sys.stderr.
+    interval : float, optional
+        Seconds between updates.  The default is 0.5.
+    unit : str, optional
+        What the items are.  The default is 'pages'.
+    """
+
+    def __init__(self, label, total, file=None, interval=0.5,
+                 unit='pages'):
+        self.label = label
+        self.total = total
+        self.file = sys.stderr if file is None else file
+        self.interval = interval
+        self.unit = unit
+        self.done = 0
+        # Items finished by an earlier run, not counted in the rates.
+        self.skipped = 0
+        self.bytes = 0
+        self.start = time.perf_counter()
+        self._shown = 0.0
+
+    def update(self, items=1, nbytes=0):
+        """Count items and bytes finished, and print now and then."""
+        self.done += items
+        self.bytes += nbytes
+        now = time.perf_counter()
+        if now - self._shown >= self.interval or self.done >= self.total:
+            self._shown = now
+            self.file.write('\r' + self.line(now))
+            self.file.flush()
+
+    def skip(self, items):
+        """Count items finished by an earlier run."""
+        self.done += items
+        self.skipped += items
+
+    def line(self, now=None):
+        """Return the progress line."""
+        now = time.perf_counter() if now is None else now
+        seconds = max(now - self.start, 1e-9)
+        rate = (self.done - self.skipped) / seconds
+        mb_rate = self.bytes / seconds / 1e6
+        left = (self.total - self.done) / rate if rate else 0.0
+        return (f"{self.label}: {self.done}/{self.total} "
+                f"{rate:8.1f} {self.unit}/s {mb_rate:7.2f} MB/s "
+                f"eta {left:6.0f}s")
+
+    def close(self):
+        """End the progress line."""
+        self.file.write('\r' + self.line() + '\n')
+        self.file.flush()
+
+
+class Journal:
+    """
+    Record finished items, so a stopped job can be resumed.
+
+    Each line of the journal is {"key": ..., "args": [...], "result":
+    ...} as JSON, args the other arguments of the item, or {"key":
+    ..., "args": [...], "error": ...} for an item that failed.  Lines
+    are flushed as they are written, a line cut short by a crash is
+    ignored on the next start.  results and errors hold the last
+    result or error of each key.
+
+    Parameters
+    ----------
+    path : str
+        The journal file.
+    restart : bool, optional
+        Forget the items of an earlier run.  The default is False.
+    """
+
+    def __init__(self, path, restart=False):
+        self.path = path
+        self.results = {}
+        self.errors = {}
+        self._args = {}
+        if restart and os.path.exists(path):
+            os.remove(path)
+        try:
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    key = entry['key']
+                    self._args[key] = entry.get('args', [])
+                    if 'error' in entry:
+                        self.results.pop(key, None)
+                        self.errors[key] = entry['error']
+                    else:
+                        self.errors.pop(key, None)
+                        self.results[key] = entry['result']
+        except OSError:
+            pass
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def finished(self, item):
+        """Return True if item, the key and args, finished earlier."""
+        key = item[0]
+        return key in self.results and self._args[key] == list(item[1:])
+
+    def add(self, key, result, args=()):
+        """Record that key is finished with result."""
+        self.results[key] = result
+        self.errors.pop(key, None)
+        self._write({'key': key, 'args': list(args), 'result': result})
+
+    def fail(self, key, error, args=()):
+        """Record that key failed with error, a str."""
+        self.results.pop(key, None)
+        self.errors[key] = error
+        self._write({'key': key, 'args': list(args), 'error': error})
+
+    def _write(self, entry):
+        self._args[entry['key']] = entry['args']
+        self._file.write(json.dumps(entry) + '\n')
+        self._file.flush()
+
+    def close(self):
+        """Close the journal file."""
+        self._file.close()
+
+
+def open_source(source, jobs=8):
+    """
+    Return a scanned MagazineLibrary of a CD, CD image or library.
+
+    Parameters
+    ----------
+    source : str
+        A mounted NGS CD, a .iso file or a library folder.
+    jobs : int, optional
+        The number of volumes indexed at the same time.
+
+    Returns
+    -------
+    MagazineLibrary
+
+    """
+    if os.path.isfile(source):
+        open_image(source)
+        library = MagazineLibrary([], jobs=jobs, drives=False)
+    elif os.path.isdir(source):
+        library = MagazineLibrary([source], jobs=jobs, drives=False)
+    else:
+        raise FileNotFoundError(f"{source} is not a CD, image or folder.")
+    library.scan()
+    if not library.index:
+        raise ValueError(f"No NGS magazines found in {source}.")
+    return library
+
+
+def run(func, items, jobs, progress, journal):
+    """
+    Call func(*item) for each item not in the journal.
+
+    Items are run in a pool of jobs processes, or in this process when
+    jobs is 1.  func returns (key, result, bytes read), the result is
+    recorded in the journal and the bytes counted by progress.  An
+    item that raises is recorded in the journal as failed, with the
+    error, and the other items go on.
+
+    Parameters
+    ----------
+    func : function
+        A module level function, so it can be sent to a process.
+    items : list
+        Tuples of str arguments, the first is the journal key.
+    jobs : int
+        The number of processes.
+    progress : Progress
+    journal : Journal
+
+    Returns
+    -------
+    dict
+        {key: error} of the items that failed in this run.
+
+    """
+    todo = [item for item in items if not journal.finished(item)]
+    progress.skip(len(items) - len(todo))
+    errors = {}
+
+    def finish(item, call):
+        try:
+            key, result, nbytes = call()
+        except Exception as e:
+            errors[item[0]] = f"{type(e).__name__}: {e}"
+            journal.fail(item[0], errors[item[0]], item[1:])
+            progress.update(1)
+            return
+        journal.add(key, result, item[1:])
+        progress.update(1, nbytes)
+
+    if jobs <= 1:
+        for item in todo:
+            finish(item, lambda: func(*item))
+        return errors
+    from concurrent.futures import (FIRST_COMPLETED, ProcessPoolExecutor,
+                                    wait)
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        # Keep a few items per process queued, not the whole job.
+        pending = {}
+        queue = iter(todo)
+        while True:
+            for item in queue:
+                pending[pool.submit(func, *item)] = item
+                if len(pending) >= jobs * 4:
+                    break
+            if not pending:
+                break
+            for future in wait(pending, return_when=FIRST_COMPLETED).done:
+                finish(pending.pop(future), future.result)
+    return errors
+
+
+def _page_size(page):
+    """Return the size of a page in bytes."""
+    if hasattr(page, 'stat_size'):
+        return page.stat_size()
+    return page.stat().st_size
+
+
+def _list_issue(path):
+    """Return the pages of a magazine, for the index job."""
+    from util_files import build_page_list
+    pages = build_page_list(path)
+    return path, [str(p) for p in pages], 0
+
+
+def _thumb(page, dest, size):
+    """Write a thumbnail of page to dest."""
+    from PIL import Image
+    from util_files import page_source
+    p = as_path(page)
+    image = Image.open(page_source(p))
+    image.draft('RGB', (int(size), int(size)))
+    image.thumbnail((int(size), int(size)))
+    buffer = io.BytesIO()
+    image.convert('RGB').save(buffer, 'JPEG', quality=85)
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    atomic_write(dest, buffer.getvalue())
+    return page, dest, _page_size(p)
+
+
+def _verify(page):
+    """Decode page, the result is None or the error."""
+    from PIL import Image
+    from util_files import page_source
+    p = as_path(page)
+    try:
+        image = Image.open(page_source(p))
+        image.load()
+        error = None
+    except (OSError, ValueError, SyntaxError) as e:
+        error = f"{type(e).__name__}: {e}"
+    return page, error, _page_size(p)
+
+
+def _export(page, dest):
+    """Copy page to dest."""
+    p = as_path(page)
+    data = p.read_bytes()
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    atomic_write(dest, bytes(data))
+    return page, dest, len(data)
+
+
+def _dzi(page, base, tile_size):
+    """Write the Deep Zoom pyramid of page to base.dzi."""
+    from PIL import Image
+    from util_dzi import build_pyramid
+    from util_files import page_source
+    p = as_path(page)
+    image = Image.open(page_source(p))
+    tiles = build_pyramid(image, base, int(tile_size))
+    return page, tiles, _page_size(p)
+
+
+def _transcode(page, base, codec, quality):
+    """Write base.webp or base.jpg, if smaller than the page."""
+    from PIL import Image
+    p = as_path(page)
+    original = bytes(p.read_bytes())
+    start = time.perf_counter()
+    image = Image.open(io.BytesIO(original))
+    image.load()
+    original_ms = (time.perf_counter() - start) * 1e3
+    buffer = io.BytesIO()
+    if codec == 'webp':
+        ext = '.webp'
+        image.save(buffer, 'WEBP', quality=int(quality), method=4)
+    else:
+        ext = '.jpg'
+        image.convert('RGB').save(buffer, 'JPEG', quality=int(quality),
+                                  optimize=True, progressive=True)
+    data = buffer.getvalue()
+    start = time.perf_counter()
+    Image.open(io.BytesIO(data)).load()
+    transcoded_ms = (time.perf_counter() - start) * 1e3
+    kept = len(data) < len(original)
+    if kept:
+        os.makedirs(os.path.dirname(base), exist_ok=True)
+        atomic_write(base + ext, data)
+    elif os.path.exists(base + ext):
+        os.remove(base + ext)
+    return page, {'original_bytes': len(original),
+                  'transcoded_bytes': len(data) if kept else len(original),
+                  'original_ms': original_ms,
+                  'transcoded_ms': transcoded_ms if kept else original_ms,
+                  'kept': kept}, len(original)
+
+
+def _stat(page):
+    """Return the size of page."""
+    size = _page_size(as_path(page))
+    return page, size, size
+
+
+def _report(errors, label, failed):
+    """Print the items that failed and add them to failed."""
+    for key, error in errors.items():
+        print(f"ngs-batch: {label} {key}: {error}", file=sys.stderr)
+    failed.update(errors)
+
+
+def list_pages(library, jobs, journal_path, restart=False, failed=None):
+    """
+    List the pages of every magazine, in parallel and resumable.
+
+    Parameters
+    ----------
+    failed : dict, optional
+        {folder: error} of the magazines that could not be listed is
+        added to it.  They are left out of the list.
+
+    Returns
+    -------
+    list
+        (year, month, magazine folder, [pages]) in date order, paths
+        as str.
+
+    """
+    issues = [(str(path), yr, mo) for yr, mo, path in library.issues()]
+    journal = Journal(journal_path, restart)
+    progress = Progress('list', len(issues), unit='magazines')
+    try:
+        errors = run(_list_issue, [(path,) for path, yr, mo in issues],
+                     jobs, progress, journal)
+    finally:
+        journal.close()
+    progress.close()
+    _report(errors, 'list', {} if failed is None else failed)
+    return [(yr, mo, path, journal.results[path])
+            for path, yr, mo in issues if path in journal.results]
+
+
+def _dest(out, yr, path, page, suffix=None):
+    """Return out/YEAR/FOLDER/PAGE for a page of a magazine."""
+    folder = as_path(path).name
+    name = as_path(page).name
+    if suffix is not None:
+        name = os.path.splitext(name)[0] + suffix
+    return os.path.join(out, str(yr), folder, name)
+
+
+def cmd_index(args, library):
+    """Write the magazine index and page lists as JSON."""
+    issues = list_pages(library, args.jobs, args.journal, args.restart,
+                        args.failed)
+    index = {
+        'volumes': [v._asdict() for v in library.volumes],
+        'issues': [{'year': yr, 'month': mo, 'path': path, 'pages': pages}
+                   for yr, mo, path, pages in issues],
+        }
+    atomic_write(args.output, json.dumps(index, indent=1))
+    print(f"{len(issues)} magazines written to {args.output}")
+
+
+def _page_job(args, label, func, extra):
+    """Run func over every page, extra(yr, path, page) adds arguments."""
+    issues = list_pages(library=args.library, jobs=args.jobs,
+                        journal_path=args.journal + '.pages',
+                        restart=args.restart, failed=args.failed)
+    items = [(page,) + extra(yr, path, page)
+             for yr, mo, path, pages in issues for page in pages]
+    journal = Journal(args.journal, args.restart)
+    progress = Progress(label, len(items))
+    try:
+        errors = run(func, items, args.jobs, progress, journal)
+    finally:
+        journal.close()
+    progress.close()
+    _report(errors, label, args.failed)
+    # The journal may hold pages of an earlier run over other magazines.
+    return {item[0]: journal.results[item[0]] for item in items
+            if item[0] in journal.results}
+
+
+def cmd_thumbs(args, library):
+    """Write a thumbnail of every page."""
+    results = _page_job(args, 'thumbs', _thumb,
+                        lambda yr, path, page: (
+                            _dest(args.output, yr, path, page, '.jpg'),
+                            str(args.size)))
+    print(f"{len(results)} thumbnails in {args.output}")
+
+
+def cmd_verify(args, library):
+    """Decode every page and report the pages that fail."""
+    results = _page_job(args, 'verify', _verify,
+                        lambda yr, path, page: ())
+    bad = {page: error for page, error in results.items() if error}
+    atomic_write(args.output, json.dumps({'pages': len(results),
+                                          'failed': bad}, indent=1))
+    print(f"{len(results)} pages, {len(bad)} failed, see {args.output}")
+    return 1 if bad else 0
+
+
+def cmd_export(args, library):
+    """Copy every page to YEAR/FOLDER/PAGE.JPG."""
+    results = _page_job(args, 'export', _export,
+                        lambda yr, path, page: (
+                            _dest(args.output, yr, path, page),))
+    print(f"{len(results)} pages exported to {args.output}")
+
+
+def cmd_dzi(args, library):
+    """Write a Deep Zoom pyramid of every page."""
+    results = _page_job(args, 'dzi', _dzi,
+                        lambda yr, path, page: (
+                            _dest(args.output, yr, path, page, ''),
+                            str(args.tile_size)))
+    print(f"{len(results)} pyramids, {sum(results.values())} tiles in "
+          f"{args.output}")
+
+
+def codec_available(codec):
+    """Return True if PIL can write codec, 'webp' or 'jpeg'."""
+    if codec == 'jpeg':
+        return True
+    from PIL import features
+    return features.check(codec)
+
+
+def cmd_transcode(args, library):
+    """Write smaller WebP or progressive JPEG copies of the pages."""
+    if not codec_available(args.codec):
+        print(f"ngs-batch: this PIL can not write {args.codec}, the "
+              f"original pages will be used.", file=sys.stderr)
+        return 1
+    issues = {}
+    for yr, mo, path in library.issues():
+        issues[str(path)] = as_path(path).name
+    results = _page_job(args, 'transcode', _transcode,
+                        lambda yr, path, page: (
+                            os.path.join(args.output, as_path(path).name,
+                                         as_path(page).stem),
+                            args.codec, str(args.quality)))
+    # Total the savings per magazine folder.
+    manifest = {}
+    for page, result in results.items():
+        folder = os.path.basename(os.path.dirname(page.split('::')[-1]))
+        totals = manifest.setdefault(folder, {
+            'pages': 0, 'kept': 0, 'original_bytes': 0,
+            'transcoded_bytes': 0, 'original_ms': 0.0,
+            'transcoded_ms': 0.0})
+        totals['pages'] += 1
+        totals['kept'] += result['kept']
+        for key in ('original_bytes', 'transcoded_bytes', 'original_ms',
+                    'transcoded_ms'):
+            totals[key] += result[key]
+    for totals in manifest.values():
+        totals['original_ms'] = round(totals['original_ms'], 2)
+        totals['transcoded_ms'] = round(totals['transcoded_ms'], 2)
+        totals['bytes_saved_pct'] = round(
+            100 * (1 - totals['transcoded_bytes']
+                   / max(1, totals['original_bytes'])), 1)
+        totals['decode_saved_pct'] = round(
+            100 * (1 - totals['transcoded_ms']
+                   / max(1e-9, totals['original_ms'])), 1)
+    original = sum(t['original_bytes'] for t in manifest.values())
+    transcoded = sum(t['transcoded_bytes'] for t in manifest.values())
+    os.makedirs(args.output, exist_ok=True)
+    atomic_write(os.path.join(args.output, 'manifest.json'), json.dumps({
+        'codec': args.codec, 'quality': args.quality,
+        'original_bytes': original, 'transcoded_bytes': transcoded,
+        'issues': dict(sorted(manifest.items()))}, indent=1))
+    print(f"{len(results)} pages, {original / 1e6:.1f} MB -> "
+          f"{transcoded / 1e6:.1f} MB, manifest in "
+          f"{os.path.join(args.output, 'manifest.json')}")
+    print(f"Set NGS_TRANSCODED={os.path.abspath(args.output)} to read the "
+          f"copies.")
+
+
+def cmd_stats(args, library):
+    """Print the number of volumes, magazines, pages and bytes."""
+    results = _page_job(args, 'stats', _stat, lambda yr, path, page: ())
+    total = sum(results.values())
+    decades = {}
+    for yr, mo, path in library.issues():
+        decade = f"{str(yr)[:3]}0s"
+        decades[decade] = decades.get(decade, 0) + 1
+    print(f"volumes:   {len(library.volumes)}")
+    for v in library.volumes:
+        print(f"  {v.label:<16} {v.kind:<7} {v.images_path}")
+    print(f"magazines: {sum(decades.values())}")
+    for decade, count in decades.items():
+        print(f"  {decade}  {count}")
+    print(f"pages:     {len(results)}")
+    print(f"bytes:     {total} ({total / 1e6:.1f} MB)")
+    if results:
+        print(f"mean page: {total / len(results) / 1e3:.1f} kB")
+
+
+def journal_path(command, source, output):
+    """
+    Return the default journal of a job.
+
+    The journal is named after the source, so jobs over two sources
+    with the same output, or two stats jobs in one folder, do not
+    share a journal.
+
+    Parameters
+    ----------
+    command : str
+        The job, 'thumbs', 'stats' and so on.
+    source : str
+        The CD, CD image or library folder of the job.
+    output : str
+        The output of the job, None for stats.
+
+    Returns
+    -------
+    str
+        The journal file, in the output folder of the jobs that write
+        a folder, next to the output file of the others and in the
+        working directory for stats.
+
+    """
+    digest = hashlib.sha1(os.path.abspath(source).encode()).hexdigest()[:12]
+    if command in ('thumbs', 'export', 'dzi', 'transcode'):
+        return os.path.join(output, f'.ngs-batch-{digest}.journal')
+    if command == 'stats':
+        return f'.ngs-batch-stats-{digest}.journal'
+    return f'{output}.{digest}.journal'
+
+
+def main(argv=None):
+    """Run the ngs-batch command line."""
+    parser = argparse.ArgumentParser(
+        prog='ngs-batch',
+        description="Batch jobs over NGS magazine CDs, CD images and "
+                    "libraries.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    defaults = {'index': 'ngs_index.json', 'thumbs': 'thumbs',
+                'verify': 'verify.json', 'export': 'export',
+                'dzi': 'dzi', 'transcode': 'transcoded', 'stats': None}
+    for name, func in (('index', cmd_index), ('thumbs', cmd_thumbs),
+                       ('verify', cmd_verify), ('export', cmd_export),
+                       ('dzi', cmd_dzi), ('transcode', cmd_transcode),
+                       ('stats', cmd_stats)):
+        sub = commands.add_parser(name, help=func.__doc__)
+        sub.set_defaults(func=func)
+        sub.add_argument('source',
+                         help="a mounted NGS CD, a .iso image or a "
+                              "library folder")
+        sub.add_argument('--jobs', '-j', type=int,
+                         default=os.cpu_count() or 1,
+                         help="number of processes (default: all CPUs)")
+        sub.add_argument('--restart', action='store_true',
+                         help="ignore the journal of an earlier run")
+        sub.add_argument('--journal',
+                         help="the journal file (default: next to the "
+                              "output)")
+        if defaults[name] is not None:
+            sub.add_argument('--output', '-o', default=defaults[name],
+                             help=f"output (default: {defaults[name]})")
+        if name == 'thumbs':
+            sub.add_argument('--size', type=int, default=256,
+                             help="largest side in pixels (default: 256)")
+        if name == 'transcode':
+            sub.add_argument('--codec', choices=['webp', 'jpeg'],
+                             default='webp',
+                             help="webp, or jpeg for progressive JPEG "
+                                  "(default: webp)")
+            sub.add_argument('--quality', type=int, default=80,
+                             help="encoder quality (default: 80)")
+        if name == 'dzi':
+            sub.add_argument('--tile-size', type=int, default=254,
+                             help="tile size without the overlap "
+                                  "(default: 254)")
+    args = parser.parse_args(argv)
+    if args.journal is None:
+        args.journal = journal_path(args.command, args.source,
+                                    getattr(args, 'output', None))
+    try:
+        args.library = open_source(args.source, args.jobs)
+    except (OSError, ValueError) as e:
+        print(f"ngs-batch: {e}", file=sys.stderr)
+        return 2
+    # {key: error} of the magazines and pages that failed.
+    args.failed = {}
+    status = args.func(args, args.library) or 0
+    if args.failed:
+        print(f"ngs-batch: {len(args.failed)} failed, they are tried "
+              f"again when the job is started again", file=sys.stderr)
+        return status or 1
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
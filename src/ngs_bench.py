@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks of the reader's file and decode paths on a fake NGS CD.
+
+    python ngs_bench.py [-o results.json] [--fixture DIR] [--iso]
+                        [--compare OLD.json]
+
+A fake CD is made with ngs_fixture, or an existing CD or fixture is
+given with --fixture, and these are timed:
+ -- build_magazine_index   indexing the IMAGES folder,
+ -- decode_dir_name        decoding one magazine folder name,
+ -- build_page_list        listing the pages of one magazine,
+ -- decode                 reading and decoding one page, and
+ -- page_turn / page_turn_prefetch
+                           turning through a magazine as the reader
+                           does, through MagazineLibrary, without and
+                           with the next pages prefetched.  The time
+                           of each turn is what the user waits for, the
+                           time spent reading the page is not counted.
+Each benchmark reports the count, min, median, p95 and mean seconds.
+The results are saved as JSON with the machine and fixture details so
+runs can be compared, --compare prints the change against an earlier
+result.
+
+Created on Wed Jan 28 13:37:20 2026.
+
+@author: Bob
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+from pathlib import Path
+
+import ngs_fixture
+from util_files import (build_magazine_index, build_page_list,
+                        decode_dir_name, load_page)
+
+
+def summarize(samples):
+    """Return n, min, median, p95 and mean of samples in seconds."""
+    ordered = sorted(samples)
+    return {'n': len(ordered), 'min': ordered[0],
+            'median': statistics.median(ordered),
+            'p95': ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))],
+            'mean': statistics.fmean(ordered),
+            'samples': ordered}
+
+
+def timed(func, *args, repeat=5):
+    """Return the seconds of repeat calls of func(*args)."""
+    samples = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_index(images, date_range, repeat=20):
+    """Time build_magazine_index of the whole IMAGES folder."""
+    return timed(build_magazine_index, images, date_range, repeat=repeat)
+
+
+def bench_decode_dir_name(folders, repeat=5):
+    """Time decode_dir_name of each magazine folder."""
+    samples = []
+    for i in range(repeat):
+        for folder in folders:
+            start = time.perf_counter()
+            decode_dir_name(folder)
+            samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_page_list(folders, repeat=3):
+    """Time build_page_list of each magazine."""
+    samples = []
+    for i in range(repeat):
+        for folder in folders:
+            samples.extend(timed(build_page_list, folder, repeat=1))
+    return samples
+
+
+def bench_decode(pages, count=40):
+    """Time load_page, read and decode, of count pages."""
+    samples = []
+    for page in pages[:count]:
+        samples.extend(timed(load_page, page, repeat=1))
+    return samples
+
+
+def bench_page_turn(source, prefetch, turns=40, think=0.05):
+    """
+    Time turning through a magazine with the library, as the reader does.
+
+    Parameters
+    ----------
+    source : str
+        The fake CD folder or image.
+    prefetch : bool
+        Prefetch the next two pages after each turn, as NgsApp does.
+    turns : int, optional
+        The pages turned.  The default is 40.
+    think : float, optional
+        Seconds the user looks at each page, the time prefetching
+        has.  The default is 0.05.
+
+    """
+    from ngs_batch import open_source
+    from util_io import PageIOEngine
+
+    library = open_source(source)
+    library.engine = PageIOEngine()
+    try:
+        year, month, path = next(library.issues())
+        pages = library.page_list(path)
+        samples = []
+        for i in range(min(turns, len(pages))):
+            start = time.perf_counter()
+            library.decode(pages[i])
+            samples.append(time.perf_counter() - start)
+            if prefetch:
+                for page in pages[i + 1:i + 3]:
+                    library.prefetch(page)
+            time.sleep(think)
+    finally:
+        library.engine.close()
+    return samples
+
+
+def run(source, quick=False):
+    """
+    Run every benchmark on a CD folder, image or fixture.
+
+    Returns
+    -------
+    dict
+        {benchmark: summary}, see summarize.
+
+    """
+    from util_iso import as_path, open_image
+    if os.path.isfile(source):
+        label = open_image(source).label
+        images = f"{os.path.abspath(source)}::/IMAGES"
+    else:
+        label = os.path.basename(os.path.abspath(source))
+        images = os.path.join(source, 'IMAGES')
+    date_range = label.split('_')[1:3]
+    folders = sorted(child for child in as_path(images).iterdir()
+                     if child.is_dir())
+    pages = build_page_list(folders[0])
+    scale = 0.2 if quick else 1.0
+    results = {
+        'build_magazine_index': bench_index(images, date_range,
+                                            max(3, int(20 * scale))),
+        'decode_dir_name': bench_decode_dir_name(folders,
+                                                 max(1, int(5 * scale))),
+        'build_page_list': bench_page_list(folders, max(1, int(3 * scale))),
+        'decode': bench_decode(pages, max(5, int(40 * scale))),
+        'page_turn': bench_page_turn(source, False, max(5, int(40 * scale))),
+        'page_turn_prefetch': bench_page_turn(source, True,
+                                              max(5, int(40 * scale))),
+        }
+    return {name: summarize(samples) for name, samples in results.items()}
+
+
+def compare(new, old):
+    """Return lines comparing the medians of two result files."""
+    lines = [f"{'benchmark':<22} {'old ms':>10} {'new ms':>10} {'change':>8}"]
+    for name, result in new['results'].items():
+        before = old['results'].get(name)
+        if before is None:
+            continue
+        change = result['median'] / before['median'] - 1
+        lines.append(f"{name:<22} {before['median'] * 1e3:10.3f} "
+                     f"{result['median'] * 1e3:10.3f} {change:+8.1%}")
+    return lines
+
+
+def main(argv=None):
+    """Run the benchmarks from the command line."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark the NGS reader on a fake CD.")
+    parser.add_argument('--output', '-o', default='ngs_bench.json',
+                        help="the results file (default: ngs_bench.json)")
+    parser.add_argument('--fixture',
+                        help="a CD folder, .iso or fixture to use instead "
+                             "of a new fake CD")
+    parser.add_argument('--iso', action='store_true',
+                        help="benchmark the fake CD as a .iso image")
+    parser.add_argument('--years', type=int, nargs=2, default=[1973, 1976],
+                        metavar=('FIRST', 'LAST'))
+    parser.add_argument('--pages', type=int, default=100,
+                        help="pages per magazine of the fake CD")
+    parser.add_argument('--quick', action='store_true',
+                        help="fewer repeats, for a smoke test")
+    parser.add_argument('--compare', metavar='OLD',
+                        help="print the change against an earlier result")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix='ngs-bench-') as tmp:
+        fixture = {'source': args.fixture}
+        source = args.fixture
+        if source is None:
+            fixture = {'years': args.years, 'pages': args.pages,
+                       'iso': args.iso}
+            source = ngs_fixture.make_disc(tmp, args.years[0],
+                                           args.years[1], pages=args.pages,
+                                           iso=args.iso)
+        results = run(source, args.quick)
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'fixture': fixture,
+        'results': results,
+        }
+    Path(args.output).write_text(json.dumps(report, indent=1))
+    print(f"{'benchmark':<22} {'n':>5} {'median ms':>10} {'p95 ms':>10}")
+    for name, result in results.items():
+        print(f"{name:<22} {result['n']:5d} {result['median'] * 1e3:10.3f} "
+              f"{result['p95'] * 1e3:10.3f}")
+    print(f"Saved to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+        print('\n'.join(compare(report, old)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
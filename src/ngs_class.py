@@ -8,18 +8,30 @@ the needs of a National Geographic Society CD Magazine Reader.
 @author: R. H. Bumpous
 """
 # from pathlib import Path
-import pathlib
+import logging
+import time
 import tkinter as tk
-from tkinter import ttk
+from tkinter import filedialog, messagebox, ttk
 
 from app_class import BaseApp
-from util_files import (build_magazine_index, build_page_list,
-                        decode_dir_name, get_image, get_directory,
-                        _clear_frame)
-from util_ngs import get_first_mo_yr
+from util_cancel import Cancelled, Generations
+from util_files import decode_dir_name, show_page, _clear_frame
+from util_io import PageIOEngine
+from util_memory import probe
+from util_iso import as_path, open_image, open_images
+from util_library import MagazineLibrary
+from util_monitors import LIBRARY_CHANGED, TkDispatcher
+from util_ngs import get_first_mo_yr, group_by_decade, sorted_months
+from util_session import (find_issue, load_session, save_session,
+                          saved_page)
+from util_palette import IssueSearchIndex, QuickJumpPalette, find_page
+from util_profile import profiler
+from util_trace import STAGES, tracer
 from util_mov import (play_intro_1, play_intro_2, play_intro_3,
                       play_intro_4, play_credits)
 
+log = logging.getLogger(__name__)
+
 
 class NgsApp(BaseApp):
     """Application to display National Geographic Magazines from a CD.
@@ -41,8 +53,12 @@ class NgsApp(BaseApp):
         if menus is None:
             # Note: This is a NGS specific menu.  We will add the
             # current CD's Year range as top level menus later.
-            menus = {'File': {'Exit': self.exit_with_credits},
+            menus = {'File': {'Open CD Image...': self.open_cd_image,
+                              'Go To...  Ctrl+K': self.quick_jump,
+                              'Exit': self.exit_with_credits},
                      "Help": {'Help Index': self._not_implemented,
+                              'Page Timings  F12': self.toggle_trace_overlay,
+                              'Export Trace...': self.export_trace,
                               'About': self.about
                               },
                      'NGS Movies': {
@@ -57,10 +73,35 @@ class NgsApp(BaseApp):
         # Note: the above menu will be extended with a menu
         # of years and months if a NGS CD is loaded.
 
+        # Decade and year menus are created once and reused when the
+        # CD changes.  The generation tells the lazily filled menus
+        # when the magazine index they were built from is stale.
+        self._decade_menus = {}
+        self._year_menus = {}
+        self._decade_years = {}
+        self._posted_decades = []
+        self._menu_generation = 0
+        self.mag_mo_yr_indx = {}
+        self.issue_search = IssueSearchIndex({})
+        # Seconds spent indexing the CD and updating the menus, one
+        # entry per CD change.
+        self.menu_build_times = []
+        self.library_scan_time = 0.0
+
         # Initialize the BaseApp class.
         super(NgsApp,
               self).__init__(menus, title, about)
 
+        # All the NGS volumes, CDs, images and library folders.
+        # Page reads are queued per device, the shown page first.
+        self.library = MagazineLibrary(
+            workers=self.workers, engine=PageIOEngine(self.workers))
+        # Worker threads hand their results to the main loop through
+        # the dispatcher.
+        self.dispatcher = TkDispatcher(self)
+        # Volume and magazine changes cancel work on the old ones.
+        self.generations = Generations()
+
         # Play the NGS Credits movie when closing app.
         # Default is no.
         self.play_credits = False
@@ -82,10 +123,28 @@ class NgsApp(BaseApp):
         self._update_btns = self.SetButtonsState(self.fwd_btn,
                                                  self.back_btn,
                                                  self.valid)
+        # Ctrl+K opens the quick-jump palette.  Bound on the main
+        # window, so it does not fire in the palette, its own window.
+        self._palette = None
+        self.bind('<Control-k>', self.quick_jump)
+        self.bind('<Control-K>', self.quick_jump)
+        # F12 shows the page turn timings.
+        self._trace_overlay = None
+        self.bind_all('<F12>', self.toggle_trace_overlay)
+        # A util_watchdog.StallWatchdog, started with --watchdog.
+        self.watchdog = None
 
         # Update the display based on whether there is a NGS CD in the
-        # CDROM drive.
+        # CDROM drive.  The drive monitor looks for it in the
+        # background, until then show the page saved on the last exit,
+        # or tell the user we are reading.
         self.CD = True
+        self.page_list = []
+        self.issue_path = ''
+        self.page_image = None
+        self._restored = None
+        if not self._restore_session():
+            self._cd_message(self.reading_message, fg='darkgreen')
         # self._update_display()  # Temporarily remove this from __init__
         # self.process_results(None)
 
@@ -96,10 +155,64 @@ class NgsApp(BaseApp):
         self.after_idle(self.attributes, '-topmost', False)
         self._bring_to_top_focus()
 
+    def exit(self):
+        """Save the session, then close the application."""
+        if self.CD and self.page_list and self.mag_mo_yr_indx:
+            try:
+                save_session(self.mag_mo_yr_indx, self.current_year,
+                             self.current_month, self.valid.page,
+                             self.issue_path,
+                             [v.label for v in self.library.volumes],
+                             self.page_image)
+            except (OSError, ValueError):
+                # Never keep the user from exiting, the next start
+                # just begins at the first magazine.
+                pass
+        # Results still coming from worker threads are dropped.
+        self.dispatcher.close()
+        super().exit()
+
+    def _restore_session(self):
+        """
+        Show the page and menus saved on the last exit.
+
+        The saved magazine is not readable until the drive monitor has
+        found its volume, so the buttons stay disabled.  _library_ready
+        then reopens the magazine from the volume, or the first
+        magazine if the volume has changed.
+
+        Returns
+        -------
+        bool
+            True if a saved page is shown.
+
+        """
+        session = load_session()
+        if session is None or session['rendition'] is None:
+            return False
+        try:
+            from PIL import Image
+            page = Image.open(session['rendition'])
+            page.load()
+        except (OSError, ValueError):
+            return False
+        self._restored = session
+        self.current_year = session['year']
+        self.current_month = session['month']
+        self._build_NGS_menus(session['index'])
+        show_page(self.body, page)
+        self.valid.pages = session['page']
+        self.valid.page = session['page']
+        text = f"{session['month']} {session['year']}"
+        self.mon_yr_lbl.config(text=text, width=len(text)+2)
+        self.fwd_btn.config(state='disabled')
+        self.back_btn.config(state='disabled')
+        return True
+
     def exit_with_credits(self):
         """Play the NGS Credits movie before exiting the app."""
         if self.play_credits:
-            print('Exiting the NGS application.')
+            log.info('Exiting the NGS application.')
             u_mov.play_credits()
         self.exit()
 
@@ -233,48 +346,167 @@ class NgsApp(BaseApp):
         # self.footer.config(width=400, height=10)
         self.footer.grid(column=0, row=2)
 
-    def _build_NGS_menus(self, ng_base_path, ng_date_range,
-                         after=False):
+    def _build_NGS_menus(self, mag_mo_yr_indx):
         """Define the NGS menus and items.
 
-        Adds year menus and month sub-menus based on the specific NGS
-        CD in the CD reader.
+        Adds decade menus, with year sub-menus and month items, based on
+        the magazine index of the library.  The decade menus are
+        created once and reused when the CD changes.  The year and
+        month entries are only filled in, from the magazine index, when
+        the user opens the menu (Tk postcommand), so the cost of a CD
+        change does not grow with the number of years in the library.
         """
-        # Get a dictionary of dictionaries that contains the years
-        # and months of each magazine folder on this disk and
+        start = time.perf_counter()
+        # A dictionary of dictionaries that contains the years
+        # and months of each magazine folder in the library and
         # the folder that contains that magazine.
-        self.mag_mo_yr_indx = build_magazine_index(ng_base_path,
-                                                   ng_date_range)
+        self.mag_mo_yr_indx = mag_mo_yr_indx
+        self.issue_search = IssueSearchIndex(self.mag_mo_yr_indx)
+        indexed = time.perf_counter()
+        # A new index invalidates the contents of every lazy menu.
+        self._menu_generation += 1
+        self._post_decade_menus(group_by_decade(self.mag_mo_yr_indx))
+        done = time.perf_counter()
+        self.menu_build_times.append({'index': indexed - start,
+                                      'menus': done - indexed})
+
+    def _post_decade_menus(self, decades):
+        """
+        Show the decade menus for decades and hide all other decades.
+
+        Parameters
+        ----------
+        decades : dict
+            Decade labels and their years, from util_ngs.group_by_decade.
+
+        Returns
+        -------
+        None.
+
+        """
         menu_bar = self.menubar
-        # Create the main menu and add it to the root window
-        # if after = False ie, there are no other menus
-        if after:
-            # When after = True, we will add to menubar
-            ngs_menu = tk.Menu(menu_bar)
-            self.config(menu=ngs_menu)  # menu_bar
-        else:
-            ngs_menu = tk.Menu(self)
-            self.config(menu=ngs_menu)
-
-        # The top level menu will be the year from the CD
-        # the menu_items are the months of magazine folders on this CD.
-
-        for menu_label, menu_items in self.mag_mo_yr_indx.items():
-            menu = tk.Menu(ngs_menu, tearoff=0)
-            # Add the years as top level menu columns.
-            if after:
-                menu_bar.insert_cascade(menu_bar.index("Help"),
-                                        label=menu_label, menu=menu)
-            else:
-                ngs_menu.add_cascade(label=menu_label, menu=menu)
-            # var = tk.StringVar()
-            # now for each month in the year located on this CD,
-            # create a cascaded menu item.
-            for item_label, file_path in menu_items.items():
-                title = f"{menu_label} {item_label} {file_path}"
-                menu.add_command(label=item_label,
-                                 command=lambda x=title:
-                                 self._change_magazine(x))
+        for label in list(self._posted_decades):
+            if label not in decades:
+                menu_bar.delete(menu_bar.index(label))
+                self._posted_decades.remove(label)
+        self._decade_years = decades
+        for label in decades:
+            if label in self._posted_decades:
+                continue
+            menu = self._decade_menus.get(label)
+            if menu is None:
+                menu = tk.Menu(menu_bar, tearoff=0)
+                menu.config(postcommand=lambda d=label:
+                            self._fill_decade_menu(d))
+                menu.generation = -1
+                self._decade_menus[label] = menu
+            # Keep the decades in chronological order before 'Help'.
+            position = menu_bar.index("Help")
+            for posted in self._posted_decades:
+                if posted > label:
+                    position = min(position, menu_bar.index(posted))
+            menu_bar.insert_cascade(position, label=label, menu=menu)
+            self._posted_decades.append(label)
+
+    def _fill_decade_menu(self, label):
+        """Fill a decade menu with the years of the current index."""
+        menu = self._decade_menus[label]
+        if menu.generation == self._menu_generation:
+            return
+        menu.delete(0, 'end')
+        for yr in self._decade_years.get(label, []):
+            yr_menu = self._year_menus.get(yr)
+            if yr_menu is None:
+                yr_menu = tk.Menu(menu, tearoff=0)
+                yr_menu.config(postcommand=lambda y=yr:
+                               self._fill_year_menu(y))
+                yr_menu.generation = -1
+                self._year_menus[yr] = yr_menu
+            menu.add_cascade(label=yr, menu=yr_menu)
+        menu.generation = self._menu_generation
+
+    def _fill_year_menu(self, yr):
+        """Fill a year menu with the months of the current index."""
+        menu = self._year_menus[yr]
+        if menu.generation == self._menu_generation:
+            return
+        menu.delete(0, 'end')
+        menu_items = self.mag_mo_yr_indx.get(yr, {})
+        # now for each month in the year located on this CD,
+        # create a menu item.
+        for item_label in sorted_months(menu_items):
+            title = f"{yr} {item_label} {menu_items[item_label]}"
+            menu.add_command(label=item_label,
+                             command=lambda x=title:
+                             self._change_magazine(x))
+        menu.generation = self._menu_generation
+
+    def open_cd_image(self):
+        """
+        Open a NGS CD image file (.iso) and show its first magazine.
+
+        The image is read directly, it does not have to be mounted.
+
+        Returns
+        -------
+        None.
+
+        """
+        path = filedialog.askopenfilename(
+            title="Open NGS CD Image",
+            filetypes=[("CD images", "*.iso *.ISO"), ("All files", "*.*")])
+        if not path:
+            return
+        try:
+            image = open_image(path)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Not a CD image", f"{e}")
+            return
+        if "NGS" not in image.label:
+            messagebox.showerror("Not a NGS CD image",
+                                 f"{path} is labeled '{image.label}'.")
+            return
+        self.process_results(True)
+
+    def quick_jump(self, event=None):
+        """Open the quick-jump palette to go to a magazine and page."""
+        if self._palette is not None and self._palette.winfo_exists():
+            # Only one palette, bring the open one back.
+            self._palette.lift()
+            self._palette.entry.focus_set()
+            return
+        if not self.CD or not self.issue_search.issues:
+            return
+        self._palette = QuickJumpPalette(self, self.issue_search,
+                                         self._jump_to_issue)
+
+    def _jump_to_issue(self, year, month, path, page=None):
+        """
+        Open a magazine selected in the quick-jump palette.
+
+        Parameters
+        ----------
+        year : int
+            The year of the magazine.
+        month : str
+            The month of the magazine.
+        path : Path
+            The folder containing the magazine pages.
+        page : int, optional
+            The NGS page number to open.  The default, None, opens the
+            cover.
+
+        Returns
+        -------
+        None.
+
+        """
+        self._change_magazine(f"{year} {month} {path}")
+        if page is not None:
+            i = find_page(self.page_list, page)
+            if i is not None:
+                self.valid.page = i
+                self.change_page()
 
     def _file_action(self, path):
         """
@@ -290,7 +522,7 @@ class NgsApp(BaseApp):
             self.__init__()
         else:
             # "year month filepath"
-            child = pathlib.Path(path)
+            child = as_path(path)
             # year, month, file_path = arg.split(" ")
             self.current_year, self.current_month, \
                 file_path = decode_dir_name(child)
@@ -314,8 +546,60 @@ class NgsApp(BaseApp):
 
         d1 = self.mag_mo_yr_indx[self.current_year]
         m_path = d1[self.current_month]
-        arg = f"{self.current_year} {self.current_month} {m_path}"
-        self._change_magazine(arg)
+        self._open_issue(self.current_year, self.current_month, m_path)
+
+    def _open_issue(self, year, month, path, page=0):
+        """List the pages and decode a page in the background."""
+        self.current_year, self.current_month = year, month
+        self.generations.new_issue()
+        token = self.generations.token()
+        self.workers.spawn(self._load_issue, year, month, path, page,
+                           token, name='issue loader')
+
+    def _load_issue(self, year, month, path, page, token):
+        """
+        Read a magazine's page list and a page in a worker thread.
+
+        The result is handed to _issue_ready on the Tk thread, unless
+        the magazine or volume changed in the meantime.
+        """
+        try:
+            with profiler.action('issue_open'):
+                page_list = self.library.page_list(path, token)
+                page = min(page, len(page_list) - 1)
+                image = (self.library.decode(page_list[page], token)
+                         if page_list else None)
+        except (Cancelled, OSError):
+            return
+        self.dispatcher.post(self._issue_ready, year, month, path,
+                             page_list, page, image, token=token)
+
+    def _issue_ready(self, year, month, path, page_list, page, image):
+        """Show a magazine read by _load_issue."""
+        self._set_issue(year, month, path, page_list)
+        if image is None:
+            return
+        self.valid.page = page
+        with profiler.action('issue_open', start=False), \
+                probe.around('issue_switch'):
+            show_page(self.body, image)
+        self.page_image = image
+        self._update_btns.state()
+        self._prefetch()
+
+    def _set_issue(self, year, month, path, page_list):
+        """Make page_list the current magazine, at its cover."""
+        self.issue_path = path
+        self.page_list = page_list
+
+        # Validate pages and page.
+        self.valid.pages = (len(self.page_list)-1)
+        self.valid.page = 0
+        self.pages_lbl.config(text=f" of {self.valid.pages}")
+
+        # Update magazine month and year display.
+        text = f"{month} {year}"
+        self.mon_yr_lbl.config(text=text, width=len(text)+2)
 
     def _change_magazine(self, arg):
         """
@@ -332,18 +616,20 @@ class NgsApp(BaseApp):
 
         """
         # print("_change_magazine:", end="")
-        year, month, file_path = arg.split(" ")
-
-        self.page_list = build_page_list(file_path)
+        # The path may contain spaces, the year and month do not.
+        year, month, file_path = arg.split(" ", 2)
 
-        # Validate pages and page.
-        self.valid.pages = (len(self.page_list)-1)
-        self.valid.page = 0
-        self.pages_lbl.config(text=f" of {self.valid.pages}")
-
-        # Update magazine month and year display.
-        text = f"{month} {year}"
-        self.mon_yr_lbl.config(text=text, width=len(text)+2)
+        # Work still reading the old magazine is no longer wanted.
+        self.generations.new_issue()
+        token = self.generations.token()
+        try:
+            page_list = self.library.page_list(file_path, token)
+        except (Cancelled, OSError):
+            # The menus restored from the last session may name a
+            # volume that is not there.
+            return
+        self.current_year, self.current_month = year, month
+        self._set_issue(year, month, file_path, page_list)
 
         # Change to page image.
         self.change_page()
@@ -365,7 +651,7 @@ class NgsApp(BaseApp):
         None.
 
         """
-        print("backward:", end="")
+        log.debug("backward")
         if self.valid.page > 0:
             self.valid.page -= 1
             self.change_page()
@@ -386,7 +672,7 @@ class NgsApp(BaseApp):
         None.
 
         """
-        print("forward:", end="")
+        log.debug("forward")
         if self.valid.page < self.valid.pages:
             self.valid.page += 1
             self.change_page()
@@ -400,10 +686,72 @@ class NgsApp(BaseApp):
 
     def change_page(self):
         """Load a new page set by the calling routine."""
-        print("    get_image{}".format(self.valid.page))
-        get_image(self.body, self.page_list, self.valid.page)
+        log.debug("change_page %d", self.valid.page)
+        token = self.generations.token()
+        with tracer.span('page_turn', page=self.valid.page), \
+                profiler.action('page_turn'), probe.around('page_turn'):
+            try:
+                page = self.library.decode(self.page_list[self.valid.page],
+                                           token)
+            except Cancelled:
+                return
+            show_page(self.body, page)
+        self.page_image = page
+        self._prefetch()
         # Class in init to update button states.
         self._update_btns.state()
+        self._update_trace_overlay()
+
+    def toggle_trace_overlay(self, event=None):
+        """Show or hide the page turn timings over the page."""
+        if self._trace_overlay is not None:
+            self._trace_overlay.destroy()
+            self._trace_overlay = None
+            return
+        self._trace_overlay = tk.Label(self, justify='left', anchor='nw',
+                                       font=('Courier', 9), bg='black',
+                                       fg='lime')
+        self._trace_overlay.place(relx=1.0, x=-4, y=4, anchor='ne')
+        self._update_trace_overlay()
+
+    def _update_trace_overlay(self):
+        """Show the p50 and p95 of each page turn stage in the overlay."""
+        if self._trace_overlay is None:
+            return
+        stats = tracer.stage_stats()
+        lines = [f"{'stage':<11}{'n':>5}{'p50 ms':>8}{'p95 ms':>8}"]
+        for stage in STAGES:
+            if stage in stats:
+                n, p50, p95 = stats[stage]
+                lines.append(f"{stage:<11}{n:5d}{p50 * 1e3:8.1f}"
+                             f"{p95 * 1e3:8.1f}")
+        if len(lines) == 1:
+            lines.append("Turn a page to time it.")
+        if self.watchdog is not None:
+            lines.append(f"stalls {sum(self.watchdog.histogram[2:]):d} "
+                         f"of 250 ms or more")
+        self._trace_overlay.config(text='\n'.join(lines))
+        self._trace_overlay.lift()
+
+    def export_trace(self):
+        """Save the page turn spans as a Chrome trace file."""
+        path = filedialog.asksaveasfilename(
+            parent=self, title='Export Trace', defaultextension='.json',
+            initialfile='ngs_trace.json',
+            filetypes=[('Chrome trace', '*.json'), ('All files', '*')])
+        if not path:
+            return
+        try:
+            tracer.export_chrome(path)
+        except OSError as e:
+            messagebox.showerror('Export Trace', str(e), parent=self)
+
+    def _prefetch(self, ahead=2):
+        """Read the next pages in the background, ready to turn to."""
+        token = self.generations.token()
+        last = min(self.valid.page + ahead, len(self.page_list) - 1)
+        for i in range(self.valid.page + 1, last + 1):
+            self.library.prefetch(self.page_list[i], token)
 
     def get_user_page(self, x):
         """
@@ -436,11 +784,10 @@ class NgsApp(BaseApp):
 
         """
         pg = int(self.page_entry.get())
-        print("get_user_page: ", pg, end="")
+        log.debug("get_user_page %d", pg)
         # Only accept valid page numbers.
         if pg < self.valid.pages and pg >= 0:
             self.valid.page = pg
-            print("get_valid_page: {}".format(self.valid.page))
             self.change_page()
         else:
             self.page_entry.delete(0, "end")   # remove everything
@@ -489,12 +836,21 @@ class NgsApp(BaseApp):
 
     def process_results(self, results=None):
         """Update the CDROM drawer status."""
+        if results == LIBRARY_CHANGED:
+            # Another NGS volume came or went, the CD read stays.
+            self._library_changed()
+            return
+        if results is not None:
+            # A volume came or went, stop work on the old volumes.
+            self.generations.new_volume()
         if results is None:
             pass
         elif results:
             self.CD = True
         else:
-            self.CD = False
+            # Open CD images and library folders are still readable
+            # without a CD.
+            self.CD = bool(open_images() or self.library.roots)
         self._update_display()
 
     def _update_display(self):
@@ -502,31 +858,112 @@ class NgsApp(BaseApp):
         # Check if CDROM drawer is closed and has NGS CD.
         if self.CD:
             self._has_cd()
-            date_rng = f"{self.ng_date_range[0]} to {self.ng_date_range[1]}"
-            self.title(f"{self.original_title}  {date_rng}")
-
         else:
             self._no_cd()
             self.title(f"{self.original_title}")
 
     def _has_cd(self):
-        """Upsate the display if we have a NGS CD in the CDROM drive."""
-        self.ng_base_path, self.ng_date_range = get_directory()
-        # change the menu bar to the original menu.
-        # On initialization, the super builds this menu, so
-        # we do not have to do it again. on changes of CD, the open
-        # CD drawer should have built this.
-        # if "File" not in self.menubar.keys():
-        self.menubar = self._build_menus(self, self.menus)
-
-        # building the NGS Menu.
-        # self._build_NGS_menus(self.ng_base_path, self.ng_date_range, True)
-        # and add in the year and month menus.
-        self._build_NGS_menus(self.ng_base_path, self.ng_date_range, True)
-        self.config(menu=self.menubar)
-        # Now initialize to the first magazine on the CD.
+        """Upsate the display if we have a NGS CD in the CDROM drive.
+
+        Every NGS volume that can be seen, CDs, CD images and library
+        folders, is indexed together, so the menus cover all of them.
+        The volumes are read in a worker thread, the window shows a
+        reading message until _library_ready is called.
+        """
+        if self._restored is None:
+            self._cd_message(self.reading_message, fg='darkgreen')
+        self.workers.spawn(self._scan_library,
+                           self.generations.token('volume'),
+                           name='library scan')
+
+    def _scan_library(self, token):
+        """Index the library in a worker thread."""
+        start = time.perf_counter()
+        try:
+            with profiler.action('mount'):
+                self.library.scan(token)
+        except Cancelled:
+            return
+        self.dispatcher.post(self._library_ready,
+                             time.perf_counter() - start, token=token)
+
+    def _library_ready(self, scan_time):
+        """Show the library indexed by _scan_library."""
+        with profiler.action('mount', start=False):
+            self._show_library(scan_time)
+
+    def _show_library(self, scan_time):
+        """Build the menus of the library and open a magazine."""
+        self.library_scan_time = scan_time
+        self.ng_base_path = self.library.base_path()
+        self.ng_date_range = self.library.date_range
+        if not self.library.index:
+            # The CD went away, or holds no magazines.
+            self.CD = False
+            self._no_cd()
+            self.title(f"{self.original_title}")
+            return
+        date_rng = f"{self.ng_date_range[0]} to {self.ng_date_range[1]}"
+        self.title(f"{self.original_title}  {date_rng}")
+        session, self._restored = self._restored, None
+        if session is not None:
+            # Reconcile the page restored from the last session with
+            # the volumes actually found.
+            path = find_issue(self.library.index, session['year'],
+                              session['month'])
+            if path is not None:
+                self._build_NGS_menus(self.library.index)
+                self._open_issue(session['year'], session['month'], path,
+                                 saved_page(session, self.library.sources))
+                return
+        # The base menus are built once by BaseApp and reused, only
+        # the decade menus change between CDs.
+        self._build_NGS_menus(self.library.index)
+        # Now initialize to the first magazine in the library.
         self._initial_magazine()
 
+    def _library_changed(self):
+        """Index the library again, in the background, keeping the page."""
+        self.workers.spawn(self._rescan_library,
+                           self.generations.token('volume'),
+                           name='library scan')
+
+    def _rescan_library(self, token):
+        """Index the library again in a worker thread."""
+        try:
+            with profiler.action('mount'):
+                self.library.scan(token)
+        except Cancelled:
+            return
+        self.dispatcher.post(self._library_rescanned, token=token)
+
+    def _library_rescanned(self):
+        """
+        Rebuild the menus after _rescan_library.
+
+        The magazine shown stays open, at its page, while it is still
+        in the library, from any volume.  If its volume went away the
+        first magazine of the library is opened.
+        """
+        self.ng_base_path = self.library.base_path()
+        self.ng_date_range = self.library.date_range
+        if not self.library.index:
+            self.CD = False
+            self._no_cd()
+            self.title(f"{self.original_title}")
+            return
+        date_rng = f"{self.ng_date_range[0]} to {self.ng_date_range[1]}"
+        self.title(f"{self.original_title}  {date_rng}")
+        self._build_NGS_menus(self.library.index)
+        path = find_issue(self.library.index, self.current_year,
+                          self.current_month)
+        if path is None:
+            self._initial_magazine()
+        elif str(path) != str(self.issue_path):
+            # The same magazine, now read from another volume.
+            self._open_issue(self.current_year, self.current_month, path,
+                             self.valid.page)
+
     def _no_cd(self):
         """
         If no NGS CD is in the drive, post a message.
@@ -536,10 +973,11 @@ class NgsApp(BaseApp):
         None.
 
         """
-        # When the CDROM drawer is opened, remove the NGS menu.
-        self.menubar = self._build_menus(self, self.menus)
+        # When the CDROM drawer is opened, remove the NGS menus.
+        self._restored = None
+        self._post_decade_menus({})
+        self._menu_generation += 1
         # and post the No NGS Message.
-        self.config(menu=self.menubar)
         self.pages_lbl.config(text="")
         # Set the page numbers to 0 and disable both buttons.
         # self._update_page_no(-1, self.back_btn)
@@ -549,13 +987,27 @@ class NgsApp(BaseApp):
         self.mon_yr_lbl.config(text="", width=10)
         self._cd_message()
 
-    def _cd_message(self):
+    reading_message = """
+
+
+        Reading disc...
+
+        Remember CDROM drives are mechanical and slow!"""
+
+    def _cd_message(self, message=None, fg='red'):
         """
         Display a No NGC CD message to the user.
 
         Clear the image from the body frame and put in a text
         message that says we don't have a NGS CD.'
 
+        Parameters
+        ----------
+        message : str, optional
+            Another message to show instead, such as reading_message.
+        fg : str, optional
+            The text color.  The default is 'red'.
+
         Returns
         -------
         None.
@@ -563,7 +1015,8 @@ class NgsApp(BaseApp):
         """
         # Remove the existing image from the body frame.
         _clear_frame(self.body)  # from util_files
-        message = """
+        if message is None:
+            message = """
 
 
         No National Geographic CD mounted
@@ -573,7 +1026,7 @@ class NgsApp(BaseApp):
         Remember CDROM drives are mechanical and slow!"""
 
         document = self.build_text_frame(self.body)
-        document.config(bg='lightyellow', fg='red',
+        document.config(bg='lightyellow', fg=fg,
                         font=('calibre', 12, 'bold'))
         # Clear any old messages from the document frame.
         document.delete(1.0, 'end')  # probably not needed.
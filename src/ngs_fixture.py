@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Make fake NGS CDs, to benchmark and try the reader without the CDs.
+
+A fake CD is laid out like the real ones, see README.md:
+    NGS_1973_1976/              the volume label
+        IMAGES/273A/            one folder per magazine, ###L
+            273AC01A.JPG        the cover
+            273A001A.JPG        advertisements end in A ...
+            273A0001.JPG        pages, numbered through the year
+            273A002Z.JPG        ... or in Z
+        INTRO/INTRO01.MOV ... INTRO04.MOV
+        EXIT/EXIT01.MOV         movie stubs, not playable.
+The page JPEGs are a few noisy templates of the requested size,
+encoded once and copied, so a large fake library is quick to make and
+still decodes like real scans.  The CD can also be written as a .iso
+image.
+
+    python ngs_fixture.py OUT --years 1973 1976 --pages 100 [--iso]
+
+Created on Wed Jan 28 10:04:51 2026.
+
+@author: Bob
+"""
+import argparse
+import io
+import os
+import sys
+
+# The month letters of the magazine folders, A is January.
+MONTH_LETTERS = 'ABCDEFGHIJKL'
+MOVIES = {'INTRO': ['INTRO01.MOV', 'INTRO02.MOV', 'INTRO03.MOV',
+                    'INTRO04.MOV'],
+          'EXIT': ['EXIT01.MOV']}
+
+
+def folder_name(year, month):
+    """Return the magazine folder name, 273L for December 1973."""
+    century = '1' if year < 1900 else '2'
+    return f"{century}{year % 100:02d}{MONTH_LETTERS[month - 1]}"
+
+
+def _templates(size, count, quality, seed):
+    """Return count different page JPEGs of size."""
+    from PIL import Image, ImageDraw, ImageFilter
+    import random
+
+    rng = random.Random(seed)
+    pages = []
+    for i in range(count):
+        image = Image.effect_noise(size, 40 + 10 * i).convert('RGB')
+        image = image.filter(ImageFilter.GaussianBlur(1.5))
+        draw = ImageDraw.Draw(image)
+        # Columns of "text" and a picture, so the JPEG is not all noise.
+        for n in range(rng.randint(8, 20)):
+            x = rng.randrange(size[0])
+            y = rng.randrange(size[1])
+            draw.rectangle([x, y, x + rng.randint(40, 300),
+                            y + rng.randint(4, 200)],
+                           fill=tuple(rng.randrange(256) for c in 'rgb'))
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', quality=quality)
+        pages.append(buffer.getvalue())
+    return pages
+
+
+def make_disc(out, first_year=1973, last_year=1976, months=12, pages=100,
+              ads=8, size=(1100, 1500), quality=75, iso=False, seed=0):
+    """
+    Write a fake NGS CD.
+
+    Parameters
+    ----------
+    out : str
+        The folder the CD is written in.
+    first_year, last_year : int, optional
+        The years of the CD.  The defaults are 1973 and 1976.
+    months : int, optional
+        The magazines per year, from January.  The default is 12.
+    pages : int, optional
+        The numbered pages of each magazine.  The default is 100.
+    ads : int, optional
+        The advertisement pages of each magazine.  The default is 8.
+    size : tuple, optional
+        The page size in pixels.  The default is (1100, 1500).
+    quality : int, optional
+        The JPEG quality of the pages.  The default is 75.
+    iso : bool, optional
+        Also write the CD as LABEL.iso in out.  The default is False.
+    seed : int, optional
+        The random seed of the page templates.
+
+    Returns
+    -------
+    str
+        The CD folder, out/NGS_FIRST_LAST, or the .iso file with iso.
+
+    """
+    label = f"NGS_{first_year}_{last_year}"
+    root = os.path.join(out, label)
+    templates = _templates(tuple(size), 4, quality, seed)
+    count = 0
+    for year in range(first_year, last_year + 1):
+        # NGS numbers the pages through the year.
+        number = 1
+        for month in range(1, months + 1):
+            folder = folder_name(year, month)
+            path = os.path.join(root, 'IMAGES', folder)
+            os.makedirs(path, exist_ok=True)
+            names = [f"{folder}C01A"]
+            names += [f"{folder}{i:03d}A" for i in range(1, ads // 2 + 1)]
+            names += [f"{folder}{n:04d}" for n in range(number,
+                                                        number + pages)]
+            names += [f"{folder}{i:03d}Z"
+                      for i in range(1, ads - ads // 2 + 1)]
+            number += pages
+            for name in names:
+                with open(os.path.join(path, name + '.JPG'), 'wb') as f:
+                    f.write(templates[count % len(templates)])
+                count += 1
+    for folder, files in MOVIES.items():
+        os.makedirs(os.path.join(root, folder), exist_ok=True)
+        for name in files:
+            with open(os.path.join(root, folder, name), 'wb') as f:
+                # A QuickTime file starts with an atom, this is only
+                # its header.
+                f.write(b'\x00\x00\x00\x08free')
+    if iso:
+        from util_iso import write_iso
+        image = os.path.join(out, label + '.iso')
+        write_iso(root, image, label)
+        return image
+    return root
+
+
+def main(argv=None):
+    """Write a fake NGS CD from the command line."""
+    parser = argparse.ArgumentParser(
+        description="Write a fake NGS CD for benchmarks.")
+    parser.add_argument('out', help="the folder to write the CD in")
+    parser.add_argument('--years', type=int, nargs=2, default=[1973, 1976],
+                        metavar=('FIRST', 'LAST'))
+    parser.add_argument('--months', type=int, default=12)
+    parser.add_argument('--pages', type=int, default=100)
+    parser.add_argument('--ads', type=int, default=8)
+    parser.add_argument('--size', type=int, nargs=2, default=[1100, 1500],
+                        metavar=('WIDTH', 'HEIGHT'))
+    parser.add_argument('--iso', action='store_true',
+                        help="also write a .iso image of the CD")
+    args = parser.parse_args(argv)
+    path = make_disc(args.out, args.years[0], args.years[1], args.months,
+                     args.pages, args.ads, args.size, iso=args.iso)
+    print(path)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,370 @@
+# -*- coding: utf-8 -*-
+"""
+A performance regression gate for the reader's file and decode paths.
+
+    python ngs_perfgate.py [--baseline FILE] [--update] [--tolerance 0.20]
+                           [--runs 5]
+
+The hot paths of util_files and util_ngs are run on fake CDs of fixed
+sizes, made with ngs_fixture:
+ -- build_magazine_index   indexing the IMAGES folder of 48 magazines,
+ -- build_page_list        listing the pages of each magazine,
+ -- decode_dir_name        decoding each magazine folder name,
+ -- group_by_decade        grouping the index into the decade menus,
+ -- decode_WxH             reading and decoding pages of W x H pixels.
+Each one is timed in --runs fresh Python processes, one after the
+other, in another order each run.  A sample is a loop of calls that
+takes at least MIN_SAMPLE seconds, so the operations of a few
+microseconds are not lost in the timer's noise, and a run gives the
+median time per call of its samples.  The runs differ more than the
+samples of one run, by hash seeds, memory layout and what else the
+machine is doing, so the run medians are what is compared.  Between
+the operations a fixed reference workload is timed, and each run
+median is divided by the run's reference time, so a run slowed down
+by the machine as a whole is not taken for a slower operation.  Each
+operation is also run once under tracemalloc for the peak memory it
+allocates from Python.
+
+--update saves the results as the baseline, by default
+perf_baseline.json next to this file.  Without it the results are
+compared with the baseline:
+ -- time, the ratio of the median of the new run medians to the
+    median of the baseline run medians, both divided by the
+    reference time of their run, with a 95% bootstrap
+    confidence interval.  An operation is slower when the whole
+    interval is above 1 + tolerance, so noise between processes on a
+    busy machine does not fail the gate, a real slow down does.
+ -- memory, the peak allocation may grow by alloc-tolerance plus 4 KB.
+A table of every operation is printed, and the exit status is 1 if
+one is slower or allocates more, 2 if there is no baseline.
+
+The baseline is only meaningful on the machine it was made on.  The
+perf_baseline.json in the repository was made on the machine the
+tests run on, and tests/test_perfgate.py runs the gate against it
+with --slow.  On another machine record a baseline of the unchanged
+code first, then compare the changed code with it:
+
+    python ngs_perfgate.py --update     # before the change
+    python ngs_perfgate.py              # after it
+
+The gate warns if the machine differs from the baseline's.
+
+Created on Sun Feb  1 10:22:45 2026.
+
+@author: Bob
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+import ngs_bench
+import ngs_fixture
+from util_files import (build_magazine_index, build_page_list,
+                        decode_dir_name, load_page)
+from util_ngs import group_by_decade
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'perf_baseline.json')
+# The fake CDs, changing them makes a new baseline necessary.
+FIXTURE = {'years': (1973, 1976), 'pages': 60, 'size': (1100, 1500)}
+DECODE_SIZES = ((550, 750), (1100, 1500), (2200, 3000))
+# Slack of the memory comparison, for the allocator's noise.
+ALLOC_SLACK = 4096
+# The shortest sample, in seconds, shorter operations are looped.
+MIN_SAMPLE = 0.005
+# The samples of each operation per run.
+REPEAT = 10
+
+
+def peak_allocation(func, *args):
+    """Return the peak bytes allocated by func(*args), from Python."""
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        func(*args)
+        return tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+
+
+def _fixtures(tmp):
+    """Make the fake CDs, return the IMAGES folder and the decode pages."""
+    first, last = FIXTURE['years']
+    root = ngs_fixture.make_disc(tmp, first, last, pages=FIXTURE['pages'],
+                                 size=FIXTURE['size'])
+    pages = {}
+    for size in DECODE_SIZES:
+        name = f"decode_{size[0]}x{size[1]}"
+        disc = ngs_fixture.make_disc(os.path.join(tmp, name), 1980, 1980,
+                                     months=1, pages=4, ads=0, size=size)
+        folder = os.path.join(disc, 'IMAGES',
+                              ngs_fixture.folder_name(1980, 1))
+        pages[name] = [str(page) for page in build_page_list(folder)]
+    return os.path.join(root, 'IMAGES'), pages
+
+
+def _operations(images, pages):
+    """Return {name: (func, args)} of the fake CDs made by _fixtures."""
+    first, last = FIXTURE['years']
+    date_range = [str(first), str(last)]
+    folders = sorted(child for child in Path(images).iterdir()
+                     if child.is_dir())
+    index = build_magazine_index(images, date_range)
+
+    def list_all():
+        for folder in folders:
+            build_page_list(folder)
+
+    def decode_all():
+        for folder in folders:
+            decode_dir_name(folder)
+
+    def decode_pages(pages):
+        for page in pages:
+            load_page(Path(page))
+
+    operations = {
+        'build_magazine_index': (build_magazine_index, (images, date_range)),
+        'build_page_list': (list_all, ()),
+        'decode_dir_name': (decode_all, ()),
+        'group_by_decade': (group_by_decade, (index,)),
+        }
+    for name, files in pages.items():
+        operations[name] = (decode_pages, (files,))
+    return operations
+
+
+def _reference():
+    """A fixed workload, to tell how fast the machine is in this run."""
+    return sorted(str(i * 7919 % 10007) for i in range(5000))
+
+
+def _loops(func, *args):
+    """Return the calls of func(*args) that take at least MIN_SAMPLE."""
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for i in range(loops):
+            func(*args)
+        seconds = time.perf_counter() - start
+        if seconds >= MIN_SAMPLE:
+            return loops
+        loops = max(loops * 2, math.ceil(loops * MIN_SAMPLE
+                                         / max(seconds, 1e-9)))
+
+
+def timed_loops(func, *args, repeat=REPEAT):
+    """
+    Return repeat samples of the seconds per call of func(*args).
+
+    Each sample times a loop of calls of at least MIN_SAMPLE seconds.
+    """
+    loops = _loops(func, *args)
+    samples = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        for j in range(loops):
+            func(*args)
+        samples.append((time.perf_counter() - start) / loops)
+    return samples
+
+
+def _run(images, pages, first):
+    """
+    Time every operation in this process, starting at number first.
+
+    Returns
+    -------
+    dict
+        {name: samples}, the seconds per call, with the samples of the
+        reference workload as None.
+
+    """
+    operations = list(_operations(images, pages).items())
+    first %= len(operations)
+    samples = {None: []}
+    for name, (func, args) in operations[first:] + operations[:first]:
+        # A first run warms the file system cache and imports.
+        func(*args)
+        samples[name] = timed_loops(func, *args)
+        samples[None] += timed_loops(_reference, repeat=3)
+    return samples
+
+
+def measure(runs=5):
+    """
+    Time every operation in runs processes and measure its allocation.
+
+    Returns
+    -------
+    dict
+        {name: summary}, see ngs_bench.summarize, of the samples of all
+        runs, with runs, the median of each run, reference, the median
+        reference time of each run, and peak_bytes.
+
+    """
+    context = get_context('spawn')
+    by_run = []
+    with tempfile.TemporaryDirectory(prefix='ngs-perfgate-') as tmp:
+        images, pages = _fixtures(tmp)
+        for run in range(runs):
+            # A new process each run, so the gate sees the variation
+            # between processes, not only between the samples of one.
+            with ProcessPoolExecutor(1, mp_context=context) as pool:
+                by_run.append(pool.submit(_run, images, pages, run).result())
+        results = {}
+        for name, (func, args) in _operations(images, pages).items():
+            samples = [sample for run in by_run for sample in run[name]]
+            result = ngs_bench.summarize(samples)
+            result['runs'] = [statistics.median(run[name])
+                              for run in by_run]
+            result['reference'] = [statistics.median(run[None])
+                                   for run in by_run]
+            result['peak_bytes'] = peak_allocation(func, *args)
+            results[name] = result
+    return results
+
+
+def median_ratio_interval(new, old, rounds=2000, seed=0):
+    """
+    Return the 95% bootstrap interval of median(new) / median(old).
+
+    Both sample lists are resampled with replacement, rounds times.
+    """
+    rng = random.Random(seed)
+    ratios = sorted(
+        statistics.median(rng.choices(new, k=len(new)))
+        / statistics.median(rng.choices(old, k=len(old)))
+        for i in range(rounds))
+    return ratios[int(0.025 * rounds)], ratios[int(0.975 * rounds) - 1]
+
+
+def _relative(result):
+    """Return the run medians divided by the reference time of the run."""
+    return [run / reference
+            for run, reference in zip(result['runs'], result['reference'])]
+
+
+def compare(results, baseline, tolerance=0.20, alloc_tolerance=0.05):
+    """
+    Compare results with a baseline.
+
+    Returns
+    -------
+    tuple
+        (lines, failures), the table as lines of text and the names of
+        the operations that regressed.
+
+    """
+    lines = [f"{'operation':<22} {'base ms':>9} {'new ms':>9} "
+             f"{'change':>8} {'95% interval':>17} {'base KB':>9} "
+             f"{'new KB':>9}  verdict"]
+    failures = []
+    for name, result in results.items():
+        old = baseline['results'].get(name)
+        if old is None:
+            lines.append(f"{name:<22} {'':>9} "
+                         f"{statistics.median(result['runs']) * 1e3:9.3f} "
+                         f"{'':>8} {'':>17} "
+                         f"{'':>9} {result['peak_bytes'] / 1024:9.1f}  new")
+            continue
+        new_runs = _relative(result)
+        old_runs = _relative(old)
+        low, high = median_ratio_interval(new_runs, old_runs)
+        change = (statistics.median(new_runs)
+                  / statistics.median(old_runs) - 1)
+        verdicts = []
+        if low > 1 + tolerance:
+            verdicts.append('SLOWER')
+        elif high < 1 - tolerance:
+            verdicts.append('faster')
+        limit = old['peak_bytes'] * (1 + alloc_tolerance) + ALLOC_SLACK
+        if result['peak_bytes'] > limit:
+            verdicts.append('ALLOCATES MORE')
+        if any(v.isupper() for v in verdicts):
+            failures.append(name)
+        lines.append(f"{name:<22} "
+                     f"{statistics.median(old['runs']) * 1e3:9.3f} "
+                     f"{statistics.median(result['runs']) * 1e3:9.3f} "
+                     f"{change:+8.1%} "
+                     f"{low - 1:+8.1%}..{high - 1:+7.1%} "
+                     f"{old['peak_bytes'] / 1024:9.1f} "
+                     f"{result['peak_bytes'] / 1024:9.1f}  "
+                     f"{', '.join(verdicts) or 'ok'}")
+    return lines, failures
+
+
+def _machine():
+    return {'python': platform.python_version(),
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'cpus': os.cpu_count()}
+
+
+def main(argv=None):
+    """Run the gate from the command line."""
+    parser = argparse.ArgumentParser(
+        description="Fail if the reader's hot paths got slower.")
+    parser.add_argument('--baseline', default=BASELINE,
+                        help="the baseline file (default: "
+                             "perf_baseline.json next to this file)")
+    parser.add_argument('--update', action='store_true',
+                        help="save the results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=0.20,
+                        help="the slow down allowed, 0.20 is 20%%")
+    parser.add_argument('--alloc-tolerance', type=float, default=0.05,
+                        help="the allocation growth allowed")
+    parser.add_argument('--runs', type=int, default=5,
+                        help="the processes the operations are timed in "
+                             "(default: 5)")
+    args = parser.parse_args(argv)
+
+    results = measure(args.runs)
+    if args.update:
+        from util_workers import atomic_write
+        atomic_write(args.baseline, json.dumps({
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            **_machine(), 'fixture': FIXTURE, 'results': results},
+            indent=1))
+        print(f"Saved the baseline to {args.baseline}")
+        return 0
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        print(f"No baseline {args.baseline}, make one with --update",
+              file=sys.stderr)
+        return 2
+    if any('reference' not in old for old in baseline['results'].values()):
+        print(f"The baseline {args.baseline} has no runs, make it again "
+              f"with --update", file=sys.stderr)
+        return 2
+    machine = _machine()
+    if any(baseline.get(key) != value for key, value in machine.items()):
+        print(f"Warning: the baseline was made on another machine, "
+              f"{baseline.get('platform')}.", file=sys.stderr)
+    lines, failures = compare(results, baseline, args.tolerance,
+                              args.alloc_tolerance)
+    print('\n'.join(lines))
+    if failures:
+        print(f"\nRegressed: {', '.join(failures)}")
+        return 1
+    print("\nNo regressions.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,652 @@
+# -*- coding: utf-8 -*-
+"""
+Serve the NGS magazines over HTTP, to read them from other machines.
+
+    ngs-server serve SOURCE [--port 8080] [--workers 8] [--cache-mb 64]
+    ngs-server bench SOURCE [--clients 16] [--requests 2000]
+
+SOURCE is a mounted NGS CD, a CD image (.iso) or a library folder, as
+for ngs-batch.  The server answers:
+    /index.json                     the volumes and magazines,
+    /issues/YEAR/MONTH.json         the pages of a magazine,
+    /pages/YEAR/MONTH/PAGE.jpg      a page JPEG as on the CD, and
+    /pages/YEAR/MONTH/PAGE.jpg?width=W
+                                    a rendition W pixels wide, W from 1
+                                    to 4096, else 400 Bad Request, and
+                                    with
+                                    --dzi, the Deep Zoom pyramids
+                                    written by ngs-batch dzi,
+    /dzi/YEAR/MONTH/PAGE.dzi        a page's descriptor and
+    /dzi/YEAR/MONTH/PAGE_files/LEVEL/COL_ROW.jpg
+                                    its tiles, each one file read, and
+    /metrics, /metrics.json         the read, decode, cache and request
+                                    counters, see util_metrics.
+MONTH is 1 to 12 and PAGE is 0 for the cover.  Every answer has an
+ETag and a Last-Modified header, and a conditional GET of an unchanged
+resource is answered with 304 Not Modified.  Page JPEGs support byte
+ranges.
+
+Requests are handled by a bounded pool of worker threads, so a crowd
+of clients can not start a thread each.  --metrics-file also writes the
+counters to a file every 10 seconds.  Decoded pages and encoded
+renditions are kept in caches shared by all clients, a rendition that
+one reader asked for is not made again for the next one.
+
+bench starts a server on a free local port and measures it with
+concurrent clients.
+
+Created on Sun Jan 25 10:17:29 2026.
+
+@author: Bob
+"""
+import argparse
+import email.utils
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from ngs_batch import open_source
+from util_iso import IsoPath, as_path
+from util_metrics import MetricsWriter, metrics
+from util_ngs import month_number
+
+
+class RenditionCache:
+    """
+    Resized JPEG renditions of pages, shared by every client.
+
+    The cache is bounded by the bytes of the encoded renditions.  When
+    several clients ask for the same rendition at once, it is made
+    once and the others wait for it.
+
+    Parameters
+    ----------
+    library : util_library.MagazineLibrary
+        Decodes the pages, with its own cache of decoded pages.
+    max_bytes : int, optional
+        The size of the cache.  The default is 64 MB.
+    quality : int, optional
+        The JPEG quality of the renditions.  The default is 85.
+    """
+
+    def __init__(self, library, max_bytes=64 * 2**20, quality=85):
+        self.library = library
+        self.max_bytes = max_bytes
+        self.quality = quality
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._making = {}
+        self._lock = threading.Lock()
+
+    def get(self, page, width):
+        """Return the JPEG data of page resized to width pixels."""
+        key = (str(page), width)
+        while True:
+            with self._lock:
+                data = self._cache.get(key)
+                if data is not None:
+                    self._cache.move_to_end(key)
+                    self.hits += 1
+                    return data
+                done = self._making.get(key)
+                if done is None:
+                    self.misses += 1
+                    done = self._making[key] = threading.Event()
+                    break
+            # Another client is making it.
+            done.wait()
+        try:
+            data = self._make(page, width)
+            with self._lock:
+                self._cache[key] = data
+                self.bytes += len(data)
+                while self.bytes > self.max_bytes and len(self._cache) > 1:
+                    old_key, old = self._cache.popitem(last=False)
+                    self.bytes -= len(old)
+        finally:
+            with self._lock:
+                del self._making[key]
+            done.set()
+        return data
+
+    def _make(self, page, width):
+        from PIL import Image
+        image = self.library.decode(page)
+        if width < image.width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.LANCZOS)
+        buffer = io.BytesIO()
+        image.convert('RGB').save(buffer, 'JPEG', quality=self.quality,
+                                  optimize=True)
+        return buffer.getvalue()
+
+
+class PoolHTTPServer(HTTPServer):
+    """
+    An HTTPServer that handles connections in a bounded thread pool.
+
+    Connections beyond the pool size wait in the pool queue.  Idle
+    keep-alive connections are closed after the handler timeout, so
+    they do not hold a worker for long.
+    """
+
+    def __init__(self, address, handler, workers=8):
+        super().__init__(address, handler)
+        from concurrent.futures import ThreadPoolExecutor
+        self.pool = ThreadPoolExecutor(max_workers=workers,
+                                       thread_name_prefix='http')
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+class PageRequestHandler(BaseHTTPRequestHandler):
+    """Answer the requests of one connection, see the module docstring."""
+
+    protocol_version = 'HTTP/1.1'
+    # Send the headers and the body at once.  With Nagle's algorithm
+    # the body waits for the ACK of the headers, which the client
+    # delays, 40 ms a request on a keep-alive connection.
+    disable_nagle_algorithm = True
+    # Seconds an idle keep-alive connection holds a worker.
+    timeout = 5
+    server_version = 'ngs-server/1.0'
+
+    def log_request(self, code='-', size='-'):
+        metrics.inc('ngs_http_requests_total',
+                    status=str(getattr(code, 'value', code)))
+        super().log_request(code, size)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_HEAD(self):
+        self.do_GET(body=False)
+
+    def do_GET(self, body=True):
+        url = urlsplit(self.path)
+        parts = [p for p in url.path.split('/') if p]
+        query = parse_qs(url.query)
+        try:
+            if parts == ['index.json']:
+                self._send_index(body)
+            elif parts in (['metrics'], ['metrics.json']):
+                self._send_metrics(parts[0], body)
+            elif len(parts) == 3 and parts[0] == 'issues':
+                self._send_issue(parts[1], parts[2], body)
+            elif len(parts) == 4 and parts[0] == 'pages':
+                self._send_page(parts[1], parts[2], parts[3], query, body)
+            elif parts[0] == 'dzi' and self.server.dzi is not None:
+                self._send_dzi(parts[1:], body)
+            else:
+                self.send_error(404)
+        except (KeyError, IndexError, ValueError):
+            self.send_error(404)
+        except OSError as e:
+            # A page that can not be read from the CD.
+            self.send_error(503, explain=str(e))
+
+    # Resources.
+
+    def _send_index(self, body):
+        server = self.server
+        self._send(server.index_data, 'application/json',
+                   server.index_etag, server.started, body)
+
+    def _send_metrics(self, name, body):
+        # The counters change all the time, they are not cached.
+        if name == 'metrics':
+            data = metrics.prometheus_text().encode()
+            content_type = 'text/plain; version=0.0.4; charset=utf-8'
+        else:
+            data = json.dumps(metrics.snapshot()).encode()
+            content_type = 'application/json'
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        if body:
+            self.wfile.write(data)
+
+    def _send_issue(self, year, name, body):
+        month = int(name.removesuffix('.json'))
+        path, pages = self._issue(year, month)
+        data = json.dumps({
+            'year': year,
+            'month': self.server.months[str(path)],
+            'pages': [f"/pages/{year}/{month}/{i}.jpg"
+                      for i in range(len(pages))],
+            }).encode()
+        self._send(data, 'application/json', _etag(data),
+                   self.server.started, body)
+
+    def _send_page(self, year, month, name, query, body):
+        path, pages = self._issue(year, month)
+        number = int(name.removesuffix('.jpg'))
+        if number < 0:
+            raise IndexError(number)
+        page = pages[number]
+        width = query.get('width')
+        if width:
+            try:
+                width = int(width[0])
+            except ValueError:
+                width = 0
+            if not 0 < width <= 4096:
+                self.send_error(400, explain="width must be 1 to 4096")
+                return
+        modified = _modified(page)
+        if width:
+            etag = _etag(f"{page}|{modified}|{width}".encode())
+            if self._not_modified(etag, modified):
+                return
+            data = self.server.renditions.get(page, width)
+            self._send(data, 'image/jpeg', etag, modified, body,
+                       checked=True)
+        else:
+            etag = _etag(f"{page}|{modified}".encode())
+            if self._not_modified(etag, modified):
+                return
+            data = self.server.library.page_bytes(page)
+            self._send(data, 'image/jpeg', etag, modified, body,
+                       checked=True, ranges=True)
+
+    def _send_dzi(self, parts, body):
+        """Send a Deep Zoom descriptor or tile from the dzi folder."""
+        year, month, name = parts[:3]
+        path, pages = self._issue(year, month)
+        if len(parts) == 3 and name.endswith('.dzi'):
+            suffix = '.dzi'
+            number = name.removesuffix('.dzi')
+            content_type = 'application/xml'
+        elif (len(parts) == 5 and name.endswith('_files')
+              and parts[3].isdigit() and _TILE.fullmatch(parts[4])):
+            suffix = f"_files/{parts[3]}/{parts[4]}"
+            number = name.removesuffix('_files')
+            content_type = 'image/jpeg'
+        else:
+            raise ValueError(parts)
+        if not number.isdigit():
+            raise ValueError(number)
+        page = as_path(pages[int(number)])
+        file = os.path.join(self.server.dzi, year, as_path(path).name,
+                            page.stem + suffix)
+        try:
+            stat = os.stat(file)
+        except FileNotFoundError:
+            raise KeyError(file) from None
+        etag = _etag(f"{file}|{stat.st_mtime_ns}|{stat.st_size}".encode())
+        if self._not_modified(etag, stat.st_mtime):
+            return
+        with open(file, 'rb') as f:
+            data = f.read()
+        self._send(data, content_type, etag, stat.st_mtime, body,
+                   checked=True)
+
+    def _issue(self, year, month):
+        path = self.server.issues[(year, int(month))]
+        return path, self.server.library.page_list(path)
+
+    # HTTP.
+
+    def _not_modified(self, etag, modified):
+        """Answer 304 if the client's copy is current."""
+        match = self.headers.get('If-None-Match')
+        if match is not None:
+            current = match.strip() == '*' or etag in [
+                m.strip().removeprefix('W/') for m in match.split(',')]
+        else:
+            since = self.headers.get('If-Modified-Since')
+            try:
+                since = email.utils.parsedate_to_datetime(since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            current = int(modified) <= since
+        if current:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Last-Modified',
+                             email.utils.formatdate(modified, usegmt=True))
+            self.end_headers()
+        return current
+
+    def _send(self, data, content_type, etag, modified, body=True,
+              checked=False, ranges=False):
+        if not checked and self._not_modified(etag, modified):
+            return
+        size = len(data)
+        start, end = 0, size - 1
+        status = 200
+        span = self.headers.get('Range') if ranges else None
+        if span is not None and self._if_range(etag, modified):
+            span = _parse_range(span, size)
+            if span is None:
+                self.send_response(416)
+                self.send_header('Content-Range', f"bytes */{size}")
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            if span != ():
+                start, end = span
+                status = 206
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified',
+                         email.utils.formatdate(modified, usegmt=True))
+        self.send_header('Cache-Control', 'no-cache')
+        if ranges:
+            self.send_header('Accept-Ranges', 'bytes')
+        if status == 206:
+            self.send_header('Content-Range', f"bytes {start}-{end}/{size}")
+        self.end_headers()
+        if body:
+            self.wfile.write(memoryview(data)[start:end + 1])
+
+    def _if_range(self, etag, modified):
+        """Return True unless an If-Range names an older copy."""
+        condition = self.headers.get('If-Range')
+        if condition is None:
+            return True
+        if condition.strip().startswith(('"', 'W/')):
+            return condition.strip() == etag
+        try:
+            return (email.utils.parsedate_to_datetime(condition).timestamp()
+                    >= int(modified))
+        except (TypeError, ValueError):
+            return False
+
+
+# The name of a Deep Zoom tile.
+_TILE = re.compile(r'\d+_\d+\.jpg')
+
+
+def _etag(data):
+    """Return a strong ETag for data."""
+    return '"' + hashlib.blake2b(data, digest_size=12).hexdigest() + '"'
+
+
+def _modified(page):
+    """Return the modification time of a page, or of its CD image."""
+    if isinstance(page, IsoPath):
+        return os.path.getmtime(page.image.path)
+    return page.stat().st_mtime
+
+
+def _parse_range(header, size):
+    """
+    Parse a Range header for a resource of size bytes.
+
+    Returns
+    -------
+    tuple or None
+        (first, last) byte, () to send the whole resource, such as for
+        several ranges, or None if the range can not be satisfied.
+
+    """
+    unit, _, spec = header.partition('=')
+    if unit.strip() != 'bytes' or ',' in spec:
+        return ()
+    first, _, last = spec.strip().partition('-')
+    try:
+        if first == '':
+            # The last N bytes.
+            n = int(last)
+            if n <= 0:
+                return None
+            return max(0, size - n), size - 1
+        first = int(first)
+        last = int(last) if last else size - 1
+    except ValueError:
+        return ()
+    if first >= size or last < first:
+        return None
+    return first, min(last, size - 1)
+
+
+def make_server(library, host='127.0.0.1', port=8080, workers=8,
+                cache_mb=64, verbose=False, dzi=None):
+    """
+    Return a PoolHTTPServer for a scanned library, not yet serving.
+
+    Parameters
+    ----------
+    library : util_library.MagazineLibrary
+        A library that has been scanned.
+    host : str, optional
+        The address to listen on.  The default is only this machine,
+        give '' to serve the network.
+    port : int, optional
+        The port, 0 for any free port.  The default is 8080.
+    workers : int, optional
+        The number of requests handled at the same time.  The default
+        is 8.
+    cache_mb : int, optional
+        The size of the rendition cache in MB.  The default is 64.
+    verbose : bool, optional
+        Log every request to stderr.  The default is False.
+    dzi : str, optional
+        The output folder of ngs-batch dzi, to serve the Deep Zoom
+        pyramids.  The default serves none.
+
+    Returns
+    -------
+    PoolHTTPServer
+
+    """
+    server = PoolHTTPServer((host, port), PageRequestHandler, workers)
+    server.library = library
+    server.verbose = verbose
+    server.dzi = dzi
+    server.started = time.time()
+    server.renditions = RenditionCache(library, cache_mb * 2**20)
+    metrics.gauge('ngs_rendition_cache_hits_total',
+                  lambda: server.renditions.hits, 'counter')
+    metrics.gauge('ngs_rendition_cache_misses_total',
+                  lambda: server.renditions.misses, 'counter')
+    server.issues = {}
+    server.months = {}
+    issues = []
+    for yr, mo, path in library.issues():
+        number = month_number(mo)
+        server.issues[(str(yr), number)] = path
+        server.months[str(path)] = mo
+        issues.append({'year': yr, 'month': mo,
+                       'url': f"/issues/{yr}/{number}.json"})
+    server.index_data = json.dumps({
+        'volumes': [{'label': v.label, 'date_range': v.date_range}
+                    for v in library.volumes],
+        'issues': issues}).encode()
+    server.index_etag = _etag(server.index_data)
+    return server
+
+
+def benchmark(url, clients=16, requests=2000, width=None):
+    """
+    Load a running server with concurrent keep-alive clients.
+
+    Each client fetches the index, then pages of random magazines.
+
+    Parameters
+    ----------
+    url : str
+        The server, such as http://127.0.0.1:8080.
+    clients : int, optional
+        The number of concurrent clients.  The default is 16.
+    requests : int, optional
+        The total number of page requests.  The default is 2000.
+    width : int, optional
+        Ask for renditions this wide instead of the JPEGs.
+
+    Returns
+    -------
+    dict
+        requests, seconds, requests/s, MB/s, and p50, p95 and max
+        latency in milliseconds.
+
+    """
+    import http.client
+    import random
+
+    target = urlsplit(url)
+    conn = http.client.HTTPConnection(target.hostname, target.port)
+    conn.request('GET', '/index.json')
+    index = json.loads(conn.getresponse().read())
+    pages = []
+    for issue in index['issues'][:50]:
+        conn.request('GET', issue['url'])
+        pages.extend(json.loads(conn.getresponse().read())['pages'])
+    conn.close()
+    if width:
+        pages = [f"{p}?width={width}" for p in pages]
+
+    latencies = []
+    received = [0]
+    lock = threading.Lock()
+    per_client = max(1, requests // clients)
+
+    def client(seed):
+        rng = random.Random(seed)
+        c = http.client.HTTPConnection(target.hostname, target.port,
+                                       timeout=30)
+        mine = []
+        nbytes = 0
+        for i in range(per_client):
+            start = time.perf_counter()
+            c.request('GET', rng.choice(pages))
+            response = c.getresponse()
+            nbytes += len(response.read())
+            mine.append(time.perf_counter() - start)
+        c.close()
+        with lock:
+            latencies.extend(mine)
+            received[0] += nbytes
+
+    threads = [threading.Thread(target=client, args=(i,))
+               for i in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    seconds = time.perf_counter() - start
+    latencies.sort()
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1,
+                             int(p * len(latencies)))] * 1e3
+
+    return {'requests': len(latencies), 'seconds': seconds,
+            'requests/s': len(latencies) / seconds,
+            'MB/s': received[0] / seconds / 1e6,
+            'p50 ms': percentile(0.50), 'p95 ms': percentile(0.95),
+            'max ms': latencies[-1] * 1e3}
+
+
+def main(argv=None):
+    """Run the ngs-server command line."""
+    parser = argparse.ArgumentParser(
+        prog='ngs-server',
+        description="Serve NGS magazines over HTTP.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    for name, help in (('serve', "serve the magazines"),
+                       ('bench', "load test a local server")):
+        sub = commands.add_parser(name, help=help)
+        sub.add_argument('source',
+                         help="a mounted NGS CD, a .iso image or a "
+                              "library folder")
+        sub.add_argument('--workers', type=int, default=8,
+                         help="requests handled at once (default: 8)")
+        sub.add_argument('--cache-mb', type=int, default=64,
+                         help="rendition cache size (default: 64)")
+    serve = commands.choices['serve']
+    serve.add_argument('--host', default='127.0.0.1',
+                       help="address to listen on, '' for all "
+                            "(default: 127.0.0.1)")
+    serve.add_argument('--port', type=int, default=8080)
+    serve.add_argument('--verbose', '-v', action='store_true',
+                       help="log every request")
+    serve.add_argument('--dzi',
+                       help="serve the Deep Zoom pyramids in this folder, "
+                            "written by ngs-batch dzi")
+    serve.add_argument('--metrics-file', metavar='FILE',
+                       help="write the metrics to FILE every 10 seconds, "
+                            "Prometheus text for a .prom file, else JSON")
+    bench = commands.choices['bench']
+    bench.add_argument('--clients', type=int, default=16)
+    bench.add_argument('--requests', type=int, default=2000)
+    bench.add_argument('--width', type=int,
+                       help="ask for renditions this wide")
+    args = parser.parse_args(argv)
+
+    try:
+        library = open_source(args.source)
+    except (OSError, ValueError) as e:
+        print(f"ngs-server: {e}", file=sys.stderr)
+        return 2
+    if args.command == 'serve':
+        server = make_server(library, args.host, args.port, args.workers,
+                             args.cache_mb, args.verbose, args.dzi)
+        host, port = server.server_address[:2]
+        print(f"Serving {len(server.issues)} magazines on "
+              f"http://{host or 'localhost'}:{port}/index.json")
+        writer = (MetricsWriter(args.metrics_file) if args.metrics_file
+                  else None)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            if writer is not None:
+                writer.stop()
+        return 0
+
+    server = make_server(library, port=0, workers=args.workers,
+                         cache_mb=args.cache_mb)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        host, port = server.server_address[:2]
+        result = benchmark(f"http://{host}:{port}", args.clients,
+                           args.requests, args.width)
+    finally:
+        server.shutdown()
+        server.server_close()
+    cache = server.renditions
+    result['rendition hits'] = cache.hits
+    result['rendition misses'] = cache.misses
+    for key, value in result.items():
+        print(f"{key:>18}: {value:.2f}" if isinstance(value, float)
+              else f"{key:>18}: {value}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
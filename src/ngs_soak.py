@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+A soak test of the reader's memory, thousands of page turns long.
+
+    python ngs_soak.py [--turns 10000] [--fixture DIR] [--size W H]
+
+Pages are turned through the magazines of a fake CD as NgsApp does,
+through a MagazineLibrary with a PageIOEngine, prefetching the next two
+pages, and going on to the next magazine at the end of each one.  With
+a display each page is also shown in a Tk window with show_page, so
+the PhotoImages are made and replaced as in the reader.  Without one
+only the decoding is soaked.
+
+util_memory's probe measures every turn and magazine change.  The
+page turn tracer of util_trace is disabled meanwhile, its ring buffer
+of 5000 spans is bounded by its size but takes as many turns to fill,
+which the soak would take for growth.  After a warm up of a tenth of
+the turns, and at least enough turns to fill the decoder cache, when
+the caches are full, memory must stay bounded:
+ -- the Python memory traced may grow by at most --max-growth-kb
+    until the last turn,
+ -- no more decoded pages may be alive than the decoder cache, the
+    prefetched pages and the page shown, and
+ -- no more than two PhotoImages, the page shown and the one being
+    replaced.
+The report and the growth per turn are printed, the exit status is 1
+if memory was not bounded.
+
+Created on Mon Feb  2 14:05:12 2026.
+
+@author: Bob
+"""
+import argparse
+import sys
+import tempfile
+import time
+
+import ngs_fixture
+from ngs_batch import open_source
+from util_files import show_page
+from util_io import PageIOEngine
+from util_memory import probe
+from util_trace import tracer
+
+# Pages prefetched after each turn, as NgsApp._prefetch.
+AHEAD = 2
+
+
+def _window():
+    """Return a frame in a Tk window to show pages in, or None."""
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+    except Exception:
+        return None
+    frame = tk.Frame(root)
+    frame.grid(column=0, row=0)
+    return frame
+
+
+def soak(source, turns=10000, show=True):
+    """
+    Turn pages and measure the memory.
+
+    Parameters
+    ----------
+    source : str
+        A CD folder, image or fake CD.
+    turns : int, optional
+        The pages turned.  The default is 10000.
+    show : bool, optional
+        Show the pages in a Tk window, if there is a display.  The
+        default is True.
+
+    Returns
+    -------
+    dict
+        warmup, the turns before the base was taken, base and final,
+        the bytes traced then and at the end, samples, (turn, bytes)
+        every 100 turns, cache_size and shown, True if the pages were
+        shown in a window.
+
+    """
+    library = open_source(source)
+    library.engine = PageIOEngine()
+    frame = _window() if show else None
+    issues = [path for year, month, path in library.issues()]
+    # Every page turned fills the decoder cache, the prefetches go
+    # ahead of it.
+    warmup = min(max(turns // 10, library.decoder.cache_size + AHEAD),
+                 max(1, turns // 2))
+    samples = []
+    base = None
+    traced, tracer.enabled = tracer.enabled, False
+    probe.start()
+    try:
+        n = 0
+        page = None
+        while n < turns:
+            for path in issues:
+                with probe.around('issue_switch'):
+                    pages = library.page_list(path)
+                    page = library.decode(pages[0])
+                    if frame is not None:
+                        show_page(frame, page)
+                        frame.update()
+                for i in range(1, len(pages)):
+                    if n >= turns:
+                        break
+                    with probe.around('page_turn'):
+                        page = library.decode(pages[i])
+                        if frame is not None:
+                            show_page(frame, page)
+                            frame.update()
+                    for ahead in pages[i + 1:i + 1 + AHEAD]:
+                        library.prefetch(ahead)
+                    n += 1
+                    if n == warmup:
+                        base = probe.traced()
+                    if n % 100 == 0:
+                        samples.append((n, probe.traced()))
+                if n >= turns:
+                    break
+        del page
+        # Let the last prefetches finish.
+        time.sleep(0.2)
+        final = probe.traced()
+    finally:
+        tracer.enabled = traced
+        library.engine.close()
+        if frame is not None:
+            frame.winfo_toplevel().destroy()
+    return {'warmup': warmup, 'base': base, 'final': final,
+            'samples': samples, 'cache_size': library.decoder.cache_size,
+            'shown': frame is not None}
+
+
+def growth_per_turn(samples, warmup):
+    """Return the least squares slope of traced bytes per turn."""
+    points = [(n, b) for n, b in samples if n >= warmup]
+    if len(points) < 2:
+        return 0.0
+    mean_n = sum(n for n, b in points) / len(points)
+    mean_b = sum(b for n, b in points) / len(points)
+    spread = sum((n - mean_n) ** 2 for n, b in points)
+    return sum((n - mean_n) * (b - mean_b) for n, b in points) / spread
+
+
+def check(result, max_growth):
+    """Return the reasons memory was not bounded, empty if it was."""
+    failures = []
+    growth = result['final'] - (result['base'] or result['final'])
+    if growth > max_growth:
+        failures.append(f"traced memory grew {growth / 1024:.0f} KB after "
+                        f"the warm up, more than {max_growth / 1024:.0f} KB")
+    # The cache, the prefetches in flight, the page shown and the one
+    # being decoded.
+    pages = result['cache_size'] + AHEAD + 2
+    if probe.peak_live['page'] > pages:
+        failures.append(f"{probe.peak_live['page']} decoded pages alive "
+                        f"at once, more than {pages}")
+    if result['shown'] and probe.peak_live['PhotoImage'] > 2:
+        failures.append(f"{probe.peak_live['PhotoImage']} PhotoImages "
+                        f"alive at once, more than 2")
+    return failures
+
+
+def main(argv=None):
+    """Run the soak test from the command line."""
+    parser = argparse.ArgumentParser(
+        description="Turn pages thousands of times, fail if memory grows.")
+    parser.add_argument('--turns', type=int, default=10000)
+    parser.add_argument('--fixture',
+                        help="a CD folder, .iso or fixture to use instead "
+                             "of a new fake CD")
+    parser.add_argument('--size', type=int, nargs=2, default=[440, 600],
+                        metavar=('WIDTH', 'HEIGHT'),
+                        help="the page size of the fake CD")
+    parser.add_argument('--no-window', action='store_true',
+                        help="only decode, even with a display")
+    parser.add_argument('--max-growth-kb', type=int, default=1024,
+                        help="the traced memory growth allowed after the "
+                             "warm up (default: 1024)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix='ngs-soak-') as tmp:
+        source = args.fixture
+        if source is None:
+            source = ngs_fixture.make_disc(tmp, 1973, 1973, months=4,
+                                           pages=60, size=args.size)
+        start = time.perf_counter()
+        result = soak(source, args.turns, not args.no_window)
+        seconds = time.perf_counter() - start
+    print('\n'.join(probe.report()))
+    probe.stop()
+    print(f"{args.turns} turns in {seconds:.1f} s, "
+          f"{'shown in a window' if result['shown'] else 'decoded only'}")
+    print(f"Traced memory {result['base'] / 1024:.0f} KB after the warm up, "
+          f"{result['final'] / 1024:.0f} KB at the end, "
+          f"{growth_per_turn(result['samples'], result['warmup']):+.1f} "
+          f"B per turn")
+    failures = check(result, args.max_growth_kb * 1024)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        return 1
+    print("Memory stayed bounded.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Cancellation tokens for work on the current NGS volume and magazine.
+
+When the CD is ejected, or the user switches to another magazine, work
+still reading the old CD or magazine is wasted, and on an ejected CD
+each read may block until the drive gives up.  The app keeps a
+Generations counter that is advanced on each volume change and each
+magazine change.  Work is started with a token from
+Generations.token(), and checks it between reads.  Once the
+generation it was issued for has passed, token.check() raises
+Cancelled and the work stops.  Results carrying a stale token are
+dropped by the TkDispatcher before they reach the UI.
+
+Created on Tue Jan 20 08:27:52 2026.
+
+@author: Bob
+"""
+import threading
+
+
+class Cancelled(Exception):
+    """Raised by CancelToken.check() when its work is no longer wanted."""
+
+
+class Generations:
+    """
+    Count volume and magazine changes.
+
+    new_volume() cancels all outstanding tokens, new_issue() cancels
+    the tokens issued for a magazine but not those for the volume,
+    such as indexing the library.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.volume = 0
+        self.issue = 0
+
+    def new_volume(self):
+        """A CD was inserted or ejected, cancel all work."""
+        with self._lock:
+            self.volume += 1
+            self.issue += 1
+
+    def new_issue(self):
+        """Another magazine was opened, cancel its page work."""
+        with self._lock:
+            self.issue += 1
+
+    def token(self, scope='issue'):
+        """
+        Return a token for work on the current volume or magazine.
+
+        Parameters
+        ----------
+        scope : str, optional
+            'issue' for work on the open magazine, cancelled by the
+            next magazine or volume change, 'volume' for work on the
+            volume, cancelled only by a volume change.  The default
+            is 'issue'.
+
+        Returns
+        -------
+        CancelToken
+
+        """
+        if scope not in ('issue', 'volume'):
+            raise ValueError(f"scope must be 'issue' or 'volume'. "
+                             f"{scope} given.")
+        with self._lock:
+            issue = self.issue if scope == 'issue' else None
+            return CancelToken(self, self.volume, issue)
+
+
+class CancelToken:
+    """
+    Tells running work whether its generation is still current.
+
+    Test token.cancelled, or call token.check() which raises
+    Cancelled, between reads.  CancelToken.never() is never cancelled,
+    for callers that do not track generations.
+    """
+
+    def __init__(self, generations, volume, issue=None):
+        self._generations = generations
+        self.volume = volume
+        self.issue = issue
+
+    @classmethod
+    def never(cls):
+        """Return a token that is never cancelled."""
+        return cls(None, 0)
+
+    @property
+    def cancelled(self):
+        """Return True if the volume or magazine has changed."""
+        g = self._generations
+        if g is None:
+            return False
+        if g.volume != self.volume:
+            return True
+        return self.issue is not None and g.issue != self.issue
+
+    def check(self):
+        """Raise Cancelled if the volume or magazine has changed."""
+        if self.cancelled:
+            raise Cancelled()
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Deep Zoom (DZI) image pyramids of the magazine pages.
+
+The fold-out maps of the magazines were scanned in large pages, too
+large to show whole and slow to decode to look at one corner.  A Deep
+Zoom pyramid stores a page as square tiles at every zoom level, level
+0 is one pixel and the top level is the page as scanned, each level
+half the size of the next.  A viewer, or the HTTP server, then shows
+any part of the page at any zoom by reading a few small tiles.
+
+build_pyramid() writes the pyramid of one page:
+    273L0729.dzi                the Deep Zoom descriptor (XML),
+    273L0729_files/LEVEL/COL_ROW.jpg
+                                the tiles.
+Each level is resampled from the level above it, not from the page, so
+every step works on an image a quarter the size of the one before.
+The descriptor is written last, a pyramid without it is incomplete.
+
+Created on Tue Jan 27 08:55:14 2026.
+
+@author: Bob
+"""
+import io
+import math
+import os
+
+from util_workers import atomic_write
+
+DZI_XML = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+           '<Image xmlns="http://schemas.microsoft.com/deepzoom/2008" '
+           'TileSize="{tile_size}" Overlap="{overlap}" Format="{fmt}">'
+           '<Size Width="{width}" Height="{height}"/></Image>\n')
+
+
+def max_level(width, height):
+    """Return the top level of a pyramid, where the page is full size."""
+    return math.ceil(math.log2(max(width, height, 1)))
+
+
+def tile_boxes(width, height, tile_size=254, overlap=1):
+    """
+    Yield (col, row, box) of the tiles of one level.
+
+    box is (left, upper, right, lower) in the level image, tiles
+    overlap their neighbours by overlap pixels, as Deep Zoom expects.
+    """
+    for col in range(math.ceil(width / tile_size)):
+        for row in range(math.ceil(height / tile_size)):
+            left = col * tile_size - (overlap if col else 0)
+            upper = row * tile_size - (overlap if row else 0)
+            right = min(width, (col + 1) * tile_size + overlap)
+            lower = min(height, (row + 1) * tile_size + overlap)
+            yield col, row, (left, upper, right, lower)
+
+
+def build_pyramid(image, base, tile_size=254, overlap=1, quality=85):
+    """
+    Write the Deep Zoom pyramid of an image.
+
+    Parameters
+    ----------
+    image : PIL.Image.Image
+        The decoded page.
+    base : str
+        The pyramid without extension, base.dzi and base_files/ are
+        written.
+    tile_size : int, optional
+        The tile width and height, without overlap.  The default is 254,
+        so the tiles are 256 pixels with the overlap.
+    overlap : int, optional
+        Pixels shared with the neighbouring tiles.  The default is 1.
+    quality : int, optional
+        The JPEG quality of the tiles.  The default is 85.
+
+    Returns
+    -------
+    int
+        The number of tiles written.
+
+    """
+    image = image.convert('RGB')
+    width, height = image.size
+    files = base + '_files'
+    tiles = 0
+    level_image = image
+    for level in range(max_level(width, height), -1, -1):
+        folder = os.path.join(files, str(level))
+        os.makedirs(folder, exist_ok=True)
+        w, h = level_image.size
+        for col, row, box in tile_boxes(w, h, tile_size, overlap):
+            buffer = io.BytesIO()
+            level_image.crop(box).save(buffer, 'JPEG', quality=quality)
+            atomic_write(os.path.join(folder, f"{col}_{row}.jpg"),
+                         buffer.getvalue())
+            tiles += 1
+        # The next level down is half of this one, a 2x2 box average
+        # rounds odd sizes up, as Deep Zoom does.
+        level_image = level_image.reduce(2)
+    atomic_write(base + '.dzi', DZI_XML.format(
+        tile_size=tile_size, overlap=overlap, fmt='jpg', width=width,
+        height=height))
+    return tiles
@@ -21,19 +21,25 @@ The National Geographic CD is named NGS_Year1_Year2, where year 1 is
 @author: Bob
 """
 import datetime
+import io
+import logging
 import os
-import psutil
 import re
 import sys
+import time
 import tkinter as tk
 # import tkinter as Grid
 import tkinter.ttk as ttk
-import win32api
 
-from pathlib import Path
-from PIL import ImageTk
 
 import util_ngs as util
+from util_iso import IsoPath, as_path, open_images
+from util_memory import probe
+from util_metrics import metrics
+from util_trace import tracer
+from util_volumes import find_volume
+
+log = logging.getLogger(__name__)
 # %% Build a list of our files and folders.
 # This section computes the dictionary that gives the user
 # a view of the magazines by month and year, instead of the
@@ -65,6 +71,8 @@ def get_drive_label(drive_letter="D:\\"):
 
     """
     try:
+        # win32api only exists on Windows, import it when used.
+        import win32api
         drive_data = win32api.GetVolumeInformation(f"{drive_letter}")
         return drive_data[0], [-1]
     except Exception as e:
@@ -86,6 +94,10 @@ def get_directory(to_find="NGS", folder="IMAGES"):
     Society.  If the name contains the to_find string, return the
     location of the folder on this CD and for images, the date range.
 
+    CD images opened with util_iso.open_image are searched first, the
+    user opened them on purpose.  Their folders are returned as
+    'image.iso::/IMAGES' strings, see util_iso.as_path.
+
     Parameters
     ----------
     to_find : str, optional
@@ -105,47 +117,44 @@ def get_directory(to_find="NGS", folder="IMAGES"):
         and the path to the IMAGE file on the disk.
 
     """
-    partitions = psutil.disk_partitions()  # find mounted drives.
-    # print("Partitions: ", partitions, "\n\n")
-    p1 = ""
-    date_range = []
-    # Go through drives to see if the name of one contains our search string.
-    for partition in partitions:
-        # Get the drive letter of the mounted partition
-        drive_letter = partition.device
-        drive_data = get_drive_label(drive_letter)
-        # print("drive letter =", drive_letter, ": ", drive_data)
-        # Look for a drive label containing the to_find string.
-        if to_find in drive_data[0]:
-            # ngs1 = re.search(to_find, drive_data[0])
-            # print("We found our drive drive.")
-            # if ngs1 is not None:
-            # NGS CDs contain the year range of magazines that are
-            # on the disk.  While we are here, capture it for the
-            # main window title.
-            date_range = re.split("_", drive_data[0])
-
-            # The drive letter + the directory name 'IMAGES'
-            # gives us the location of all the magazine folders.
-            p = os.path.join(drive_letter, folder)
-            if os.path.isdir(p):
-                p1 = p
+    for image in reversed(open_images()):
+        if to_find in image.label:
+            date_range = re.split("_", image.label) + ['', '']
+            try:
+                p1 = str(image.lookup(folder))
+            except FileNotFoundError:
+                p1 = ""
             if "IMAGES" in folder:
                 return p1, [date_range[1], date_range[2]]
-            else:
-                return p1    # return the folder's complete path.
-    # if to_find not in drive_data:
-        # raise NameError("Unable to find National Geographic CD.")
-    # If we go through all the drive names and don't find a NGS CD
+            return p1
+    # The volume list is cached until a volume is mounted or unmounted.
+    volume = find_volume(to_find)
+    if volume is not None:
+        # NGS CDs contain the year range of magazines that are
+        # on the disk.  While we are here, capture it for the
+        # main window title.
+        date_range = re.split("_", volume.label) + ['', '']
+
+        # The mount point + the directory name 'IMAGES'
+        # gives us the location of all the magazine folders.
+        p1 = ""
+        p = os.path.join(volume.mount_point, folder)
+        if os.path.isdir(p):
+            p1 = p
+        if "IMAGES" in folder:
+            return p1, [date_range[1], date_range[2]]
+        else:
+            return p1    # return the folder's complete path.
+    # If we go through all the volume names and don't find a NGS CD
     # then return a blank.
-    print("Not a NGS disk", to_find, ": ", drive_data)
+    log.info("Not a NGS disk %s", to_find)
     return '', ['', '']
 
 
 # %%% Buid a magazine index. Build a list of folders
 
 
-def build_magazine_index(base_path, date_range):
+def build_magazine_index(base_path, date_range, token=None):
     """
     Build an index of National Geographic magazine months from CD.
 
@@ -161,6 +170,8 @@ def build_magazine_index(base_path, date_range):
         DESCRIPTION.
     date_range : TYPE
         DESCRIPTION.
+    token : util_cancel.CancelToken, optional
+        Stop with util_cancel.Cancelled when the volume changes.
 
     Returns
     -------
@@ -168,10 +179,12 @@ def build_magazine_index(base_path, date_range):
         DESCRIPTION.
 
     """
-    p = Path(base_path)
+    p = as_path(base_path)
     mag_indx = {}
     for child in p.iterdir():
-        if os.path.isdir(child):
+        if token is not None:
+            token.check()
+        if child.is_dir():
             yr, mo, child = decode_dir_name(child)
             # If the year is already in the dictionary,
             # add the new month to the value.
@@ -207,7 +220,7 @@ def decode_dir_name(child):
 # Given a folder, build a list of the files in that folder.
 
 
-def build_page_list(m_path, include_adds=False):
+def build_page_list(m_path, include_adds=False, token=None):
     """
     Create a list of all the JPG page image files in a given folder.
 
@@ -223,11 +236,15 @@ def build_page_list(m_path, include_adds=False):
     ----------
     m_path : str or path or Path object
         A string or path object describing the location of a folder
-        on the CD, containing one National Geographic magazine.
+        on the CD, containing one National Geographic magazine.  It may
+        also be a folder inside a CD image, see util_iso.as_path.
     include_adds : boolean
         The National Geographic CD differentates pages that are
         advertisements.  This option could allow a user to choose
         to not include adds in threir view of the magazines.
+    token : util_cancel.CancelToken, optional
+        Stop with util_cancel.Cancelled when the magazine or volume
+        changes.
 
     Returns
     -------
@@ -237,14 +254,15 @@ def build_page_list(m_path, include_adds=False):
         JPG[len(JPG)] corresponds to the last page of the magazine.
 
     """
-    p = Path(m_path)
+    p = as_path(m_path)
     page_list = []
     for child in p.iterdir():
-        if os.path.isfile(child):
+        if token is not None:
+            token.check()
+        if child.is_file():
             # if the child points to a JPG file, add it to the list.
-            osp = os.path.splitext(child)
-            if osp[1] == ".JPG"\
-                    or osp[1] == ".jpg":
+            if child.suffix == ".JPG"\
+                    or child.suffix == ".jpg":
                 # When we find the cover, put it in position 0
                 if "C01A" in str(child):
                     page_list.insert(0, child)
@@ -258,7 +276,7 @@ def build_page_list(m_path, include_adds=False):
 # %%% Get the image file that represents the selected page.
 
 
-def get_image(df, page_list, page_no=0):
+def get_image(df, page_list, page_no=0, token=None):
     """
     Read in the image of the selected page and add it to the target frame.
 
@@ -273,20 +291,89 @@ def get_image(df, page_list, page_no=0):
         A list of pages in the currently selected magazine.
     page_no : int, optional
         The integer describing the current page. The default is 0.
+    token : util_cancel.CancelToken, optional
+        If the magazine or volume changes before or while the page is
+        read, stop with util_cancel.Cancelled and leave the frame as
+        it is.
 
     Returns
     -------
-    None.
+    PIL.Image.Image
+        The page shown.
 
     """
     # We found and put the cover as the first element of the page_list.
     # Consequently, we now start our page numbers with zero, instead
     # of one. 12/13/24 RHB.
     image_path = page_list[page_no]
-    # Clear the frame of all old widgets.
     # Read in our new image
-    img = ImageTk.PhotoImage(file=image_path)
+    page = load_page(image_path, token)
+    if token is not None:
+        token.check()
+    show_page(df, page)
+    return page
+
+
+def load_page(image_path, token=None):
+    """
+    Read and decode a page image.
+
+    Only PIL is used, not Tk, so pages can be read and decoded in a
+    worker thread and handed to show_page() on the Tk thread.
+
+    Parameters
+    ----------
+    image_path : Path or IsoPath
+        A page from build_page_list.
+    token : util_cancel.CancelToken, optional
+        Stop with util_cancel.Cancelled if the magazine or volume
+        changed before the page was read.
+
+    Returns
+    -------
+    PIL.Image.Image
+        The decoded page.
+
+    """
+    if token is not None:
+        token.check()
+    # PIL is imported with the first page, not at startup.
+    from PIL import Image
+    with tracer.span('read'):
+        data = read_page_data(image_path)
+    with tracer.span('decode'):
+        page = Image.open(io.BytesIO(data))
+        page.load()
+    probe.track(page, 'page')
+    return page
+
+
+def show_page(df, page):
+    """
+    Show a decoded page in the target frame.
+
+    Parameters
+    ----------
+    df : tk.Frame
+        The display frame where we will put the page image.
+    page : PIL.Image.Image
+        A page from load_page.
+
+    Returns
+    -------
+    None.
+
+    """
+    from PIL import ImageTk
+    with tracer.span('photoimage'):
+        img = ImageTk.PhotoImage(page)
+    probe.track(img, 'PhotoImage')
+    with tracer.span('layout'):
+        _layout_page(df, img)
+
 
+def _layout_page(df, img):
+    # Clear the frame of all old widgets.
     _clear_frame(df)
 
     display = tk.Label(df, text='Center', justify=tk.CENTER)
@@ -304,6 +391,8 @@ def get_image(df, page_list, page_no=0):
 
     str_geom = f"{wd+20}x{ht + 20}"
     parent_widget.geometry(str_geom)
+    # Lay out now, so the span times the layout.
+    parent_widget.update_idletasks()
 
 
 def get_image_canvas(df, page_list, page_no=0):
@@ -343,7 +432,9 @@ def get_image_canvas(df, page_list, page_no=0):
     # print(f"image_path = {image_path}")
     # Read in our new image
     # print("get_image: loading image.")
-    img = ImageTk.PhotoImage(file=image_path)
+    from PIL import ImageTk
+    img = ImageTk.PhotoImage(file=page_source(image_path))
+    probe.track(img, 'PhotoImage')
     # capture image in df so it does not get garbage collected.
     df.image = img
 
@@ -386,6 +477,91 @@ def get_image_canvas(df, page_list, page_no=0):
     top.geometry(str_geom)
 
 
+# The file types written by ngs-batch transcode.
+TRANSCODED_EXTS = ('.webp', '.jpg')
+
+
+def transcoded_variant(image_path):
+    """
+    Return the transcoded copy of a page, or None if there is none.
+
+    ngs-batch transcode writes smaller, faster to decode copies of the
+    pages to FOLDER/PAGE.webp or FOLDER/PAGE.jpg under a transcode
+    folder.  They are used when the NGS_TRANSCODED environment variable
+    names that folder.  The magazine folder names, 273L, are unique in
+    the whole collection, so the copies need no volume or year.
+
+    Parameters
+    ----------
+    image_path : str, Path or IsoPath
+        A page from build_page_list.
+
+    Returns
+    -------
+    str or None
+        The transcoded copy.
+
+    """
+    root = os.environ.get('NGS_TRANSCODED')
+    if not root:
+        return None
+    inner = str(image_path).split('::')[-1]
+    folder = os.path.basename(os.path.dirname(inner))
+    stem = os.path.splitext(os.path.basename(inner))[0]
+    for ext in TRANSCODED_EXTS:
+        variant = os.path.join(root, folder, stem + ext)
+        if os.path.isfile(variant):
+            return variant
+    return None
+
+
+def page_source(image_path):
+    """
+    Return something PIL can open for a page in a page list.
+
+    Pages on a mounted CD are opened by path.  Pages inside a CD image
+    are opened as a file object over the mapped image, so the image
+    file is not opened again, its reads copy the JPEG data out of the
+    mapped image as PIL asks for it.  A transcoded
+    copy of the page is opened instead, if there is one, see
+    transcoded_variant.
+
+    Parameters
+    ----------
+    image_path : Path or IsoPath
+        A page from build_page_list.
+
+    Returns
+    -------
+    Path or file object
+
+    """
+    variant = transcoded_variant(image_path)
+    if variant is not None:
+        return variant
+    if isinstance(image_path, IsoPath):
+        return image_path.open()
+    return image_path
+
+
+def read_page_data(image_path):
+    """Return the JPEG data of a page, or of its transcoded copy."""
+    start = time.perf_counter()
+    source = page_source(image_path)
+    if hasattr(source, 'read'):
+        with source:
+            data = source.read()
+    else:
+        with open(source, 'rb') as f:
+            data = f.read()
+    # Reads outside a PageIOEngine, the device is not looked up.
+    metrics.inc('ngs_reads_total', device='', kind='direct')
+    metrics.inc('ngs_read_seconds_total', time.perf_counter() - start,
+                device='', kind='direct')
+    metrics.inc('ngs_read_bytes_total', len(data), device='', kind='direct')
+    return data
+
+
 def all_children(wid, finList=None, indent=0):
     """List all children of the container wid."""
     finList = finList or []
@@ -426,10 +602,10 @@ def get_size(df, img):
     # and add it to our display label widget
     iht = int(img.height())
     iwd = int(img.width())
-    print(f"Image width = {iwd}, height = {iht}")
+    log.debug("Image width = %d, height = %d", iwd, iht)
     swd = df.winfo_screenwidth()
     sht = df.winfo_screenheight()
-    print(f"Monitor width = {swd}, height = {sht}")
+    log.debug("Monitor width = %d, height = %d", swd, sht)
     # Compute which ever is larger and use that as the
     # requested window size.
     # If magazine height > screen height
@@ -474,7 +650,7 @@ def on_window_resize(event):
     """
     width = event.width
     height = event.height
-    print(f"Window resized to {width}x{height}")
+    log.debug("Window resized to %dx%d", width, height)
 
 # %%% get the time this application was last compiled.
 
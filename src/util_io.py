@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+"""
+Schedule page reads per device, the page the user is waiting for first.
+
+A CD drive reads one place at a time, several readers make its head
+seek back and forth and all of them slow down, while a local disk or a
+network share is fastest with many reads in flight.  The PageIOEngine
+gives each device a queue and a number of readers that suits its
+class:
+ -- 'optical', CDs and DVDs: one read at a time,
+ -- 'disk', local disks and CD images on them: several reads, and
+ -- 'network', NFS and SMB shares: more reads, to hide the latency.
+Each queue is ordered by priority, then by age:
+ -- VISIBLE, the page the user turned to,
+ -- PREFETCH, the pages the user will probably turn to next, and
+ -- BACKGROUND, indexing and batch work.
+A page turn therefore waits at most for the one read already running
+on a CD, never for the background reads queued before it.
+
+The queues and readers are asyncio tasks on an event loop in a thread
+of their own, the blocking reads run in a thread pool.  Callers in any
+thread submit a read and get a concurrent.futures.Future.  asyncio is
+imported when the first read is submitted.
+
+Created on Mon Jan 26 09:48:03 2026.
+
+@author: Bob
+"""
+import itertools
+import os
+import threading
+import time
+
+from collections import OrderedDict
+
+from util_iso import IsoPath
+from util_metrics import metrics
+from util_volumes import list_volumes
+
+# Priorities, lower is more urgent.
+VISIBLE = 0
+PREFETCH = 1
+BACKGROUND = 2
+PRIORITY_NAMES = ('visible', 'prefetch', 'background')
+
+# Reads in flight per device of each class.
+POLICIES = {'optical': 1, 'disk': 4, 'network': 8}
+
+_OPTICAL_FS = {'iso9660', 'udf', 'cdfs'}
+_NETWORK_FS = {'nfs', 'nfs4', 'cifs', 'smb3', 'smbfs', 'fuse.sshfs',
+               '9p'}
+# The folders whose device an engine remembers, a magazine folder each.
+DEVICE_CACHE = 256
+
+
+def device_of(path):
+    """
+    Return (device, class) for a file or folder.
+
+    A page inside a CD image is on the device of the image file.  The
+    class is 'optical', 'disk' or 'network', from the file system of
+    the mounted volume that holds the path.
+
+    Parameters
+    ----------
+    path : str, Path or IsoPath
+
+    Returns
+    -------
+    tuple
+        (device, class), device is the volume's mount point.
+
+    """
+    if isinstance(path, IsoPath):
+        real = path.image.path
+    else:
+        real = str(path)
+        if '::' in real:
+            real = real.split('::', 1)[0]
+    real = os.path.realpath(real)
+    best = None
+    for volume in list_volumes():
+        mount = volume.mount_point
+        if real == mount or real.startswith(mount.rstrip(os.sep) + os.sep):
+            if best is None or len(mount) > len(best.mount_point):
+                best = volume
+    if best is None:
+        return '', 'disk'
+    fstype = best.fstype.lower()
+    if fstype in _OPTICAL_FS:
+        return best.mount_point, 'optical'
+    if fstype in _NETWORK_FS:
+        return best.mount_point, 'network'
+    return best.mount_point, 'disk'
+
+
+class PageIOEngine:
+    """
+    Run blocking reads in per-device priority queues.
+
+    Parameters
+    ----------
+    workers : util_workers.WorkerService, optional
+        Runs the event loop thread and stops it when the application
+        exits.  The default is a plain daemon thread.
+    policies : dict, optional
+        Reads in flight per device class.  The default is POLICIES.
+
+    stats holds the reads done, the reads that failed and the reads
+    dropped, because their token was cancelled while they were queued,
+    per priority.  A closed engine can not be started again, submit()
+    then raises RuntimeError, and the reads it had not finished raise
+    util_cancel.Cancelled.
+    """
+
+    def __init__(self, workers=None, policies=None):
+        self.workers = workers
+        self.policies = dict(POLICIES if policies is None else policies)
+        self.stats = {'done': [0, 0, 0], 'failed': [0, 0, 0],
+                      'dropped': [0, 0, 0]}
+        self._lock = threading.Lock()
+        self._closed = False
+        self._loop = None
+        self._pool = None
+        self._queues = {}
+        self._tasks = []
+        # Reads of the same priority are run in submission order.
+        self._order = itertools.count()
+        # {folder: (device, class)} of the DEVICE_CACHE folders used
+        # last, device_of lists the volumes.
+        self._devices = OrderedDict()
+
+    def _start(self):
+        """Start the event loop thread, once, return (loop, pool)."""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("The PageIOEngine is closed.")
+            if self._loop is not None:
+                return self._loop, self._pool
+            import asyncio
+            from concurrent.futures import ThreadPoolExecutor
+            pool = ThreadPoolExecutor(
+                max_workers=max(self.policies.values()) * 2,
+                thread_name_prefix='page-io')
+            loop = asyncio.new_event_loop()
+            loop.set_default_executor(pool)
+            self._stopped = threading.Event()
+            if self.workers is not None:
+                self.workers.spawn(self._run, loop, pool, name='page io loop')
+                self.workers.on_stop(self.close)
+            else:
+                import atexit
+                threading.Thread(target=self._run, args=(loop, pool),
+                                 daemon=True, name='page io loop').start()
+                atexit.register(self.close)
+            self._loop = loop
+            self._pool = pool
+            metrics.gauge('ngs_io_queue_depth', self.queue_depths)
+            return loop, pool
+
+    def queue_depths(self):
+        """Return [({'device': device}, reads queued)] of each device."""
+        return [({'device': device}, queue.qsize())
+                for device, queue in list(self._queues.items())]
+
+    def device(self, path):
+        """Return the cached (device, class) of path, see device_of."""
+        key = (path.image.path if isinstance(path, IsoPath)
+               else os.path.dirname(str(path)))
+        with self._lock:
+            found = self._devices.get(key)
+            if found is not None:
+                self._devices.move_to_end(key)
+                return found
+        found = device_of(path)
+        with self._lock:
+            self._devices[key] = found
+            while len(self._devices) > DEVICE_CACHE:
+                self._devices.popitem(last=False)
+        return found
+
+    def submit(self, path, func, *args, priority=VISIBLE, token=None,
+               then=None):
+        """
+        Queue func(*args), a read of path, on the queue of its device.
+
+        Parameters
+        ----------
+        path : str, Path or IsoPath
+            What func reads, it selects the device queue.
+        func : function
+            The blocking read.
+        priority : int, optional
+            VISIBLE, PREFETCH or BACKGROUND.  The default is VISIBLE.
+        token : util_cancel.CancelToken, optional
+            A read whose token is cancelled while it is queued is not
+            run, its future raises util_cancel.Cancelled.
+        then : function, optional
+            Called with the result of func, after the device is free
+            for the next read, such as to decode the page read.
+
+        Returns
+        -------
+        concurrent.futures.Future
+            The result of func, or of then.
+
+        Raises
+        ------
+        RuntimeError
+            If the engine was closed.
+
+        """
+        from concurrent.futures import Future
+        device = self.device(path)
+        loop, pool = self._start()
+        future = Future()
+        item = (priority, next(self._order), future, func, args, token,
+                then)
+        with self._lock:
+            # Under the lock, so every read queued before close() is
+            # put before _stop runs, and fails with Cancelled there.
+            if self._closed:
+                raise RuntimeError("The PageIOEngine is closed.")
+            loop.call_soon_threadsafe(self._put, loop, pool, device, item)
+        return future
+
+    def run(self, path, func, *args, priority=VISIBLE, token=None):
+        """Submit func(*args) and wait for its result."""
+        return self.submit(path, func, *args, priority=priority,
+                           token=token).result()
+
+    # The following run on the event loop thread.  They use the loop
+    # and pool they were started with, close() forgets them at once.
+
+    def _run(self, loop, pool):
+        loop.run_forever()
+        loop.close()
+        # Not cancel_futures, a _settle queued in the pool still runs.
+        pool.shutdown(wait=False)
+        self._stopped.set()
+
+    def _put(self, loop, pool, device, item):
+        queue = self._queues.get(device[0])
+        if queue is None:
+            import asyncio
+            queue = self._queues[device[0]] = asyncio.PriorityQueue()
+            for i in range(self.policies.get(device[1], 1)):
+                self._tasks.append(loop.create_task(
+                    self._reader(queue, device, loop, pool)))
+        queue.put_nowait(item)
+
+    async def _reader(self, queue, device, loop, pool):
+        import asyncio
+        from util_cancel import Cancelled
+        labels = {'device': device[0], 'kind': device[1]}
+        while True:
+            priority, order, future, func, args, token, then = \
+                await queue.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            if token is not None and token.cancelled:
+                self.stats['dropped'][priority] += 1
+                metrics.inc('ngs_reads_dropped_total',
+                            priority=PRIORITY_NAMES[priority])
+                future.set_exception(Cancelled())
+                continue
+            start = time.perf_counter()
+            try:
+                result = await loop.run_in_executor(pool, func, *args)
+            except asyncio.CancelledError:
+                # The engine is closing, the read is abandoned.
+                future.set_exception(Cancelled())
+                raise
+            except Exception as e:
+                self.stats['failed'][priority] += 1
+                future.set_exception(e)
+            else:
+                self.stats['done'][priority] += 1
+                metrics.inc('ngs_reads_total', **labels)
+                metrics.inc('ngs_read_seconds_total',
+                            time.perf_counter() - start, **labels)
+                if isinstance(result, (bytes, bytearray)):
+                    metrics.inc('ngs_read_bytes_total', len(result),
+                                **labels)
+                if then is None:
+                    future.set_result(result)
+                else:
+                    # The next read starts while this one is processed.
+                    pool.submit(_settle, future, then, result)
+
+    def _stop(self, loop):
+        import asyncio
+        from util_cancel import Cancelled
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        # The reads still queued are not run.
+        for queue in self._queues.values():
+            while not queue.empty():
+                future = queue.get_nowait()[2]
+                if future.set_running_or_notify_cancel():
+                    future.set_exception(Cancelled())
+        self._queues = {}
+
+        async def finish():
+            # The readers finish their cancellation before the loop stops.
+            await asyncio.gather(*tasks, return_exceptions=True)
+            loop.stop()
+        loop.create_task(finish())
+
+    def close(self):
+        """
+        Stop the event loop and the read threads.
+
+        The reads queued or running fail with util_cancel.Cancelled.
+        """
+        with self._lock:
+            self._closed = True
+            loop, self._loop = self._loop, None
+            self._pool = None
+        if loop is not None:
+            loop.call_soon_threadsafe(self._stop, loop)
+            if threading.current_thread().name != 'page io loop':
+                self._stopped.wait(0.1)
+
+
+def _settle(future, then, result):
+    """Set future to then(result)."""
+    try:
+        future.set_result(then(result))
+    except BaseException as e:
+        future.set_exception(e)
@@ -0,0 +1,581 @@
+# -*- coding: utf-8 -*-
+"""
+Read National Geographic CD images (.iso files) without mounting them.
+
+Many readers keep copies of their NGS CDs as ISO9660 image files.  This
+module memory maps an image and reads the ISO9660 structures directly:
+ -- the primary volume descriptor, which holds the volume label
+    NGS_1973_1976 and the location of the root directory,
+ -- the path table, a list of every directory on the disc, so a
+    folder such as IMAGES/273L is found without reading the
+    directories above it, and
+ -- the directory records of a folder, which give the location and
+    size of each page image.
+IsoPath.read_bytes() returns a page as a memoryview slice of the
+mapped image, without a copy, which ngs-server writes to its clients
+as is.  IsoPath.open() gives a file object over that view, its reads
+copy into the caller's buffer, and the reader copies each page into
+bytes once before decoding it, so the read from the CD happens in the
+read stage, not the decode.
+
+Files inside an image are represented by IsoPath objects, which
+provide the small part of pathlib.Path used by util_files, iterdir(),
+is_dir(), is_file(), name, stem and suffix.  str() of an IsoPath is
+'image.iso::/IMAGES/273L', as_path() turns such a string back into an
+IsoPath, so image paths can pass through the menu and page code as
+strings.
+
+write_iso() builds small ISO9660 images from a folder, for tests and
+benchmark fixtures.
+
+Created on Sun Jan 18 14:05:31 2026.
+
+@author: Bob
+"""
+import io
+import mmap
+import os
+import struct
+import threading
+
+# Separates the image file from the path inside the image.
+ISO_SEP = "::"
+
+_SECTOR = 2048
+
+_lock = threading.Lock()
+# Images opened by open_image(), keyed by absolute image path.
+_images = {}
+
+# %% Reading images.
+
+
+class IsoImage:
+    """
+    A memory mapped ISO9660 image.
+
+    Parameters
+    ----------
+    path : str or Path
+        The location of the .iso file.
+
+    Raises
+    ------
+    ValueError
+        If the file is not an ISO9660 image.
+    """
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        with open(self.path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.data = memoryview(self._map)
+        pvd = self._primary_descriptor()
+        self.label = bytes(pvd[40:72]).decode('ascii', 'replace').strip()
+        self.block_size = struct.unpack_from('<H', pvd, 128)[0]
+        root = _parse_record(pvd, 156)
+        self.root = IsoPath(self, (), root[0], root[1], True)
+        # Directory path (upper case tuple) -> (extent, size).
+        self._dirs = {(): (root[0], root[1])}
+        self._listings = {}
+        pt_size = struct.unpack_from('<I', pvd, 132)[0]
+        pt_lba = struct.unpack_from('<I', pvd, 140)[0]
+        self._read_path_table(pt_lba, pt_size)
+
+    def _primary_descriptor(self):
+        """Return the primary volume descriptor sector."""
+        lba = 16
+        while (lba + 1) * _SECTOR <= len(self.data):
+            sector = self.data[lba * _SECTOR:(lba + 1) * _SECTOR]
+            if bytes(sector[1:6]) != b'CD001':
+                break
+            if sector[0] == 1:
+                return sector
+            if sector[0] == 255:
+                break
+            lba += 1
+        raise ValueError(f"{self.path} is not an ISO9660 image.")
+
+    def _read_path_table(self, lba, size):
+        """
+        Record the extent of every directory from the path table.
+
+        The path table lists the directories in order, each entry
+        giving its parent's position in the list, so the full path of
+        each directory is built in one pass.  The size of a directory
+        is only in its own '.' record, it is read when needed.
+        """
+        table = self.data[lba * self.block_size:lba * self.block_size
+                          + size]
+        paths = []
+        pos = 0
+        while pos < len(table):
+            name_len = table[pos]
+            if name_len == 0:
+                break
+            extent, parent = struct.unpack_from('<IH', table, pos + 2)
+            name = bytes(table[pos + 8:pos + 8 + name_len])
+            if not paths:
+                path = ()
+            else:
+                path = paths[parent - 1] + (name.decode('ascii').upper(),)
+            paths.append(path)
+            if path not in self._dirs:
+                self._dirs[path] = (extent, None)
+            pos += 8 + name_len + (name_len & 1)
+
+    def _dir(self, parts):
+        """Return the (extent, size) of a directory, or None."""
+        key = tuple(p.upper() for p in parts)
+        found = self._dirs.get(key)
+        if found is None:
+            return None
+        extent, size = found
+        if size is None:
+            # The '.' record holds the size of the directory.
+            size = _parse_record(self.data, extent * self.block_size)[1]
+            self._dirs[key] = (extent, size)
+        return extent, size
+
+    def listdir(self, extent, size):
+        """
+        Read the records of a directory.
+
+        Parameters
+        ----------
+        extent : int
+            The first block of the directory.
+        size : int
+            The size of the directory in bytes.
+
+        Returns
+        -------
+        list
+            (name, extent, size, is_dir) tuples, '.' and '..' are left
+            out.  Names have the ;1 version removed.
+
+        """
+        listing = self._listings.get(extent)
+        if listing is not None:
+            return listing
+        listing = []
+        start = extent * self.block_size
+        pos = start
+        end = start + size
+        data = self.data
+        while pos < end:
+            rec_len = data[pos]
+            if rec_len == 0:
+                # Records do not cross sectors, skip the padding.
+                pos = (pos // self.block_size + 1) * self.block_size
+                continue
+            f_extent, f_size, flags, name = _parse_record(data, pos)[:4]
+            if name not in (b'\x00', b'\x01'):
+                text = name.decode('ascii', 'replace').split(';')[0]
+                if text.endswith('.'):
+                    text = text[:-1]
+                listing.append((text, f_extent, f_size, bool(flags & 2)))
+            pos += rec_len
+        self._listings[extent] = listing
+        return listing
+
+    def extent(self, extent, size):
+        """Return the bytes of a file as a memoryview, without copying."""
+        start = extent * self.block_size
+        return self.data[start:start + size]
+
+    def lookup(self, inner):
+        """
+        Return the IsoPath of a path inside the image.
+
+        Parameters
+        ----------
+        inner : str
+            A path inside the image, such as '/IMAGES/273L/273L0729.JPG'.
+
+        Raises
+        ------
+        FileNotFoundError
+            If the image does not contain the path.
+
+        Returns
+        -------
+        IsoPath
+
+        """
+        parts = tuple(p for p in inner.replace('\\', '/').split('/') if p)
+        found = self._dir(parts)
+        if found is not None:
+            return IsoPath(self, parts, found[0], found[1], True)
+        if parts:
+            parent = self._dir(parts[:-1])
+            if parent is not None:
+                name = parts[-1].upper()
+                for entry in self.listdir(*parent):
+                    if entry[0].upper() == name:
+                        return IsoPath(self, parts[:-1] + (entry[0],),
+                                       entry[1], entry[2], entry[3])
+        raise FileNotFoundError(f"{inner} not found in {self.path}")
+
+
+def _parse_record(data, pos):
+    """Return (extent, size, flags, name) of the directory record at pos."""
+    extent = struct.unpack_from('<I', data, pos + 2)[0]
+    size = struct.unpack_from('<I', data, pos + 10)[0]
+    flags = data[pos + 25]
+    name_len = data[pos + 32]
+    name = bytes(data[pos + 33:pos + 33 + name_len])
+    return extent, size, flags, name
+
+
+class _ExtentReader(io.RawIOBase):
+    """A read only file object over a memoryview."""
+
+    def __init__(self, view):
+        super().__init__()
+        self._view = view
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = min(len(buffer), len(self._view) - self._pos)
+        if n <= 0:
+            return 0
+        buffer[:n] = self._view[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._pos = max(0, offset)
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+
+class IsoPath:
+    """
+    A file or folder inside an ISO image.
+
+    Behaves like the parts of pathlib.Path used by the NGS reader.
+    """
+
+    def __init__(self, image, parts, extent, size, is_dir):
+        self.image = image
+        self.parts = tuple(parts)
+        self._extent = extent
+        self._size = size
+        self._is_dir = is_dir
+
+    def __str__(self):
+        return f"{self.image.path}{ISO_SEP}/{'/'.join(self.parts)}"
+
+    def __repr__(self):
+        return f"IsoPath('{self}')"
+
+    def __eq__(self, other):
+        return isinstance(other, IsoPath) and str(self) == str(other)
+
+    def __hash__(self):
+        return hash(str(self))
+
+    def __lt__(self, other):
+        return str(self) < str(other)
+
+    def __truediv__(self, name):
+        return self.image.lookup('/'.join(self.parts + (str(name),)))
+
+    @property
+    def name(self):
+        return self.parts[-1] if self.parts else ''
+
+    @property
+    def suffix(self):
+        name = self.name
+        i = name.rfind('.')
+        return name[i:] if i > 0 else ''
+
+    @property
+    def stem(self):
+        name = self.name
+        i = name.rfind('.')
+        return name[:i] if i > 0 else name
+
+    def is_dir(self):
+        return self._is_dir
+
+    def is_file(self):
+        return not self._is_dir
+
+    def exists(self):
+        return True
+
+    def iterdir(self):
+        """Yield the files and folders in this folder."""
+        if not self._is_dir:
+            raise NotADirectoryError(str(self))
+        for name, extent, size, is_dir in self.image.listdir(self._extent,
+                                                             self._size):
+            yield IsoPath(self.image, self.parts + (name,), extent, size,
+                          is_dir)
+
+    def stat_size(self):
+        """Return the size of the file in bytes."""
+        return self._size
+
+    def read_bytes(self):
+        """Return the file contents as a memoryview of the image."""
+        return self.image.extent(self._extent, self._size)
+
+    def open(self, mode='rb'):
+        """Open the file for reading, as a binary file object."""
+        if mode not in ('r', 'rb'):
+            raise ValueError("ISO images are read only.")
+        return io.BufferedReader(_ExtentReader(self.read_bytes()))
+
+
+def open_image(path):
+    """
+    Open an ISO image, or return it if it is already open.
+
+    Parameters
+    ----------
+    path : str or Path
+        The location of the .iso file.
+
+    Returns
+    -------
+    IsoImage
+
+    """
+    key = os.path.abspath(path)
+    with _lock:
+        image = _images.get(key)
+    if image is None:
+        image = IsoImage(key)
+        with _lock:
+            image = _images.setdefault(key, image)
+    return image
+
+
+def open_images():
+    """Return the images opened with open_image(), oldest first."""
+    with _lock:
+        return list(_images.values())
+
+
+def close_image(path):
+    """Forget an image opened with open_image()."""
+    with _lock:
+        _images.pop(os.path.abspath(path), None)
+
+
+def as_path(p):
+    """
+    Return a Path, or an IsoPath for paths inside an ISO image.
+
+    Parameters
+    ----------
+    p : str, Path or IsoPath
+        A file system path, or 'image.iso::/IMAGES/273L'.
+
+    Returns
+    -------
+    Path or IsoPath
+
+    """
+    if isinstance(p, IsoPath):
+        return p
+    s = str(p)
+    if ISO_SEP in s:
+        image, inner = s.split(ISO_SEP, 1)
+        return open_image(image).lookup(inner)
+    from pathlib import Path
+    return Path(p)
+
+
+def path_exists(p):
+    """
+    Return True if a path, or the image of an image path, exists.
+
+    Only the image file is tested, reading the image is not needed to
+    know whether the disc it stands in for is still there.
+    """
+    s = str(p)
+    if ISO_SEP in s:
+        return os.path.isfile(s.split(ISO_SEP, 1)[0])
+    return os.path.exists(s)
+
+# %% Writing images.
+
+
+def _both16(n):
+    return struct.pack('<H', n) + struct.pack('>H', n)
+
+
+def _both32(n):
+    return struct.pack('<I', n) + struct.pack('>I', n)
+
+
+def _record(name, extent, size, is_dir):
+    """Build a directory record."""
+    rec = bytearray(33)
+    rec[2:10] = _both32(extent)
+    rec[10:18] = _both32(size)
+    # Recording date: 1997-01-01 00:00:00 GMT.
+    rec[18:25] = bytes([97, 1, 1, 0, 0, 0, 0])
+    rec[25] = 2 if is_dir else 0
+    rec[28:32] = _both16(1)
+    rec[32] = len(name)
+    rec += name
+    if len(name) % 2 == 0:
+        rec += b'\x00'
+    rec[0] = len(rec)
+    return bytes(rec)
+
+
+def write_iso(src, iso_path, label):
+    """
+    Write the contents of a folder to an ISO9660 image.
+
+    Only what the NGS reader needs is written, a primary volume
+    descriptor, little and big endian path tables and directory
+    records.  File names are used as they are, upper case 8.3 names
+    like those on the NGS CDs are expected.
+
+    Parameters
+    ----------
+    src : str or Path
+        The folder to copy into the image.
+    iso_path : str or Path
+        The image file to create.
+    label : str
+        The volume label, NGS_1973_1976.
+
+    Returns
+    -------
+    None.
+
+    """
+    from pathlib import Path
+    src = Path(src)
+    # Directories in path table order, breadth first, children sorted.
+    dirs = [(src, 0)]
+    i = 0
+    while i < len(dirs):
+        d = dirs[i][0]
+        for child in sorted(d.iterdir()):
+            if child.is_dir():
+                dirs.append((child, i + 1))
+        i += 1
+
+    def entries(d):
+        return sorted(d.iterdir(), key=lambda c: c.name)
+
+    def name_of(child):
+        if child.is_dir():
+            return child.name.encode('ascii')
+        return (child.name + ';1').encode('ascii')
+
+    # Size each directory, records may not cross a sector.
+    dir_size = {}
+    for d, parent in dirs:
+        used, sectors = 68, 1
+        for child in entries(d):
+            n = len(_record(name_of(child), 0, 0, False))
+            if used + n > _SECTOR:
+                sectors += 1
+                used = 0
+            used += n
+        dir_size[d] = sectors * _SECTOR
+
+    path_table_size = sum(8 + len(d.name if p else '\x00')
+                          + (len(d.name if p else '\x00') & 1)
+                          for d, p in dirs)
+    pt_sectors = -(-path_table_size // _SECTOR)
+    l_table = 18
+    m_table = l_table + pt_sectors
+    lba = m_table + pt_sectors
+    dir_lba = {}
+    for d, parent in dirs:
+        dir_lba[d] = lba
+        lba += dir_size[d] // _SECTOR
+    file_lba = {}
+    for d, parent in dirs:
+        for child in entries(d):
+            if child.is_file():
+                file_lba[child] = lba
+                lba += max(1, -(-child.stat().st_size // _SECTOR))
+    total = lba
+
+    with open(iso_path, 'wb') as out:
+        out.truncate(total * _SECTOR)
+
+        def write_at(sector, data):
+            out.seek(sector * _SECTOR)
+            out.write(data)
+
+        pvd = bytearray(_SECTOR)
+        pvd[0] = 1
+        pvd[1:6] = b'CD001'
+        pvd[6] = 1
+        pvd[8:40] = b' ' * 32
+        pvd[40:72] = label.encode('ascii')[:32].ljust(32)
+        pvd[80:88] = _both32(total)
+        pvd[120:124] = _both16(1)
+        pvd[124:128] = _both16(1)
+        pvd[128:132] = _both16(_SECTOR)
+        pvd[132:140] = _both32(path_table_size)
+        pvd[140:144] = struct.pack('<I', l_table)
+        pvd[148:152] = struct.pack('>I', m_table)
+        pvd[156:190] = _record(b'\x00', dir_lba[src], dir_size[src], True)
+        pvd[190:813] = b' ' * 623
+        for pos in (813, 830, 847, 864):
+            pvd[pos:pos + 17] = b'0' * 16 + b'\x00'
+        pvd[881] = 1
+        write_at(16, pvd)
+        write_at(17, bytes([255]) + b'CD001' + bytes([1]))
+
+        l_pt = bytearray()
+        m_pt = bytearray()
+        for d, parent in dirs:
+            name = d.name.encode('ascii') if parent else b'\x00'
+            pad = b'\x00' if len(name) & 1 else b''
+            head = bytes([len(name), 0])
+            l_pt += (head + struct.pack('<IH', dir_lba[d], max(parent, 1))
+                     + name + pad)
+            m_pt += (head + struct.pack('>IH', dir_lba[d], max(parent, 1))
+                     + name + pad)
+        write_at(l_table, l_pt)
+        write_at(m_table, m_pt)
+
+        parents = {d: (dirs[p - 1][0] if p else d) for d, p in dirs}
+        for d, parent in dirs:
+            p = parents[d]
+            data = bytearray()
+            data += _record(b'\x00', dir_lba[d], dir_size[d], True)
+            data += _record(b'\x01', dir_lba[p], dir_size[p], True)
+            for child in entries(d):
+                if child.is_dir():
+                    rec = _record(name_of(child), dir_lba[child],
+                                  dir_size[child], True)
+                else:
+                    rec = _record(name_of(child), file_lba[child],
+                                  child.stat().st_size, False)
+                used = len(data) % _SECTOR
+                if used + len(rec) > _SECTOR:
+                    data += b'\x00' * (_SECTOR - used)
+                data += rec
+            write_at(dir_lba[d], data)
+
+        for child, sector in file_lba.items():
+            write_at(sector, child.read_bytes())
@@ -0,0 +1,510 @@
+# -*- coding: utf-8 -*-
+"""
+A library of all the NGS volumes the reader can see at the same time.
+
+The NGS magazines were sold on many CDs, NGS_1888_1906 through
+NGS_1994_1997.  A reader with several CD drives, a folder of CD images
+or a copy of the CDs on disk does not have to swap discs, the library
+indexes every NGS volume it finds and merges them into one
+chronological magazine index.
+
+Volumes come from three places:
+ -- mounted CDs and drives whose label contains NGS (util_volumes),
+ -- CD images opened by the user or found in a library folder
+    (util_iso), and
+ -- library folders, given as roots or in the NGS_LIBRARY environment
+    variable, which may hold .iso files and copied CDs, folders named
+    NGS_1973_1976 that contain an IMAGES folder.
+The volumes are indexed in parallel, each one is on its own device or
+file, so a slow CD drive does not hold up the others.
+
+The library is the reader's core, it needs no display.  Besides the
+index it lists the pages of a magazine, reads their JPEG data and
+decodes them with PIL, keeping the most recent pages in a PageDecoder
+cache.  NgsApp only shows what the library returns, command line tools,
+servers and benchmarks use the same calls:
+    library = MagazineLibrary(['/media/ngs'])
+    library.scan()
+    for year, month, path in library.issues():
+        pages = library.page_list(path)
+        cover = library.decode(pages[0])
+
+Created on Mon Jan 19 10:41:08 2026.
+
+@author: Bob
+"""
+import io
+import os
+import re
+import threading
+import time
+
+from collections import OrderedDict, namedtuple
+
+from util_files import (build_magazine_index, build_page_list,
+                        read_page_data, transcoded_variant)
+from util_io import BACKGROUND, PREFETCH, VISIBLE
+from util_iso import as_path, open_image, open_images
+from util_memory import probe
+from util_metrics import metrics
+from util_ngs import sorted_months
+from util_trace import Tracer, tracer
+from util_volumes import list_volumes
+
+# Prefetched pages are timed as one 'prefetch' span, not as the read
+# and decode stages of a page turn.
+_untraced = Tracer(enabled=False)
+
+# kind is 'image', 'folder' or 'drive'.
+LibraryVolume = namedtuple('LibraryVolume',
+                           ['label', 'images_path', 'date_range', 'kind'])
+
+
+def _date_range(label):
+    """Return [first year, last year] from a label like NGS_1973_1976."""
+    parts = re.split("_", label) + ['', '']
+    return [parts[1], parts[2]]
+
+
+class PageDecoder:
+    """
+    Decode pages with PIL and keep the most recently used ones.
+
+    Going back a page, or forth again, is then served from memory
+    instead of the CD.  The cached images are shared, callers must not
+    change them.  hits and misses count the cache lookups, the decodes
+    and prefetches are also counted in util_metrics.metrics.
+
+    Parameters
+    ----------
+    cache_size : int, optional
+        The number of decoded pages kept.  The default is 16, a page is
+        about 2 MB decoded.
+    """
+
+    def __init__(self, cache_size=16):
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        # Prefetched pages not yet seen.
+        self._prefetched = set()
+
+    def cached(self, page):
+        """Return True if page is in the cache."""
+        with self._lock:
+            return str(page) in self._cache
+
+    def decode(self, page, token=None, read=None, prefetch=False):
+        """
+        Return the decoded image of a page.
+
+        Parameters
+        ----------
+        page : Path or IsoPath
+            A page from a page list.
+        token : util_cancel.CancelToken, optional
+            Stop with util_cancel.Cancelled if the magazine or volume
+            changed before the page was read.
+        read : function, optional
+            Returns the JPEG data of page, such as a read through a
+            PageIOEngine.  The default opens the page.
+        prefetch : bool, optional
+            The page is decoded ahead of the user.  Its read and decode
+            are not timed as page turn stages in util_trace.tracer, and
+            it is counted as wasted if it leaves the cache unseen.  The
+            default is False.
+
+        Returns
+        -------
+        PIL.Image.Image
+
+        """
+        key = str(page)
+        with self._lock:
+            image = self._cache.get(key)
+            if image is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                used = not prefetch and key in self._prefetched
+                if used:
+                    self._prefetched.discard(key)
+            else:
+                self.misses += 1
+        if image is not None:
+            metrics.inc('ngs_decode_cache_hits_total')
+            if used:
+                metrics.inc('ngs_prefetch_used_total')
+            return image
+        metrics.inc('ngs_decode_cache_misses_total')
+        if token is not None:
+            token.check()
+        # PIL is imported with the first page, not at startup.
+        from PIL import Image
+        spans = _untraced if prefetch else tracer
+        with spans.span('read'):
+            data = read_page_data(page) if read is None else read(page)
+        with spans.span('decode'):
+            start = time.perf_counter()
+            image = Image.open(io.BytesIO(data))
+            image.load()
+            metrics.inc('ngs_decodes_total')
+            metrics.inc('ngs_decode_seconds_total',
+                        time.perf_counter() - start)
+            metrics.inc('ngs_decode_pixels_total',
+                        image.width * image.height)
+        probe.track(image, 'page')
+        wasted = 0
+        with self._lock:
+            self._cache[key] = image
+            if prefetch:
+                self._prefetched.add(key)
+            while len(self._cache) > self.cache_size:
+                old_key, old = self._cache.popitem(last=False)
+                if old_key in self._prefetched:
+                    self._prefetched.discard(old_key)
+                    wasted += 1
+        if wasted:
+            metrics.inc('ngs_prefetch_wasted_total', wasted)
+        return image
+
+    def clear(self, keep=None):
+        """
+        Forget the cached pages, for example when the CD changes.
+
+        Parameters
+        ----------
+        keep : function, optional
+            Called with the str of each cached page, the pages for
+            which it returns True are kept.  The default forgets all.
+
+        """
+        with self._lock:
+            if keep is None:
+                gone = set(self._cache)
+            else:
+                gone = {key for key in self._cache if not keep(key)}
+            for key in gone:
+                del self._cache[key]
+            wasted = len(self._prefetched & gone)
+            self._prefetched -= gone
+        if wasted:
+            metrics.inc('ngs_prefetch_wasted_total', wasted)
+
+
+class MagazineLibrary:
+    """
+    Index the magazines on every NGS volume that can be seen.
+
+    Parameters
+    ----------
+    roots : list, optional
+        Library folders to search for .iso files and copied CDs.  The
+        default is the folders listed in the NGS_LIBRARY environment
+        variable, separated by os.pathsep.
+    to_find : str, optional
+        The string that identifies a NGS volume label.  The default
+        is "NGS".
+    jobs : int, optional
+        The number of volumes indexed at the same time.  The default
+        is 8.
+    workers : util_workers.WorkerService, optional
+        The service whose 'indexer' pool indexes the volumes, so the
+        pool is stopped when the application exits.  The default is a
+        pool for each scan.
+    cache_size : int, optional
+        The number of decoded pages kept by the PageDecoder.  The
+        default is 16.
+    drives : bool, optional
+        Also look for NGS CDs in the drives.  Tools working on one
+        folder or image turn this off.  The default is True.
+    engine : util_io.PageIOEngine, optional
+        Schedules the reads per device and by priority, the page shown
+        first, then prefetched pages, then indexing.  The default reads
+        in the calling thread.
+    """
+
+    def __init__(self, roots=None, to_find="NGS", jobs=8, workers=None,
+                 cache_size=16, drives=True, engine=None):
+        if roots is None:
+            roots = [r for r in os.environ.get('NGS_LIBRARY',
+                                               '').split(os.pathsep) if r]
+        self.roots = list(roots)
+        self.to_find = to_find
+        self.jobs = jobs
+        self.workers = workers
+        self.drives = drives
+        self.engine = engine
+        self.volumes = []
+        # {year: {month: path}} of all volumes, in date order.
+        self.index = {}
+        # {(year, month): LibraryVolume} the volume of each magazine.
+        self.sources = {}
+        self.decoder = PageDecoder(cache_size)
+        # {str(magazine folder): page list} of the magazines listed.
+        self._page_lists = {}
+        self._lock = threading.Lock()
+
+    def discover(self):
+        """
+        Find the NGS volumes.
+
+        Images and folders are listed before drives, when a magazine
+        is on more than one volume the copy on disk is read instead of
+        the one on a CD.
+
+        Returns
+        -------
+        list
+            The LibraryVolume of each NGS volume found.
+
+        """
+        volumes = []
+        seen = set()
+
+        def add(label, images_path, kind):
+            if images_path and images_path not in seen:
+                seen.add(images_path)
+                volumes.append(LibraryVolume(label, images_path,
+                                             _date_range(label), kind))
+
+        for root in self.roots:
+            self._discover_root(root, add)
+        for image in open_images():
+            if self.to_find in image.label:
+                try:
+                    add(image.label, str(image.lookup('IMAGES')), 'image')
+                except FileNotFoundError:
+                    pass
+        for volume in list_volumes() if self.drives else []:
+            if self.to_find in volume.label:
+                p = os.path.join(volume.mount_point, 'IMAGES')
+                if os.path.isdir(p):
+                    add(volume.label, p, 'drive')
+        return volumes
+
+    def _discover_root(self, root, add):
+        """Add the .iso files and copied CDs of a library folder."""
+        try:
+            entries = sorted(os.scandir(root), key=lambda e: e.name)
+        except OSError:
+            return
+        images = os.path.join(root, 'IMAGES')
+        if os.path.isdir(images):
+            add(os.path.basename(os.path.abspath(root)), images, 'folder')
+        for entry in entries:
+            if entry.is_file() and entry.name.lower().endswith('.iso'):
+                try:
+                    image = open_image(entry.path)
+                except (OSError, ValueError):
+                    continue
+                if self.to_find in image.label:
+                    try:
+                        add(image.label, str(image.lookup('IMAGES')),
+                            'image')
+                    except FileNotFoundError:
+                        pass
+            elif entry.is_dir() and self.to_find in entry.name:
+                images = os.path.join(entry.path, 'IMAGES')
+                if os.path.isdir(images):
+                    add(entry.name, images, 'folder')
+
+    def scan(self, token=None):
+        """
+        Find and index every NGS volume.
+
+        Parameters
+        ----------
+        token : util_cancel.CancelToken, optional
+            Stop with util_cancel.Cancelled when the volumes change.
+            The library is left as it was.
+
+        Returns
+        -------
+        dict
+            The merged magazine index, {year: {month: path}}, in
+            chronological order.
+
+        """
+        volumes = self.discover()
+        tokens = [token] * len(volumes)
+        if self.workers is not None:
+            pool = self.workers.executor('indexer', max(1, self.jobs))
+            indexes = list(pool.map(self._index_volume, volumes, tokens))
+        else:
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(max_workers=max(1, self.jobs)) as pool:
+                indexes = list(pool.map(self._index_volume, volumes,
+                                        tokens))
+        if token is not None:
+            token.check()
+        merged = {}
+        sources = {}
+        for volume, index in zip(volumes, indexes):
+            for yr, months in index.items():
+                for mo, path in months.items():
+                    if (yr, mo) not in sources:
+                        merged.setdefault(yr, {})[mo] = path
+                        sources[(yr, mo)] = volume
+        self.index = {yr: {mo: merged[yr][mo]
+                           for mo in sorted_months(merged[yr])}
+                      for yr in sorted(merged, key=str)}
+        self.sources = sources
+        before = {(v.label, v.images_path) for v in self.volumes}
+        self.volumes = [v for v, i in zip(volumes, indexes) if i]
+        # The pages of another CD may have the same paths, only the
+        # pages of volumes that stayed are still good.
+        kept = tuple(v.images_path for v in self.volumes
+                     if (v.label, v.images_path) in before)
+
+        def still_there(key):
+            return any(key.startswith(path) for path in kept)
+        with self._lock:
+            self._page_lists = {key: pages
+                                for key, pages in self._page_lists.items()
+                                if still_there(key)}
+        self.decoder.clear(still_there)
+        return self.index
+
+    def _index_volume(self, volume, token=None):
+        """Index one volume, an unreadable volume has no magazines."""
+        try:
+            return self._read(volume.images_path, build_magazine_index,
+                              volume.images_path, volume.date_range, token,
+                              priority=BACKGROUND, token=token)
+        except (OSError, ValueError):
+            return {}
+
+    def _read(self, path, func, *args, priority=VISIBLE, token=None):
+        """Return func(*args), a read of path, through the engine."""
+        if self.engine is None:
+            return func(*args)
+        return self.engine.run(path, func, *args, priority=priority,
+                               token=token)
+
+    @property
+    def date_range(self):
+        """Return [first year, last year] of all the magazines."""
+        if not self.index:
+            return ['', '']
+        years = list(self.index)
+        return [str(years[0]), str(years[-1])]
+
+    def base_path(self):
+        """Return the IMAGES folder of the first volume, or ''."""
+        return self.volumes[0].images_path if self.volumes else ''
+
+    def issues(self):
+        """Yield (year, month, magazine folder) in date order."""
+        for yr, months in self.index.items():
+            for mo, path in months.items():
+                yield yr, mo, path
+
+    def issue_path(self, year, month):
+        """
+        Return the folder of a magazine, or None if it is not indexed.
+
+        year may be an int or a str, such as the year of a menu entry.
+        """
+        for yr, months in self.index.items():
+            if str(yr) == str(year):
+                return months.get(month)
+        return None
+
+    def page_list(self, path, token=None, priority=VISIBLE):
+        """
+        Return the pages of the magazine in folder path, cover first.
+
+        The list is read once per scan, then kept.
+
+        Parameters
+        ----------
+        path : str, Path or IsoPath
+            A magazine folder, from the index.
+        token : util_cancel.CancelToken, optional
+            Stop with util_cancel.Cancelled when the magazine or volume
+            changes.
+        priority : int, optional
+            The priority of the read, see util_io.  The default is
+            VISIBLE.
+
+        Returns
+        -------
+        list
+            The pages, as from util_files.build_page_list.  Do not
+            change it.
+
+        """
+        key = str(path)
+        with self._lock:
+            pages = self._page_lists.get(key)
+        if pages is None:
+            pages = self._read(path, build_page_list, path, False, token,
+                               priority=priority, token=token)
+            with self._lock:
+                self._page_lists[key] = pages
+        return pages
+
+    @staticmethod
+    def page_bytes(page):
+        """
+        Return the JPEG data of a page.
+
+        Returns
+        -------
+        bytes or memoryview
+            A page inside a CD image is a view of the mapped image, it
+            is not copied here, only by the caller that reads it.  A
+            page on a CD or in a folder is read into bytes.
+
+        """
+        return as_path(page).read_bytes()
+
+    def decode(self, page, token=None):
+        """Return the decoded image of a page, see PageDecoder."""
+        if self.engine is None:
+            return self.decoder.decode(page, token)
+
+        def read(page):
+            source = _page_file(page)
+            return self._read(source, _read_page, source, token=token)
+        return self.decoder.decode(page, token, read)
+
+    def prefetch(self, page, token=None):
+        """
+        Read and decode a page in the background, into the cache.
+
+        Prefetches wait behind the page the user is looking at, but
+        ahead of indexing.  Without an engine nothing is prefetched.
+
+        Returns
+        -------
+        concurrent.futures.Future or None
+            The decoded page, None if nothing was queued.
+
+        """
+        if self.engine is None or self.decoder.cached(page):
+            return None
+        source = _page_file(page)
+
+        def decode(data):
+            with tracer.span('prefetch', page=page.name):
+                return self.decoder.decode(page, read=lambda p: data,
+                                           prefetch=True)
+        metrics.inc('ngs_prefetches_total')
+        return self.engine.submit(source, _read_page, source,
+                                  priority=PREFETCH, token=token,
+                                  then=decode)
+
+
+def _read_page(page):
+    """Read all the JPEG data of a page, from the CD or image."""
+    # A page inside an image is a view of the mapped file, copy it
+    # so the read happens here and not during the decode.
+    return bytes(as_path(page).read_bytes())
+
+
+def _page_file(page):
+    """Return the file to read for a page, its transcoded copy first."""
+    return transcoded_variant(page) or page
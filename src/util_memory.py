@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+Watch the reader's memory over long reading sessions.
+
+Every page shown is a decoded PIL image of a few MB and a Tk
+PhotoImage of the same size, kept alive by the widget that shows it
+(display.image = img) or by the frame (df.image).  Once the next page
+replaces them they should be freed, a reference left behind anywhere
+leaks a page per turn.  The MemoryProbe looks for that:
+ -- around(event) measures the Python memory traced by tracemalloc
+    before and after each page turn and issue switch, and keeps the
+    growth of each event,
+ -- track(obj, kind) follows the decoded pages and PhotoImages with
+    weak references, counting those still alive, which also covers
+    the pixel buffers tracemalloc does not see, and
+ -- report() gives the mean growth per event, the images alive and
+    the source lines whose memory grew most since the probe started.
+The reader enables it with --memory and prints the report on exit,
+ngs_soak turns pages thousands of times and fails if memory grows.
+
+Without --memory the probe is disabled and around() and track() cost
+a function call.
+
+Created on Mon Feb  2 09:31:58 2026.
+
+@author: Bob
+"""
+import threading
+import tracemalloc
+import weakref
+
+from collections import Counter
+
+
+class _Event:
+    """Measure the traced memory before and after one event."""
+
+    __slots__ = ('probe', 'name', 'before')
+
+    def __init__(self, probe, name):
+        self.probe = probe
+        self.name = name
+
+    def __enter__(self):
+        self.before = tracemalloc.get_traced_memory()[0]
+        return self
+
+    def __exit__(self, *exc):
+        growth = tracemalloc.get_traced_memory()[0] - self.before
+        self.probe._record(self.name, growth)
+        return False
+
+
+class _NoEvent:
+    """The event of a disabled probe, does nothing."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_EVENT = _NoEvent()
+
+
+class MemoryProbe:
+    """
+    Measure memory growth per event and count live images.
+
+    growth holds [count, total bytes, largest] of the growth of the
+    traced memory per event name, a fixed size so the probe does not
+    grow itself, live the images alive per kind and peak_live the most
+    alive at once.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.growth = {}
+        self.live = Counter()
+        self.peak_live = Counter()
+        self._lock = threading.Lock()
+        self._start = None
+        # Counted by start(), an image tracked before it is not
+        # counted when it is freed.
+        self._epoch = 0
+
+    def start(self, frames=5):
+        """
+        Start tracemalloc and enable the probe.
+
+        The growth and live images of an earlier start are forgotten,
+        so each soak in a process is measured on its own.
+
+        Parameters
+        ----------
+        frames : int, optional
+            The stack frames stored per allocation, more frames show
+            more of who allocated, and slow the reader more.  The
+            default is 5.
+
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        with self._lock:
+            self.growth = {}
+            self.live = Counter()
+            self.peak_live = Counter()
+            self._epoch += 1
+        self._start = tracemalloc.take_snapshot()
+        self.enabled = True
+
+    def stop(self):
+        """Disable the probe and stop tracemalloc."""
+        self.enabled = False
+        tracemalloc.stop()
+
+    def around(self, name):
+        """Return a context manager that measures the block as event."""
+        if not self.enabled:
+            return _NO_EVENT
+        return _Event(self, name)
+
+    def _record(self, name, growth):
+        with self._lock:
+            stats = self.growth.get(name)
+            if stats is None:
+                stats = self.growth[name] = [0, 0, growth]
+            stats[0] += 1
+            stats[1] += growth
+            stats[2] = max(stats[2], growth)
+
+    def track(self, obj, kind):
+        """Count obj as a live image of kind until it is freed."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.live[kind] += 1
+            if self.live[kind] > self.peak_live[kind]:
+                self.peak_live[kind] = self.live[kind]
+            epoch = self._epoch
+        weakref.finalize(obj, self._freed, kind, epoch)
+
+    def _freed(self, kind, epoch):
+        with self._lock:
+            if epoch == self._epoch:
+                self.live[kind] -= 1
+
+    def traced(self):
+        """Return the bytes traced by tracemalloc now."""
+        return tracemalloc.get_traced_memory()[0]
+
+    def top_growth(self, limit=10):
+        """
+        Return the source lines whose memory grew most since start().
+
+        Returns
+        -------
+        list
+            tracemalloc.StatisticDiff, largest growth first.
+
+        """
+        if self._start is None or not tracemalloc.is_tracing():
+            return []
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__)])
+        return snapshot.compare_to(self._start, 'lineno')[:limit]
+
+    def report(self, limit=10):
+        """Return the growth per event and the live images as lines."""
+        lines = [f"{'event':<14} {'count':>7} {'mean B':>10} "
+                 f"{'largest KB':>10} {'total KB':>10}"]
+        with self._lock:
+            growth = {name: list(stats)
+                      for name, stats in self.growth.items()}
+            live = dict(self.live)
+            peak = dict(self.peak_live)
+        for name, (count, total, largest) in growth.items():
+            lines.append(f"{name:<14} {count:7d} {total / count:10.0f} "
+                         f"{largest / 1024:10.1f} {total / 1024:10.1f}")
+        for kind in sorted(live):
+            lines.append(f"{kind}: {live[kind]} alive, at most "
+                         f"{peak[kind]}")
+        diffs = self.top_growth(limit)
+        if diffs:
+            lines.append("Largest growth since the start:")
+            lines.extend(f"  {diff}" for diff in diffs)
+        return lines
+
+
+# The reader's memory probe, enabled with --memory.
+probe = MemoryProbe()
@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+"""
+Counters of the reader's reads, decodes and caches, for tuning.
+
+The file, decode and monitor layers count what they do in the module's
+registry, metrics:
+    metrics.inc('ngs_reads_total', device='/media/cdrom', kind='optical')
+    metrics.inc('ngs_read_bytes_total', len(data), ...)
+A count is a dictionary update under a lock, far less than the read
+or decode it counts.  Values that already exist elsewhere, such as the
+queue depths of the PageIOEngine, are registered as gauges, functions
+that are only called when the metrics are read.
+
+The metrics are read as:
+ -- snapshot(), the values with derived rates and ratios as a dict,
+ -- prometheus_text(), the Prometheus text exposition format,
+ -- a file rewritten every few seconds by MetricsWriter, JSON or, for
+    a .prom file, Prometheus text for the node exporter's textfile
+    collector, and
+ -- /metrics and /metrics.json of ngs-server.
+
+Created on Sat Jan 31 09:40:16 2026.
+
+@author: Bob
+"""
+import json
+import threading
+import time
+
+# The metrics counted by the reader, with their help text.
+HELP = {
+    'ngs_reads_total': "Page and index reads.",
+    'ngs_read_bytes_total': "Bytes read.",
+    'ngs_read_seconds_total': "Seconds spent reading.",
+    'ngs_reads_dropped_total': "Queued reads dropped, their page was "
+                               "no longer wanted.",
+    'ngs_io_queue_depth': "Reads waiting for a device.",
+    'ngs_decodes_total': "Pages decoded.",
+    'ngs_decode_seconds_total': "Seconds spent decoding pages.",
+    'ngs_decode_pixels_total': "Pixels decoded.",
+    'ngs_decode_cache_hits_total': "Pages found in the decoded page "
+                                   "cache.",
+    'ngs_decode_cache_misses_total': "Pages not found in the decoded "
+                                     "page cache.",
+    'ngs_prefetches_total': "Pages read and decoded ahead of the user.",
+    'ngs_prefetch_used_total': "Prefetched pages the user turned to.",
+    'ngs_prefetch_wasted_total': "Prefetched pages that left the cache "
+                                 "unseen.",
+    'ngs_cd_probes_total': "Checks of the drive for a NGS CD.",
+    'ngs_cd_probe_seconds_total': "Seconds spent checking the drive.",
+    'ngs_cd_changes_total': "NGS CDs inserted or removed.",
+    'ngs_dispatch_callbacks_total': "Worker results run on the main "
+                                    "loop.",
+    'ngs_dispatch_latency_seconds_total': "Seconds worker results waited "
+                                          "for the main loop.",
+    'ngs_http_requests_total': "HTTP requests answered, by status.",
+    'ngs_rendition_cache_hits_total': "Renditions found in the cache.",
+    'ngs_rendition_cache_misses_total': "Renditions made.",
+    }
+
+
+class Metrics:
+    """
+    A registry of counters and gauges.
+
+    Counters are keyed by name and labels, ngs_reads_total with
+    device='/' is another counter than with device='/media/cdrom'.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+
+    def inc(self, name, value=1, **labels):
+        """Add value to the counter name with labels."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def gauge(self, name, func, kind='gauge'):
+        """
+        Register func as the value of name, called when it is read.
+
+        Parameters
+        ----------
+        name : str
+            The metric name.
+        func : function
+            Returns a number, or a list of (labels, number), labels a
+            dict.  Registering a name again replaces the function.
+        kind : str, optional
+            'gauge', or 'counter' for a count kept elsewhere.  The
+            default is 'gauge'.
+
+        """
+        with self._lock:
+            self._gauges[name] = (func, kind)
+
+    def clear(self):
+        """Reset the counters, the gauges stay registered."""
+        with self._lock:
+            self._counters.clear()
+        self.started = time.time()
+
+    def samples(self):
+        """
+        Return every value, as {name: (kind, [(labels, value)])}.
+
+        labels is a tuple of (label, value) pairs.
+        """
+        with self._lock:
+            counters = list(self._counters.items())
+            gauges = list(self._gauges.items())
+        result = {}
+        for (name, labels), value in sorted(counters):
+            result.setdefault(name, ('counter', []))[1].append(
+                (labels, value))
+        for name, (func, kind) in gauges:
+            try:
+                value = func()
+            except Exception:
+                # A gauge of something that has gone away.
+                continue
+            if isinstance(value, list):
+                values = [(tuple(sorted(labels.items())), v)
+                          for labels, v in value]
+            else:
+                values = [((), value)]
+            result[name] = (kind, values)
+        return result
+
+    def snapshot(self):
+        """Return the values and the derived rates as a JSON-able dict."""
+        samples = self.samples()
+        now = time.time()
+        values = {name: [{'labels': dict(labels), 'value': value}
+                         for labels, value in values]
+                  for name, (kind, values) in samples.items()}
+        return {'time': now, 'uptime': now - self.started,
+                'metrics': values,
+                'derived': derived(samples, now - self.started)}
+
+    def prometheus_text(self):
+        """Return the values in the Prometheus text exposition format."""
+        lines = []
+        for name, (kind, values) in sorted(self.samples().items()):
+            if name in HELP:
+                lines.append(f"# HELP {name} {HELP[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in values:
+                text = ','.join(f'{k}="{_escape(v)}"' for k, v in labels)
+                lines.append(f"{name}{{{text}}} {value}" if text
+                             else f"{name} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    """Escape a label value for the Prometheus text format."""
+    return (str(value).replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'))
+
+
+def _total(samples, name, **match):
+    """Return the sum of name over the labels that match."""
+    kind, values = samples.get(name, ('counter', []))
+    return sum(value for labels, value in values
+               if all(dict(labels).get(k) == v for k, v in match.items()))
+
+
+def _ratio(a, b):
+    return a / b if b else None
+
+
+def derived(samples, uptime):
+    """
+    Return the rates and ratios of the reader's counters.
+
+    Per device: reads per second, MB per second and the mean read
+    latency.  The decode throughput in pages and megapixels per second
+    of decoding, the cache hit ratio and the share of prefetches
+    wasted.
+    """
+    devices = {}
+    for labels, reads in samples.get('ngs_reads_total',
+                                     ('counter', []))[1]:
+        labels = dict(labels)
+        device = labels.get('device', '')
+        seconds = _total(samples, 'ngs_read_seconds_total', **labels)
+        nbytes = _total(samples, 'ngs_read_bytes_total', **labels)
+        devices[device] = {
+            'class': labels.get('kind'),
+            'reads_per_second': _ratio(reads, uptime),
+            'mb_per_second': _ratio(nbytes / 2**20, uptime),
+            'mean_read_ms': _ratio(seconds * 1e3, reads)}
+    decodes = _total(samples, 'ngs_decodes_total')
+    decode_seconds = _total(samples, 'ngs_decode_seconds_total')
+    hits = _total(samples, 'ngs_decode_cache_hits_total')
+    misses = _total(samples, 'ngs_decode_cache_misses_total')
+    prefetches = _total(samples, 'ngs_prefetches_total')
+    wasted = (_total(samples, 'ngs_prefetch_wasted_total')
+              + _total(samples, 'ngs_reads_dropped_total',
+                       priority='prefetch'))
+    return {
+        'devices': devices,
+        'decode_pages_per_second': _ratio(decodes, decode_seconds),
+        'decode_megapixels_per_second': _ratio(
+            _total(samples, 'ngs_decode_pixels_total') / 1e6,
+            decode_seconds),
+        'decode_cache_hit_ratio': _ratio(hits, hits + misses),
+        'prefetch_waste_ratio': _ratio(wasted, prefetches),
+        }
+
+
+def write_metrics(path, registry=None):
+    """Write the metrics to path, Prometheus text for a .prom file."""
+    from util_workers import atomic_write
+    registry = metrics if registry is None else registry
+    if str(path).endswith('.prom'):
+        atomic_write(path, registry.prometheus_text())
+    else:
+        atomic_write(path, json.dumps(registry.snapshot(), indent=1))
+
+
+class MetricsWriter:
+    """
+    Rewrite a metrics file every interval seconds.
+
+    Parameters
+    ----------
+    path : str
+        The file, see write_metrics.
+    interval : float, optional
+        Seconds between writes.  The default is 10.
+    workers : util_workers.WorkerService, optional
+        Runs the writer thread and stops it, after a last write, when
+        the application exits.  The default is a daemon thread stopped
+        with stop().
+    registry : Metrics, optional
+        The default is the module's metrics.
+    """
+
+    def __init__(self, path, interval=10.0, workers=None, registry=None):
+        self.path = path
+        self.interval = interval
+        self.registry = metrics if registry is None else registry
+        self._stopped = threading.Event()
+        if workers is not None:
+            workers.on_stop(self.stop)
+            workers.spawn(self._run, name='metrics writer')
+        else:
+            threading.Thread(target=self._run, daemon=True,
+                             name='metrics writer').start()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.write()
+
+    def write(self):
+        """Write the file now."""
+        try:
+            write_metrics(self.path, self.registry)
+        except OSError:
+            pass
+
+    def stop(self):
+        """Stop the writer, after writing the file a last time."""
+        if not self._stopped.is_set():
+            self._stopped.set()
+            self.write()
+
+
+# The reader's metrics.
+metrics = Metrics()
@@ -9,38 +9,202 @@ Created on Wed Dec 29 13:55:07 2024.
 """
 #
 # Create a class that interacts with Tkinter and monitors itself.
-from threading import Thread
+from threading import Lock
 
 import os
 import queue
+import select
+import sys
 import time
+import tkinter as tk
+
+from util_files import get_directory
+from util_iso import path_exists
+from util_metrics import metrics
+from util_volumes import invalidate_volume_cache, list_volumes
+from util_workers import WorkerService
+
+# Put by cdrom_drawer_monitor when the NGS volumes changed while a NGS
+# CD stayed mounted, True and False when a NGS CD came or went.
+LIBRARY_CHANGED = 'library'
+
+
+class TkDispatcher:
+    """
+    Run callbacks from worker threads on the Tk main loop.
+
+    Worker threads call post(callback, *args).  A callback posted with
+    a util_cancel.CancelToken is dropped if the token was cancelled
+    before it ran, so results for an ejected CD or a magazine the
+    user has left never reach the UI.  The first post after
+    the main loop has caught up wakes the Tk main loop once, and all
+    the callbacks posted until it runs are called together in that one
+    wakeup.  An idle application is never woken.
+
+    Where Tk can watch file descriptors (Linux, macOS) a byte written
+    to a pipe registered with createfilehandler wakes the main loop.
+    Elsewhere the worker generates the virtual event <<NgsDispatch>>,
+    which Tk delivers on the main thread.
+
+    The stats dictionary counts wakeups and callbacks and sums the
+    seconds between post() and the callback running.
+    """
+
+    EVENT = '<<NgsDispatch>>'
+
+    def __init__(self, app):
+        self.app = app
+        self._lock = Lock()
+        self._pending = []
+        self._woken = False
+        self._closed = False
+        self._pipe = None
+        self.stats = {'wakeups': 0, 'callbacks': 0, 'dropped': 0,
+                      'latency_total': 0.0, 'latency_max': 0.0}
+        metrics.gauge('ngs_dispatch_callbacks_total',
+                      lambda: self.stats['callbacks'], 'counter')
+        metrics.gauge('ngs_dispatch_latency_seconds_total',
+                      lambda: self.stats['latency_total'], 'counter')
+        if hasattr(app.tk, 'createfilehandler'):
+            try:
+                r, w = os.pipe()
+                os.set_blocking(r, False)
+                app.tk.createfilehandler(r, tk.READABLE, self._on_pipe)
+                self._pipe = (r, w)
+            except (OSError, tk.TclError):
+                self._pipe = None
+        if self._pipe is None:
+            app.bind(self.EVENT, lambda e: self._run())
+
+    def post(self, callback, *args, token=None):
+        """
+        Call callback(*args) on the Tk main thread.
+
+        Safe to call from any thread.  If token is given and has been
+        cancelled by the time the main loop runs, callback is dropped.
+        After close() the callback is dropped too, so a worker thread
+        finishing while the app exits does not fail.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._pending.append((time.perf_counter(), callback, args,
+                                  token))
+            if self._woken:
+                return
+            self._woken = True
+            if self._pipe is not None:
+                os.write(self._pipe[1], b'x')
+                return
+        try:
+            self.app.event_generate(self.EVENT, when='tail')
+        except (tk.TclError, RuntimeError):
+            # The app was destroyed while this thread was posting.
+            pass
+
+    def _on_pipe(self, fd, mask):
+        """Tk file handler, empty the pipe and run the callbacks."""
+        try:
+            while os.read(fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        self._run()
+
+    def _run(self):
+        """
+        Run every pending callback in one batch.
+
+        Tk does not pass an exception from a file handler to
+        report_callback_exception as it does for after() and bindings,
+        mainloop() raises it and the reader exits.  So an exception from
+        a callback is reported here and the rest of the batch still runs.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, []
+            self._woken = False
+        if not pending:
+            return
+        stats = self.stats
+        stats['wakeups'] += 1
+        now = time.perf_counter()
+        for posted, callback, args, token in pending:
+            if token is not None and token.cancelled:
+                stats['dropped'] += 1
+                continue
+            latency = now - posted
+            stats['callbacks'] += 1
+            stats['latency_total'] += latency
+            if latency > stats['latency_max']:
+                stats['latency_max'] = latency
+            try:
+                callback(*args)
+            except Exception:
+                self.app.report_callback_exception(*sys.exc_info())
+
+    @property
+    def mean_latency(self):
+        """Return the mean seconds from post() to callback."""
+        n = self.stats['callbacks']
+        return self.stats['latency_total'] / n if n else 0.0
+
+    def close(self):
+        """Stop watching the pipe and drop callbacks posted from now on."""
+        with self._lock:
+            self._closed = True
+            self._pending = []
+            pipe, self._pipe = self._pipe, None
+        if pipe is not None:
+            r, w = pipe
+            try:
+                self.app.tk.deletefilehandler(r)
+            except tk.TclError:
+                pass
+            os.close(r)
+            os.close(w)
 
 
 class MonitoredWorker:
     """
     Monitor a threaded worker with a queue listener.
 
-    A class that does work and causes a (tkinter) App to schedule monitoring
-    of the results queue.
+    A class that does work and passes its results to a (tkinter) App.
 
     Internally, this class creates a worker and passes it to a thread for
-    execution. At the same time, this class schedules the App to
-    monitor the queue.
+    execution.  The worker puts its results on a queue with put(), which
+    wakes the App, through a TkDispatcher, to process the queue.
     """
 
-    def __init__(self, app):
+    def __init__(self, app, dispatcher=None):
         self.app = app
         self.queue = queue.Queue()  # The queue is internal to this class.
+        # Share the app's dispatcher, so all workers wake Tk together.
+        if dispatcher is None:
+            dispatcher = getattr(app, 'dispatcher', None)
+        if dispatcher is None:
+            dispatcher = TkDispatcher(app)
+        self.dispatcher = dispatcher
+        # The app's worker service stops the thread when the app exits.
+        self.workers = getattr(app, 'workers', None) or WorkerService()
 
     def start(self):
         """Start the worker thread."""
-        self.thread = Thread(target=self.worker_thread)
-        # Daemonize thread insures cleanup when the main program exits.
-        self.thread.daemon = True
-        self.thread.start()
-        # Start the monitor for the queue.
-        # when I used this, it caused a recursion depth error.
-        # self.app.after(100, self.monitor_queue)
+        self.thread = self.workers.spawn(self.worker_thread,
+                                         name=type(self).__name__)
+
+    @property
+    def stopping(self):
+        """Return True when the worker thread should return."""
+        return self.workers.stopping
+
+    def put(self, result):
+        """
+        Queue a result and wake the app to process it.
+
+        Called from the worker thread.
+        """
+        self.queue.put(result)
+        self.dispatcher.post(self.monitor_queue)
 
     def worker_thread(self):
         """
@@ -54,7 +218,7 @@ class MonitoredWorker:
         is created.
 
         Here is an example of a worker code:
-        while True:
+        while not self.stopping:
             if os.path.exists(self.path):
                 status = 'closed'
             else:
@@ -62,12 +226,15 @@ class MonitoredWorker:
             if self.cdrom_drive_status != status:
                 self.cdrom_drive_status = status
                 s_event = f"CDROM drawer {self.cdrom_drive_status}"
-                self.queue.put(s_event)
-            time.sleep(1)  # Simulate some work being done
+                self.put(s_event)
+            self.workers.wait(1)  # Simulate some work being done
+        The worker should return when self.stopping becomes True,
+        and sleep with self.workers.wait() rather than time.sleep() so
+        it wakes when the application exits.
         The critical piece of the above code is the line
-        "self.queue.put(s_event)" which puts the appropriate value
-        of whatever happens that we are monitoring into a queue that
-        the app monitors in the main queue.
+        "self.put(s_event)" which puts the appropriate value
+        of whatever happens that we are monitoring into a queue and
+        wakes the application to process it.
 
         Returns
         -------
@@ -84,7 +251,8 @@ class MonitoredWorker:
         Process events from the queue.
 
         Process events and pass them to the application app to
-        do something with.
+        do something with.  Called on the Tk main thread by the
+        dispatcher, it handles everything queued so far.
 
         Returns
         -------
@@ -94,8 +262,6 @@ class MonitoredWorker:
         while not self.queue.empty():
             results = self.queue.get()
             self.app.process_results(results)
-        # Check the queue again after 100ms
-        self.app.after(100, self.monitor_queue)
 
 # %% CDROM drawer monitor class implements monitored worker.
 
@@ -110,28 +276,36 @@ class cdrom_drawer_monitor(MonitoredWorker):
 
     """
 
-    def __init__(self, app):
-        super().__init__(app)
+    def __init__(self, app, watcher=None, dispatcher=None):
+        super().__init__(app, dispatcher)
         # not to be confused with app.CD we use a different variable
-        # here to keep app thread and monitor thread separate.
-        self._drive_has_ngs_cd = False
+        # here to keep app thread and monitor thread separate.  None
+        # until the worker has looked for a CD.
+        self._drive_has_ngs_cd = None
+        # The NGS volumes mounted at the last look, a mount event that
+        # changes them changes the library.
+        self._ngs_volumes = frozenset()
 
         self.path = "D:/IMAGES"
-
-        self._cd_state()
-        app.process_results(self._drive_has_ngs_cd)
-        try:
-            self.path = app.ng_base_path
-        except (FileNotFoundError, IOError) as e:
-            print("File error: {}".format(e))
-            pass
+        # Mount events wake the worker, when the OS can report them,
+        # otherwise the worker polls with an adaptive backoff.
+        self.watcher = watcher if watcher is not None else MountWatcher()
+        # The cached volume labels are stale after a mount event.
+        self.watcher.listeners.append(invalidate_volume_cache)
+        # Closing the watcher wakes the worker when the app exits.
+        self.workers.on_stop(self.watcher.close)
+        self.backoff = BackoffPoller()
+        # The first look for a CD is made by the worker thread, so the
+        # window appears without waiting for the drive.
 
     def worker_thread(self):
         """
         Worker thread generates CDROM drawer open and close events.
 
-        It operates in an endless loop as long as the application is
-        running.
+        It operates in a loop until the application exits.  Between
+        tests the worker sleeps until the MountWatcher reports a mount
+        change.  Without mount events it polls, waiting longer between
+        tests the longer nothing changes.
 
         Returns
         -------
@@ -142,28 +316,79 @@ class cdrom_drawer_monitor(MonitoredWorker):
             False indicates the drawer is open or the loaded CD
             is not one of the National Geographic Society CDs.
         """
-        while True:
-            self._cd_state()
-            """
-            if os.path.exists(self.path):
-                status = True
+        # Look on every volume the first time.
+        rescan = True
+        while not self.stopping:
+            if self._cd_state(rescan):
+                self.backoff.reset()
+            if self.watcher.active:
+                # Wait for a mount event, recheck now and then in
+                # case an event was missed.
+                event = self.watcher.wait(self.watcher.timeout)
+                if event == MountWatcher.STOPPED:
+                    break
+                rescan = event
             else:
-                status = False
-            if self._drive_has_ngs_cd != status:
-                self._drive_has_ngs_cd = status
-                s_event = self._drive_has_ngs_cd
-                self.queue.put(s_event)"""
-            time.sleep(1)  # wait one second before testing again.
-
-    def _cd_state(self):
-        if os.path.exists(self.path):
+                self.workers.wait(self.backoff.next())
+                rescan = False
+
+    def _cd_state(self, rescan=False):
+        """
+        Test for a NGS CD and queue an event if the state changed.
+
+        Parameters
+        ----------
+        rescan : bool, optional
+            After a mount event, look for a NGS CD on all volumes if
+            the last known location is gone.  The default is False.
+
+        Returns
+        -------
+        bool
+            True if the state changed.
+
+        Puts True or False when a NGS CD came or went, and
+        LIBRARY_CHANGED when, with a NGS CD still there, the set of
+        mounted NGS volumes changed.  Other mount events, such as a USB
+        stick, put nothing.
+
+        """
+        start = time.perf_counter()
+        found = path_exists(self.path)
+        metrics.inc('ngs_cd_probes_total')
+        metrics.inc('ngs_cd_probe_seconds_total', time.perf_counter() - start)
+        if found:
             status = True
+        elif rescan:
+            path, date_range = get_directory()
+            if path:
+                self.path = path
+            status = bool(path)
         else:
             status = False
         if self._drive_has_ngs_cd != status:
             self._drive_has_ngs_cd = status
+            # Without mount events, a drive state change is the only
+            # sign the volume labels changed.
+            invalidate_volume_cache()
+            metrics.inc('ngs_cd_changes_total')
+            self._ngs_volumes = self._ngs_volume_set()
             s_event = self._drive_has_ngs_cd
-            self.queue.put(s_event)
+            self.put(s_event)
+            return True
+        if status and rescan:
+            volumes = self._ngs_volume_set()
+            if volumes != self._ngs_volumes:
+                self._ngs_volumes = volumes
+                self.put(LIBRARY_CHANGED)
+                return True
+        return False
+
+    @staticmethod
+    def _ngs_volume_set(to_find="NGS"):
+        """Return the (mount point, label) of the NGS volumes mounted."""
+        return frozenset((v.mount_point, v.label) for v in list_volumes()
+                         if to_find in (v.label or ''))
 
     def get(self):
         """
@@ -184,3 +409,214 @@ class cdrom_drawer_monitor(MonitoredWorker):
 
         """
         return self.app.CD
+
+# %% Mount change events.
+
+
+class BackoffPoller:
+    """
+    Polling intervals that grow while nothing changes.
+
+    Each call to next() returns the time to sleep before the next poll.
+    The interval starts at minimum and doubles up to maximum, reset()
+    returns it to minimum after a change was seen.
+    """
+
+    def __init__(self, minimum=0.1, maximum=2.0):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.interval = minimum
+
+    def next(self):
+        """Return the next sleep interval in seconds."""
+        interval = self.interval
+        self.interval = min(self.interval * 2, self.maximum)
+        return interval
+
+    def reset(self):
+        """Start polling quickly again."""
+        self.interval = self.minimum
+
+
+# inotify constants from <sys/inotify.h>
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_ATTRIB = 0x00000004
+_IN_NONBLOCK = os.O_NONBLOCK
+_IN_CLOEXEC = 0o2000000
+
+
+class MountWatcher:
+    """
+    Wait for volumes to be mounted or unmounted.
+
+    On Linux two event sources are used.  inotify reports labels
+    appearing or disappearing in /dev/disk/by-label, and poll() on
+    /proc/self/mountinfo reports every change of the mount table.
+    Both sources are optional, active is False when neither is
+    available (Windows, macOS) and the caller must poll instead.
+
+    Parameters
+    ----------
+    label_dir : str, optional
+        Directory watched with inotify.  The default is
+        '/dev/disk/by-label'.
+    mountinfo : str or None, optional
+        Mount table watched with poll().  None disables it.  The default
+        is '/proc/self/mountinfo'.
+    timeout : float, optional
+        Seconds the monitor waits for an event before it checks the
+        drive anyway.  The default is 30.
+    """
+
+    # Returned by wait() when the watcher was closed.
+    STOPPED = 'stopped'
+
+    def __init__(self, label_dir='/dev/disk/by-label',
+                 mountinfo='/proc/self/mountinfo', timeout=30.0):
+        self.timeout = timeout
+        # Functions called, in the worker thread, after each event.
+        self.listeners = []
+        self._inotify = None
+        self._mountinfo = None
+        self._poll = None
+        self._wake_r = self._wake_w = None
+        # close() closes the descriptors, or leaves them to a thread
+        # in wait() to close when it wakes.
+        self._lock = Lock()
+        self._closed = False
+        self._waiting = False
+        if not sys.platform.startswith('linux') \
+                or not hasattr(select, 'poll'):
+            return
+        self._poll = select.poll()
+        self._inotify = self._open_inotify(label_dir)
+        if self._inotify is not None:
+            self._poll.register(self._inotify, select.POLLIN)
+        if mountinfo:
+            try:
+                self._mountinfo = os.open(mountinfo, os.O_RDONLY)
+                os.read(self._mountinfo, 1 << 16)
+                self._poll.register(self._mountinfo,
+                                    select.POLLPRI | select.POLLERR)
+            except OSError:
+                self._mountinfo = None
+        # A pipe to wake wait() when the watcher is closed.
+        self._wake_r, self._wake_w = os.pipe()
+        self._poll.register(self._wake_r, select.POLLIN)
+
+    @staticmethod
+    def _open_inotify(label_dir):
+        """Return an inotify descriptor watching label_dir, or None."""
+        if not os.path.isdir(label_dir):
+            return None
+        import ctypes
+        try:
+            # The C library is already loaded by Python itself.
+            libc = ctypes.CDLL(None, use_errno=True)
+            fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        except (OSError, AttributeError):
+            return None
+        if fd < 0:
+            return None
+        mask = (_IN_CREATE | _IN_DELETE | _IN_MOVED_FROM | _IN_MOVED_TO
+                | _IN_ATTRIB)
+        if libc.inotify_add_watch(fd, os.fsencode(label_dir), mask) < 0:
+            os.close(fd)
+            return None
+        return fd
+
+    @property
+    def active(self):
+        """Return True if mount events can be received."""
+        return self._inotify is not None or self._mountinfo is not None
+
+    def wait(self, timeout=None):
+        """
+        Wait for the next mount change.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Maximum seconds to wait.  None waits until an event.
+
+        Returns
+        -------
+        bool or str
+            True if a mount change happened, False on timeout, STOPPED
+            if the watcher was closed.
+
+        """
+        with self._lock:
+            if self._closed:
+                return self.STOPPED
+            if not self.active:
+                return False
+            self._waiting = True
+        ms = None if timeout is None else int(timeout * 1000)
+        changed = False
+        try:
+            for fd, mask in self._poll.poll(ms):
+                if fd == self._wake_r:
+                    os.read(fd, 1)
+                    return self.STOPPED
+                if fd == self._inotify:
+                    self._drain(fd)
+                    changed = True
+                elif fd == self._mountinfo:
+                    # Reading the table again rearms poll().
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    self._drain(fd)
+                    changed = True
+        except (OSError, ValueError):
+            return False
+        finally:
+            with self._lock:
+                self._waiting = False
+                if self._closed:
+                    self._close_fds()
+        if changed:
+            for listener in self.listeners:
+                listener()
+        return changed
+
+    @staticmethod
+    def _drain(fd):
+        """Read everything waiting on fd."""
+        try:
+            while os.read(fd, 1 << 16):
+                pass
+        except (BlockingIOError, OSError):
+            pass
+
+    def close(self):
+        """Stop watching and wake any thread blocked in wait()."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            if self._waiting:
+                # The waiting thread closes the descriptors.
+                os.write(self._wake_w, b'x')
+            else:
+                self._close_fds()
+
+    def _close_fds(self):
+        """Close every descriptor, with the lock held."""
+        for fd in (self._inotify, self._mountinfo, self._wake_r,
+                   self._wake_w):
+            if fd is None:
+                continue
+            try:
+                if fd != self._wake_w:
+                    self._poll.unregister(fd)
+            except KeyError:
+                pass
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        self._inotify = self._mountinfo = None
+        self._wake_r = self._wake_w = None
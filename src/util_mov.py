@@ -24,11 +24,13 @@ Created on Wed Jan  7 11:22:33 2026.
 """
 from tkinter import messagebox
 
+import logging
 import os
-import subprocess
 
 
 from util_files import get_directory
+
+log = logging.getLogger(__name__)
 # %%
 
 
@@ -119,10 +121,10 @@ def _play_ngs_mov(folder="EXIT", filename="EXIT01.MOV"):
     #                  "--autoscale")
     # open a windows program with a .MOV file.
     fn = str(get_directory(folder=folder))
-    print("Path name is ", fn)
     pth = os.path.join(fn, filename)
-    print(pth)
+    log.info("Playing %s", pth)
 
+    import subprocess
     sp = subprocess.Popen([
         program_location,
         pth,
@@ -137,7 +139,7 @@ def _play_ngs_mov(folder="EXIT", filename="EXIT01.MOV"):
     # decide to add the credits movie to the exit routine.
     if "EXIT" in folder:
         sp.wait()
-        print("VLC has finished playing!")
+        log.info("VLC has finished playing!")
 
 
 # %%
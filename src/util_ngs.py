@@ -153,3 +153,80 @@ def get_first_mo_yr(mag_mo_yr):
                 mo = m
             j += 1
     return mo, yr
+
+
+# %% Section 3
+# Group the magazine index into decades for the year and month menus.
+
+MONTHS = ['Janurary', 'February', 'March', 'April',
+          'May', 'June', 'July', 'August', 'September',
+          'October', 'November', 'December']
+
+
+def month_number(mo: str):
+    """
+    Return the month number, 1 to 12, of an English month name.
+
+    Parameters
+    ----------
+    mo : str
+        A month name as returned by month() or lmonth().
+
+    Returns
+    -------
+    int
+        The month number, or 13 if the name is not recognized so
+        unknown names sort after December.
+
+    """
+    try:
+        return MONTHS.index(mo) + 1
+    except ValueError:
+        return 13
+
+
+def decade(yr):
+    """
+    Return the decade label of a year, i.e. 1973 returns '1970s'.
+
+    Parameters
+    ----------
+    yr : int or str
+        The year of a magazine, as used for keys of the magazine index.
+
+    Returns
+    -------
+    str
+        The decade the year belongs to.
+
+    """
+    return f"{str(yr)[0:3]}0s"
+
+
+def group_by_decade(mag_mo_yr):
+    """
+    Group the years of a magazine index by decade.
+
+    Parameters
+    ----------
+    mag_mo_yr : dict
+        The index of years and months of the National Geographic
+        magazines, as built by util_files.build_magazine_index.
+
+    Returns
+    -------
+    dict
+        A dictionary keyed by decade label, '1970s', in chronological
+        order.  Each value is the chronologically sorted list of the
+        years in that decade.
+
+    """
+    decades = {}
+    for yr in sorted(mag_mo_yr, key=str):
+        decades.setdefault(decade(yr), []).append(yr)
+    return decades
+
+
+def sorted_months(months):
+    """Return the month names of one year in calendar order."""
+    return sorted(months, key=month_number)
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+Quick-jump command palette for the NGS CD Reader.
+
+The palette is opened with Ctrl+K.  The user types a loose date such
+as "dec 73", "december 1973" or "1973-12 p781" and the palette lists
+the matching magazines on the mounted CD.  Pressing Enter opens the
+selected magazine, and if a page was given, p781, the page whose NGS
+page number is 781.
+
+The search index is built once from the magazine index each time a CD
+is mounted.  Every prefix of every search token of every magazine is
+stored in a dictionary, so each keystroke is a handful of dictionary
+lookups and set intersections instead of a scan of all magazines.
+
+@author: Bob
+"""
+import re
+import tkinter as tk
+from tkinter import ttk
+
+import util_ngs as util
+
+# A page request in the query, p781 or P0781.
+_PAGE = re.compile(r"^p(\d+)$", re.IGNORECASE)
+# An ISO style year-month, 1973-12 or 1973/12.
+_YEAR_MONTH = re.compile(r"^(\d{4})[-/](\d{1,2})$")
+
+
+class IssueSearchIndex():
+    """
+    Incremental prefix search over the magazines of a magazine index.
+
+    Each magazine is described by a set of tokens, the year '1973',
+    the short year '73', the month name 'december', the month number
+    '12' and the NGS folder name '273l'.  A query matches a magazine
+    when every word of the query is a prefix of one of its tokens.
+    """
+
+    def __init__(self, mag_mo_yr):
+        """
+        Build the search index.
+
+        Parameters
+        ----------
+        mag_mo_yr : dict
+            The index of years and months of the National Geographic
+            magazines, as built by util_files.build_magazine_index.
+        """
+        # The magazines in chronological order.
+        self.issues = []
+        self._prefixes = {}
+        # Results of the words of the last query, reused while the
+        # user keeps typing the same query.
+        self._last_words = []
+        self._last_sets = []
+        for yr in sorted(mag_mo_yr, key=str):
+            months = mag_mo_yr[yr]
+            for mo in util.sorted_months(months):
+                self._add(yr, mo, months[mo])
+        self._all = frozenset(range(len(self.issues)))
+
+    def _add(self, yr, mo, path):
+        """Add one magazine and every prefix of its tokens."""
+        i = len(self.issues)
+        self.issues.append((yr, mo, path))
+        mo_no = util.month_number(mo)
+        tokens = {str(yr), str(yr)[-2:], mo.lower(), f"{mo_no}",
+                  f"{mo_no:02d}", f"{yr}-{mo_no:02d}"}
+        # The month names on the CD use an old spelling of January.
+        if mo_no == 1:
+            tokens.add("january")
+        stem = getattr(path, 'stem', None)
+        if stem:
+            tokens.add(str(stem).lower())
+        for token in tokens:
+            for n in range(1, len(token) + 1):
+                self._prefixes.setdefault(token[:n], set()).add(i)
+
+    @staticmethod
+    def parse(query):
+        """
+        Split a query into search words and a requested page number.
+
+        Parameters
+        ----------
+        query : str
+            The text typed in the palette.
+
+        Returns
+        -------
+        words : list
+            The lower case search words.
+        page : int or None
+            The NGS page number requested with p###, if any.
+
+        """
+        words = []
+        page = None
+        for word in query.lower().replace(",", " ").split():
+            m = _PAGE.match(word)
+            if m:
+                page = int(m.group(1))
+                continue
+            m = _YEAR_MONTH.match(word)
+            if m:
+                words.append(m.group(1))
+                words.append(f"{int(m.group(2)):02d}")
+                continue
+            words.append(word)
+        return words, page
+
+    def search(self, query, limit=None):
+        """
+        Return the magazines matching a query.
+
+        Parameters
+        ----------
+        query : str
+            The text typed in the palette.
+        limit : int, optional
+            The maximum number of matches to return.  The default is
+            all of them.
+
+        Returns
+        -------
+        matches : list
+            (year, month, path) tuples in chronological order.
+        page : int or None
+            The NGS page number requested with p###, if any.
+
+        """
+        words, page = self.parse(query)
+        # Reuse the sets of the words that did not change since the
+        # last keystroke, typically all but the word being typed.
+        n = 0
+        while (n < len(words) and n < len(self._last_words)
+               and words[n] == self._last_words[n]):
+            n += 1
+        sets = self._last_sets[:n]
+        for word in words[n:]:
+            sets.append(self._prefixes.get(word, frozenset()))
+        self._last_words, self._last_sets = words, sets
+
+        if not sets:
+            found = self._all
+        else:
+            found = min(sets, key=len)
+            for s in sets:
+                if s is not found:
+                    found = found & s
+        found = sorted(found)
+        if limit is not None:
+            found = found[:limit]
+        return [self.issues[i] for i in found], page
+
+
+def find_page(page_list, page):
+    """
+    Return the position of an NGS page number in a page list.
+
+    Parameters
+    ----------
+    page_list : list
+        Paths of the pages of a magazine, from build_page_list.
+    page : int
+        The NGS page number, the last 4 characters of the file name.
+
+    Returns
+    -------
+    int or None
+        The index of the page in page_list, None if it is not there.
+
+    """
+    target = f"{page:04d}"
+    for i, p in enumerate(page_list):
+        if str(p.stem)[-4:] == target:
+            return i
+    return None
+
+
+class QuickJumpPalette(tk.Toplevel):
+    """
+    A small search window to jump directly to a magazine and page.
+
+    The palette calls open_issue(year, month, path, page) with the
+    selected magazine.  page is None when no p### was typed.
+    """
+
+    def __init__(self, master, index, open_issue, rows=12):
+        super().__init__(master)
+        self.index = index
+        self.open_issue = open_issue
+        self.matches = []
+        self.page = None
+        self.rows = rows
+
+        self.title("Go to magazine")
+        self.transient(master)
+        self.resizable(False, False)
+
+        self.query = tk.StringVar()
+        self.entry = ttk.Entry(self, textvariable=self.query, width=30,
+                               font=('calibre', 12, 'bold'))
+        self.entry.grid(column=0, row=0, padx=4, pady=4, sticky='ew')
+        self.results = tk.Listbox(self, height=rows, activestyle='dotbox',
+                                  font=('calibre', 11))
+        self.results.grid(column=0, row=1, padx=4, pady=4, sticky='nsew')
+
+        self.query.trace_add('write', self._update)
+        self.entry.bind('<Return>', self._open)
+        self.entry.bind('<Down>', lambda e: self._move(1))
+        self.entry.bind('<Up>', lambda e: self._move(-1))
+        self.results.bind('<Double-Button-1>', self._open)
+        self.bind('<Escape>', lambda e: self.destroy())
+
+        self._update()
+        self.entry.focus_set()
+
+    def _update(self, *args):
+        """Refresh the list of matches after each keystroke."""
+        self.matches, self.page = self.index.search(self.query.get(),
+                                                    limit=self.rows * 4)
+        self.results.delete(0, 'end')
+        for yr, mo, path in self.matches:
+            self.results.insert('end', f"{mo} {yr}")
+        if self.matches:
+            self.results.selection_set(0)
+            self.results.activate(0)
+
+    def _move(self, step):
+        """Move the selection up or down the list of matches."""
+        if not self.matches:
+            return
+        cur = self.results.curselection()
+        i = (cur[0] if cur else 0) + step
+        i = max(0, min(i, len(self.matches) - 1))
+        self.results.selection_clear(0, 'end')
+        self.results.selection_set(i)
+        self.results.activate(i)
+        self.results.see(i)
+
+    def _open(self, event=None):
+        """Open the selected magazine and close the palette."""
+        cur = self.results.curselection()
+        if not self.matches:
+            return
+        yr, mo, path = self.matches[cur[0] if cur else 0]
+        page = self.page
+        self.destroy()
+        self.open_issue(yr, mo, path, page)
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""
+Profile the reader by user action, on the user's own machine.
+
+A slow reader is often only slow on the machine with the CD drive, so
+the reader can profile itself, started with --profile.  The code of
+each user action is run under cProfile, one profile per kind of
+action:
+ -- 'mount', indexing the volumes after a CD is inserted and building
+    the menus,
+ -- 'issue_open', listing and showing a magazine, and
+ -- 'page_turn', reading, decoding and showing a page.
+The parts of an action that run in a worker thread and on the main
+loop are profiled into the same profile, but cProfile only sees the
+thread it runs in, work handed on to a pool, such as indexing each
+volume of a mount, shows as the wait for its results.  On exit every
+profile is written as a pstats file, ACTION.pstats, with
+session.pstats holding all of them, and summary() gives the functions
+that took the most time, to paste in a bug report.  The files open with
+    python -m pstats page_turn.pstats
+or snakeviz.
+
+Only one action is profiled at a time, another action that starts
+meanwhile runs without the profiler and is counted as missed.
+Without --profile the profiler is disabled and action() costs a
+function call.
+
+Created on Sun Feb  1 15:08:31 2026.
+
+@author: Bob
+"""
+import os
+import threading
+import time
+
+# The actions profiled by the reader.
+ACTIONS = ('mount', 'issue_open', 'page_turn')
+
+
+def _add(counts, name, value):
+    counts[name] = counts.get(name, 0) + value
+
+
+class _Action:
+    """Profile one block into the profile of an action."""
+
+    __slots__ = ('profiler', 'name', 'start', 'profile', 'began')
+
+    def __init__(self, profiler, name, start):
+        self.profiler = profiler
+        self.name = name
+        self.start = start
+        self.profile = None
+
+    def __enter__(self):
+        profiler = self.profiler
+        if self.start:
+            _add(profiler.counts, self.name, 1)
+        if not profiler._lock.acquire(blocking=False):
+            _add(profiler.missed, self.name, 1)
+            return self
+        profile = profiler.profile(self.name)
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is active, in Python 3.12 and later
+            # only one can be.
+            profiler._lock.release()
+            _add(profiler.missed, self.name, 1)
+            return self
+        self.profile = profile
+        self.began = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.profile is not None:
+            self.profile.disable()
+            _add(self.profiler.seconds, self.name,
+                 time.perf_counter() - self.began)
+            self.profiler._lock.release()
+        return False
+
+
+class _NoAction:
+    """The action of a disabled profiler, does nothing."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_ACTION = _NoAction()
+
+
+class ActionProfiler:
+    """
+    Keep a cProfile profile per user action.
+
+    counts holds the actions started, seconds the seconds profiled and
+    missed the blocks that ran unprofiled, per action.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.counts = {}
+        self.seconds = {}
+        self.missed = {}
+        self._profiles = {}
+        self._lock = threading.Lock()
+
+    def action(self, name, start=True):
+        """
+        Return a context manager that profiles the block as action name.
+
+        Parameters
+        ----------
+        name : str
+            The action, one of ACTIONS.
+        start : bool, optional
+            The block starts an action.  False for a later part of the
+            same action, such as the part a worker hands back to the
+            main loop, it is profiled but not counted again.  The
+            default is True.
+
+        """
+        if not self.enabled:
+            return _NO_ACTION
+        return _Action(self, name, start)
+
+    def profile(self, name):
+        """Return the cProfile.Profile of an action, made on first use."""
+        profile = self._profiles.get(name)
+        if profile is None:
+            import cProfile
+            profile = self._profiles[name] = cProfile.Profile()
+        return profile
+
+    def stats(self, name=None):
+        """
+        Return the pstats.Stats of an action, or of the whole session.
+
+        Returns
+        -------
+        pstats.Stats or None
+            None if nothing was profiled.
+
+        """
+        import pstats
+        names = [name] if name is not None else list(self._profiles)
+        profiles = [self._profiles[n] for n in names if n in self._profiles]
+        if not profiles:
+            return None
+        return pstats.Stats(*profiles)
+
+    def dump(self, folder):
+        """
+        Write ACTION.pstats of each action and session.pstats to folder.
+
+        Returns
+        -------
+        list
+            The files written.
+
+        """
+        os.makedirs(folder, exist_ok=True)
+        written = []
+        for name in list(self._profiles) + [None]:
+            stats = self.stats(name)
+            if stats is None:
+                continue
+            path = os.path.join(folder, f"{name or 'session'}.pstats")
+            stats.dump_stats(path)
+            written.append(path)
+        return written
+
+    def summary(self, top=10):
+        """
+        Return the actions and their slowest functions as lines of text.
+
+        Parameters
+        ----------
+        top : int, optional
+            The functions listed per action, by cumulative time.  The
+            default is 10.
+
+        """
+        lines = []
+        for name in sorted(self._profiles, key=lambda n: (
+                n not in ACTIONS, ACTIONS.index(n) if n in ACTIONS else n)):
+            count = self.counts.get(name, 0)
+            seconds = self.seconds.get(name, 0.0)
+            lines.append(f"{name}: {count} actions, {seconds:.3f} s "
+                         f"profiled, {self.missed.get(name, 0)} blocks "
+                         f"missed")
+            lines.append(f"  {'cumulative':>10} {'own':>9} {'calls':>7}  "
+                         f"function")
+            entries = sorted(self.stats(name).stats.items(),
+                             key=lambda item: -item[1][3])
+            for (file, line, function), (cc, nc, tt, ct, callers) in \
+                    entries[:top]:
+                # Built in functions have no file.
+                if line:
+                    function += f" ({os.path.basename(file)}:{line})"
+                lines.append(f"  {ct * 1e3:8.1f}ms {tt * 1e3:7.1f}ms "
+                             f"{nc:7d}  {function}")
+        return lines
+
+
+# The reader's profiler, enabled with --profile.
+profiler = ActionProfiler()
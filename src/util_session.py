@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+Save the reader's session on exit and restore it on the next start.
+
+Without a snapshot the reader has to wait for the CD drive to spin up,
+index the volume and read the first cover before it shows anything,
+and then it shows the first magazine on the CD, not the page the user
+was reading.  On exit the reader saves:
+ -- the labels of the NGS volumes it was reading,
+ -- the magazine index of those volumes, as [year, month, path] rows,
+ -- the year, month, folder and page of the open magazine, and
+ -- the page itself, as a JPEG rendition.
+On the next start the rendition and the menus are shown at once from
+the snapshot.  The drive monitor then reads the actual volumes in the
+background, and the app reconciles: the saved magazine and page are
+reopened from the volume if it is still there.  The same magazine on
+a volume with another label, another disc, is opened at its cover,
+its pages may differ.  Otherwise the first magazine is shown as
+before.
+
+The snapshot is kept in a per-user cache folder, or in the folder
+named by the NGS_SESSION_DIR environment variable.  The files are
+written with atomic_write(), so a reader killed while saving leaves
+the previous snapshot.
+
+Created on Fri Jan 23 09:12:37 2026.
+
+@author: Bob
+"""
+import io
+import json
+import os
+import sys
+
+from util_workers import atomic_write
+
+SESSION_FILE = 'session.json'
+PAGE_FILE = 'page.jpg'
+# Change when the snapshot format changes, older snapshots are ignored.
+SESSION_VERSION = 1
+
+
+def session_dir():
+    """Return the folder that holds the snapshot."""
+    folder = os.environ.get('NGS_SESSION_DIR')
+    if folder:
+        return folder
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+    else:
+        base = (os.environ.get('XDG_CACHE_HOME')
+                or os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(base, 'NGS_CD_Reader')
+
+
+def save_session(index, year, month, page, issue_path, labels=(),
+                 page_image=None, folder=None):
+    """
+    Save the open magazine and page, the index and a page rendition.
+
+    Parameters
+    ----------
+    index : dict
+        The magazine index, {year: {month: path}}.
+    year : int or str
+        The year of the open magazine.
+    month : str
+        The month of the open magazine.
+    page : int
+        The page open in that magazine, 0 is the cover.
+    issue_path : Path or IsoPath
+        The folder of the open magazine.
+    labels : list, optional
+        The labels of the volumes the index was read from.
+    page_image : PIL.Image.Image, optional
+        The page shown, saved as the rendition shown on the next
+        start.  The default saves no rendition.
+    folder : str, optional
+        Where to save.  The default is session_dir().
+
+    Returns
+    -------
+    None.
+
+    """
+    folder = session_dir() if folder is None else folder
+    os.makedirs(folder, exist_ok=True)
+    rendition = os.path.join(folder, PAGE_FILE)
+    if page_image is not None:
+        buffer = io.BytesIO()
+        page_image.convert('RGB').save(buffer, 'JPEG', quality=90)
+        atomic_write(rendition, buffer.getvalue())
+    elif os.path.exists(rendition):
+        # An old rendition would show the wrong page.
+        os.remove(rendition)
+    session = {
+        'version': SESSION_VERSION,
+        'labels': list(labels),
+        'year': str(year),
+        'month': month,
+        'page': int(page),
+        'issue_path': str(issue_path),
+        'index': [[yr, mo, str(path)] for yr, months in index.items()
+                  for mo, path in months.items()],
+        }
+    atomic_write(os.path.join(folder, SESSION_FILE), json.dumps(session))
+
+
+def load_session(folder=None):
+    """
+    Load the snapshot saved by save_session.
+
+    Parameters
+    ----------
+    folder : str, optional
+        Where the snapshot was saved.  The default is session_dir().
+
+    Returns
+    -------
+    dict or None
+        None if there is no usable snapshot.  Otherwise 'labels',
+        'year', 'month', 'page' and 'issue_path' as saved, 'index' as
+        {year: {month: path}} with the paths as str, and 'rendition',
+        the path of the page JPEG or None.
+
+    """
+    folder = session_dir() if folder is None else folder
+    try:
+        with open(os.path.join(folder, SESSION_FILE),
+                  encoding='utf-8') as f:
+            session = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (not isinstance(session, dict)
+            or session.get('version') != SESSION_VERSION):
+        return None
+    index = {}
+    for yr, mo, path in session['index']:
+        index.setdefault(yr, {})[mo] = path
+    session['index'] = index
+    rendition = os.path.join(folder, PAGE_FILE)
+    session['rendition'] = rendition if os.path.exists(rendition) else None
+    return session
+
+
+def find_issue(index, year, month):
+    """
+    Return the folder of a saved magazine in a new index, or None.
+
+    The saved year is a str, the index years may be int.
+    """
+    for yr, months in index.items():
+        if str(yr) == str(year):
+            return months.get(month)
+    return None
+
+
+def saved_page(session, sources):
+    """
+    Return the saved page to reopen the saved magazine at, or 0.
+
+    Parameters
+    ----------
+    session : dict
+        The snapshot, from load_session.
+    sources : dict
+        {(year, month): volume} of the volumes read now, see
+        MagazineLibrary.sources.
+
+    Returns
+    -------
+    int
+        The saved page if the magazine is read from a volume with one
+        of the saved labels, else 0, the cover.
+
+    """
+    for (yr, mo), volume in sources.items():
+        if str(yr) == str(session['year']) and mo == session['month']:
+            if volume.label in session.get('labels', ()):
+                return session['page']
+            break
+    return 0
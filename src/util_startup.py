@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""
+Startup timing for the NGS CD Reader.
+
+The reader should show its window quickly, the heavy modules (PIL,
+psutil, win32api, subprocess, concurrent.futures) are imported when
+first used instead of at startup.  This module keeps it that way:
+ -- mark() records named points of the startup, such as the first
+    window appearing, in seconds since this module was imported,
+ -- ImportTimer records how long each module import took, like
+    python -X importtime, and report() prints both, and
+ -- check_startup_budget() starts the reader in a new process and
+    fails when the time to its first window is over a budget.
+
+Run from the command line to check the budget:
+    python util_startup.py --budget 2.0
+The exit status is 1 when the reader took longer than the budget.
+
+Created on Thu Jan 22 11:03:44 2026.
+
+@author: Bob
+"""
+import sys
+import time
+
+# As close to the start of the process as this module gets imported.
+_T0 = time.perf_counter()
+
+# (name, seconds since _T0) of each mark().
+marks = []
+
+_import_timer = None
+
+
+def mark(name):
+    """Record that the startup reached the point called name."""
+    marks.append((name, time.perf_counter() - _T0))
+
+
+class _TimedLoader:
+    """Wrap a module loader to time the execution of the module."""
+
+    def __init__(self, loader, timer):
+        self._loader = loader
+        self._timer = timer
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        self._timer._enter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._timer._leave(module.__name__)
+
+
+class ImportTimer:
+    """
+    Time every module imported while installed.
+
+    records holds (name, self seconds, cumulative seconds, depth) in
+    the order the imports finished, as python -X importtime prints.
+    """
+
+    def __init__(self):
+        self.records = []
+        self._stack = []
+
+    def install(self):
+        """Start timing imports."""
+        if self not in sys.meta_path:
+            sys.meta_path.insert(0, self)
+
+    def uninstall(self):
+        """Stop timing imports."""
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def find_spec(self, name, path, target=None):
+        """Find the module with the other finders and wrap its loader."""
+        for finder in sys.meta_path:
+            if finder is self:
+                continue
+            find_spec = getattr(finder, 'find_spec', None)
+            if find_spec is None:
+                continue
+            spec = find_spec(name, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+            spec.loader = _TimedLoader(spec.loader, self)
+        return spec
+
+    def _enter(self):
+        # [start time, seconds spent in nested imports]
+        self._stack.append([time.perf_counter(), 0.0])
+
+    def _leave(self, name):
+        start, nested = self._stack.pop()
+        total = time.perf_counter() - start
+        if self._stack:
+            self._stack[-1][1] += total
+        self.records.append((name, total - nested, total, len(self._stack)))
+
+
+def enable_import_timer():
+    """Install an ImportTimer for the rest of the startup."""
+    global _import_timer
+    if _import_timer is None:
+        _import_timer = ImportTimer()
+        _import_timer.install()
+    return _import_timer
+
+
+def report(file=None, top=15):
+    """
+    Print the startup marks and the slowest imports.
+
+    Parameters
+    ----------
+    file : file object, optional
+        Where to print.  The default is sys.stderr.
+    top : int, optional
+        The number of imports to list.  The default is 15.
+
+    Returns
+    -------
+    None.
+
+    """
+    file = sys.stderr if file is None else file
+    print("Startup (seconds since start):", file=file)
+    for name, t in marks:
+        print(f"  {t:8.3f}  {name}", file=file)
+    if _import_timer is None or not _import_timer.records:
+        return
+    print(f"Slowest imports (top {top}, microseconds):", file=file)
+    print("      self | cumulative | module", file=file)
+    slowest = sorted(_import_timer.records, key=lambda r: r[2],
+                     reverse=True)[:top]
+    for name, own, total, depth in slowest:
+        print(f"  {own * 1e6:8.0f} | {total * 1e6:10.0f} | "
+              f"{'  ' * depth}{name}", file=file)
+
+
+def first_window(app, check=False):
+    """
+    Mark the first time app's window is shown.
+
+    Parameters
+    ----------
+    app : tk.Tk
+        The application window.
+    check : bool, optional
+        For check_startup_budget, print the wall clock time the window
+        appeared and close the application.  The default is False.
+
+    Returns
+    -------
+    None.
+
+    """
+    def shown(event):
+        if event.widget is not app or any(m[0] == 'first window'
+                                          for m in marks):
+            return
+        mark('first window')
+        if check:
+            print(f"first window {time.time():.6f}", flush=True)
+            app.after_idle(app.exit)
+        elif _import_timer is not None:
+            report()
+    app.bind('<Map>', shown, add='+')
+
+
+def check_startup_budget(budget=2.0, script=None, runs=3):
+    """
+    Start the reader in new processes and time its first window.
+
+    The reader is started with --startup-check, it prints the wall
+    clock time its window appeared and exits.  The time measured here
+    includes starting Python, but not a cold disk cache, which can
+    not be emptied without administrator rights.
+
+    Parameters
+    ----------
+    budget : float, optional
+        The allowed seconds from process start to the first window.
+        The default is 2.0.
+    script : str, optional
+        The reader script.  The default is NGS_CD_Reader.py next to
+        this module.
+    runs : int, optional
+        The number of starts, the fastest one is compared with the
+        budget, to ignore a busy machine.  The default is 3.
+
+    Returns
+    -------
+    ok : bool
+        True if the fastest start was within budget.
+    seconds : float
+        The fastest time to the first window.
+
+    """
+    import os
+    import subprocess
+
+    if script is None:
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              'NGS_CD_Reader.py')
+    best = None
+    for i in range(max(1, runs)):
+        start = time.time()
+        out = subprocess.run([sys.executable, script, '--startup-check'],
+                             capture_output=True, text=True, timeout=60,
+                             cwd=os.path.dirname(script))
+        if out.returncode != 0 or 'first window' not in out.stdout:
+            raise RuntimeError(f"The reader did not start:\n{out.stderr}")
+        # The reader prints the wall clock time its window appeared.
+        shown = float(out.stdout.split('first window')[1].split()[0])
+        seconds = shown - start
+        best = seconds if best is None else min(best, seconds)
+    return best <= budget, best
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Fail if the NGS reader's first window is too slow.")
+    parser.add_argument('--budget', type=float, default=2.0,
+                        help="allowed seconds to the first window")
+    parser.add_argument('--runs', type=int, default=3,
+                        help="number of starts, the fastest is used")
+    args = parser.parse_args()
+    ok, seconds = check_startup_budget(args.budget, runs=args.runs)
+    print(f"First window after {seconds:.3f}s, budget {args.budget:.3f}s:"
+          f" {'ok' if ok else 'TOO SLOW'}")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+Time the stages of each page turn.
+
+When a page turn feels slow the time can go to reading the CD, decoding
+the JPEG, converting it to a Tk PhotoImage or laying out the window.
+The reader wraps each stage in a span:
+    with tracer.span('decode'):
+        image.load()
+A span records its name, start, duration and thread in a ring buffer
+of the last spans, so tracing costs two clock reads and an append and
+can stay on.  The stages of a turn are nested in a 'page_turn' span.
+
+stage_stats() gives the p50 and p95 of each stage, shown by the reader
+in its debug overlay (F12), and export_chrome() writes the spans as
+Chrome trace events, to open in chrome://tracing or Perfetto.
+
+Created on Thu Jan 29 09:26:40 2026.
+
+@author: Bob
+"""
+import json
+import os
+import threading
+import time
+
+from collections import deque
+
+# The stages of a page turn, in the order they run.
+STAGES = ('page_turn', 'read', 'decode', 'photoimage', 'layout')
+
+
+class _Span:
+    """A running span, records itself in the tracer when it ends."""
+
+    __slots__ = ('tracer', 'name', 'args', 'start')
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        self.tracer.spans.append((self.name, self.start, end - self.start,
+                                  threading.get_ident(), self.args))
+        return False
+
+
+class _NoSpan:
+    """The span of a disabled tracer, does nothing."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+class Tracer:
+    """
+    Keep the last spans in a ring buffer.
+
+    Parameters
+    ----------
+    capacity : int, optional
+        The number of spans kept.  The default is 5000, about 1000
+        page turns.
+    enabled : bool, optional
+        Record spans.  The default is True.
+    """
+
+    def __init__(self, capacity=5000, enabled=True):
+        # deque.append is thread safe, spans end in worker threads too.
+        self.spans = deque(maxlen=capacity)
+        self.enabled = enabled
+        self._t0 = time.perf_counter()
+
+    def span(self, name, **args):
+        """Return a context manager that times the block as name."""
+        if not self.enabled:
+            return _NO_SPAN
+        return _Span(self, name, args)
+
+    def clear(self):
+        """Forget the recorded spans."""
+        self.spans.clear()
+
+    def durations(self, name):
+        """Return the recorded durations of name, in seconds."""
+        return [s[2] for s in list(self.spans) if s[0] == name]
+
+    def stage_stats(self, stages=STAGES):
+        """
+        Return the count, p50 and p95 in seconds of each stage.
+
+        Returns
+        -------
+        dict
+            {stage: (count, p50, p95)}, stages without spans are left
+            out.
+
+        """
+        stats = {}
+        for stage in stages:
+            durations = sorted(self.durations(stage))
+            if durations:
+                n = len(durations)
+                stats[stage] = (n, durations[n // 2],
+                                durations[min(n - 1, int(0.95 * n))])
+        return stats
+
+    def chrome_events(self):
+        """Return the spans as Chrome trace 'complete' events."""
+        pid = os.getpid()
+        return [{'name': name, 'cat': 'ngs', 'ph': 'X',
+                 'ts': (start - self._t0) * 1e6, 'dur': duration * 1e6,
+                 'pid': pid, 'tid': tid,
+                 'args': {k: str(v) for k, v in args.items()}}
+                for name, start, duration, tid, args in list(self.spans)]
+
+    def export_chrome(self, path):
+        """Write the spans to path as a Chrome trace JSON file."""
+        from util_workers import atomic_write
+        atomic_write(path, json.dumps({'traceEvents': self.chrome_events(),
+                                       'displayTimeUnit': 'ms'}))
+
+
+# The reader's tracer.
+tracer = Tracer()
@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+"""
+Find the mounted volumes and their labels.
+
+The NGS CDs are recognized by their volume label, NGS_1973_1976.  On
+Windows the label comes from win32api.GetVolumeInformation.  On Linux
+the label is read, without touching the drive when possible, from
+ -- /dev/disk/by-label, maintained by udev,
+ -- the ISO9660 primary volume descriptor of the device, for CDs
+    without a udev label, or
+ -- the name of the mount point, /media/bob/NGS_1973_1976, which is
+   how desktops and bind mounts name a volume.
+Other systems use the name of the mount point.
+
+Looking up labels can block on an empty or spinning drive, so the
+volume list is cached until invalidate_volume_cache() is called by a
+mount event.  Labels are also cached per (device, mount point, inode)
+of the volume root, so a relisted volume that did not change is not
+read again.
+
+Created on Sat Jan 17 09:12:40 2026.
+
+@author: Bob
+"""
+import os
+import re
+import sys
+import threading
+
+from collections import namedtuple
+
+Volume = namedtuple('Volume', ['device', 'mount_point', 'label', 'fstype'])
+
+# File systems that never hold a NGS CD.
+_PSEUDO_FS = {'proc', 'sysfs', 'devtmpfs', 'devpts', 'tmpfs', 'cgroup',
+              'cgroup2', 'mqueue', 'securityfs', 'debugfs', 'tracefs',
+              'pstore', 'bpf', 'configfs', 'fusectl', 'hugetlbfs',
+              'autofs', 'binfmt_misc', 'efivarfs', 'rpc_pipefs', 'nsfs',
+              'selinuxfs', 'ramfs', 'squashfs', 'overlay'}
+# CD and DVD file systems whose label is in the volume descriptor.
+_OPTICAL_FS = {'iso9660', 'udf'}
+
+_SECTOR = 2048
+
+_lock = threading.Lock()
+_volumes = None
+_labels = {}
+
+
+def invalidate_volume_cache():
+    """
+    Forget the cached volume list.
+
+    Called when a volume is mounted or unmounted.  Cached labels stay,
+    they are keyed by the mount point inode and are only used again
+    for the same volume.
+    """
+    global _volumes
+    with _lock:
+        _volumes = None
+
+
+def list_volumes():
+    """
+    Return the mounted volumes.
+
+    The list is cached until invalidate_volume_cache() is called.
+
+    Returns
+    -------
+    list
+        A list of Volume(device, mount_point, label, fstype) tuples.
+        label is '' when no label was found.
+
+    """
+    global _volumes
+    with _lock:
+        volumes = _volumes
+    if volumes is None:
+        if sys.platform.startswith('linux'):
+            volumes = _linux_volumes()
+        elif sys.platform == 'win32':
+            volumes = _windows_volumes()
+        else:
+            volumes = _other_volumes()
+        with _lock:
+            _volumes = volumes
+    return volumes
+
+
+def find_volume(to_find="NGS"):
+    """
+    Return the first mounted volume whose label contains to_find.
+
+    Parameters
+    ----------
+    to_find : str, optional
+        A string identifying a volume label or partial label.
+        The default is "NGS".
+
+    Returns
+    -------
+    Volume or None
+        The volume, or None if no label contains to_find.
+
+    """
+    for volume in list_volumes():
+        if to_find in volume.label:
+            return volume
+    return None
+
+
+def _cached_label(device, mount_point, read_label):
+    """Return the label of a volume, reading it only once."""
+    try:
+        st = os.stat(mount_point)
+    except OSError:
+        return ''
+    # CD file systems can reuse the root inode number from disc to
+    # disc, the root directory time tells the discs apart.
+    key = (device, mount_point, st.st_ino, st.st_mtime_ns)
+    with _lock:
+        if key in _labels:
+            return _labels[key]
+    label = read_label() or ''
+    with _lock:
+        _labels[key] = label
+    return label
+
+# %% Linux
+
+
+def _unescape(field):
+    """Decode the octal escapes, \\040, of a mountinfo field."""
+    if '\\' not in field:
+        return field
+    # Not unicode_escape, it decodes the UTF-8 of a label as Latin-1.
+    return re.sub(r'\\([0-7]{3})', lambda m: chr(int(m.group(1), 8)),
+                  field)
+
+
+def _read_mountinfo(path='/proc/self/mountinfo'):
+    """
+    Parse the mount table.
+
+    Returns
+    -------
+    list
+        (device, mount_point, fstype, root) tuples, root is the
+        directory of the device that is mounted, '/' unless it is a
+        bind mount.
+
+    """
+    mounts = []
+    try:
+        with open(path) as f:
+            lines = f.readlines()
+    except OSError:
+        return mounts
+    for line in lines:
+        fields = line.split()
+        try:
+            sep = fields.index('-')
+            root = _unescape(fields[3])
+            mount_point = _unescape(fields[4])
+            fstype, device = fields[sep + 1], _unescape(fields[sep + 2])
+        except (ValueError, IndexError):
+            continue
+        mounts.append((device, mount_point, fstype, root))
+    return mounts
+
+
+def _by_label(label_dir='/dev/disk/by-label'):
+    """Return a dictionary of device path to label from udev."""
+    labels = {}
+    try:
+        names = os.listdir(label_dir)
+    except OSError:
+        return labels
+    for name in names:
+        device = os.path.realpath(os.path.join(label_dir, name))
+        # udev escapes spaces and slashes as \x20 and \x2f.
+        labels[device] = re.sub(r'\\x([0-9a-fA-F]{2})',
+                                lambda m: chr(int(m.group(1), 16)), name)
+    return labels
+
+
+def read_pvd_label(device):
+    """
+    Read the volume label from an ISO9660 primary volume descriptor.
+
+    Parameters
+    ----------
+    device : str
+        A CD device, /dev/sr0, or an ISO image file.
+
+    Returns
+    -------
+    str
+        The volume identifier, '' if device has no ISO9660 descriptor
+        or can not be read.
+
+    """
+    try:
+        with open(device, 'rb') as f:
+            f.seek(16 * _SECTOR)
+            pvd = f.read(_SECTOR)
+    except OSError:
+        return ''
+    if len(pvd) < 72 or pvd[0] != 1 or pvd[1:6] != b'CD001':
+        return ''
+    return pvd[40:72].decode('ascii', 'replace').strip()
+
+
+def _linux_volumes():
+    """List the Linux mounts that could hold a NGS CD."""
+    udev = _by_label()
+    volumes = []
+    for device, mount_point, fstype, root in _read_mountinfo():
+        if fstype in _PSEUDO_FS:
+            continue
+
+        def read_label(device=device, mount_point=mount_point,
+                       fstype=fstype, root=root):
+            if root == '/':
+                label = udev.get(os.path.realpath(device))
+                if label:
+                    return label
+                if fstype in _OPTICAL_FS:
+                    label = read_pvd_label(device)
+                    if label:
+                        return label
+            return os.path.basename(mount_point.rstrip('/'))
+        label = _cached_label(device, mount_point, read_label)
+        volumes.append(Volume(device, mount_point, label, fstype))
+    return volumes
+
+# %% Windows and other systems.
+
+
+def _windows_volumes():
+    """List the Windows drives and their labels."""
+    import psutil
+    import win32api
+
+    volumes = []
+    for partition in psutil.disk_partitions():
+        drive = partition.device
+
+        def read_label(drive=drive):
+            try:
+                return win32api.GetVolumeInformation(drive)[0]
+            except Exception:
+                return ''
+        label = _cached_label(drive, partition.mountpoint, read_label)
+        volumes.append(Volume(drive, partition.mountpoint, label,
+                              partition.fstype))
+    return volumes
+
+
+def _other_volumes():
+    """List the volumes of macOS and other systems by mount point."""
+    import psutil
+
+    volumes = []
+    for partition in psutil.disk_partitions():
+        mount_point = partition.mountpoint
+        label = _cached_label(
+            partition.device, mount_point,
+            lambda m=mount_point: os.path.basename(m.rstrip('/')))
+        volumes.append(Volume(partition.device, mount_point, label,
+                              partition.fstype))
+    return volumes
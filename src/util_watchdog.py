@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+Find the work that freezes the reader's window.
+
+Tk runs every event, redraw and callback on the main thread, anything
+that blocks it, a slow CD read or a walk of the IMAGES folder, freezes
+the window until it returns.  The StallWatchdog measures how quickly
+the main loop answers:
+ -- the main loop runs a heartbeat every interval seconds with
+    app.after(), and each beat notes how late it ran,
+ -- a watchdog thread checks the time of the last beat, when the main
+    loop is more than threshold seconds late it captures the main
+    thread's stack with sys._current_frames(), which shows the
+    function that is blocking, and logs it once the loop catches up,
+ -- every late beat is counted in a histogram of stall lengths.
+The stalls with their stacks and the histogram are kept, report()
+formats them, so blocking work can be found and moved to a worker.
+
+The heartbeat wakes the main loop interval times a second, the reader
+only starts the watchdog with --watchdog.
+
+Created on Fri Jan 30 10:12:37 2026.
+
+@author: Bob
+"""
+import logging
+import sys
+import threading
+import time
+import traceback
+
+from bisect import bisect_right
+from collections import deque
+
+log = logging.getLogger(__name__)
+
+# The histogram buckets, a stall of at least BUCKETS[i] seconds and
+# less than BUCKETS[i + 1] is counted in bucket i.
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0)
+
+
+class StallWatchdog:
+    """
+    Measure the main loop's responsiveness and catch what blocks it.
+
+    Parameters
+    ----------
+    app : tkinter.Tk
+        The application whose main loop is watched.
+    workers : util_workers.WorkerService, optional
+        Runs the watchdog thread and stops it when the application
+        exits.  The default is a plain daemon thread.
+    interval : float, optional
+        Seconds between heartbeats.  The default is 0.1.
+    threshold : float, optional
+        A heartbeat this many seconds late is a stall and the main
+        thread's stack is captured.  The default is 0.25.
+    keep : int, optional
+        The number of stalls kept with their stacks.  The default is
+        20.
+
+    histogram counts the late heartbeats per bucket of BUCKETS, stalls
+    holds the captured stalls, dictionaries of start (time.time()),
+    duration (seconds, None while the stall lasts) and stack (text).
+    """
+
+    def __init__(self, app, workers=None, interval=0.1, threshold=0.25,
+                 keep=20):
+        self.app = app
+        self.workers = workers
+        self.interval = interval
+        self.threshold = threshold
+        self.histogram = [0] * len(BUCKETS)
+        self.beats = 0
+        self.stalls = deque(maxlen=keep)
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._main = None
+        self._beat = None
+        self._stall = None
+
+    def start(self):
+        """Start the heartbeat and the watchdog, from the main thread."""
+        self._main = threading.get_ident()
+        self._beat = time.perf_counter()
+        self.app.after(int(self.interval * 1000), self._heartbeat)
+        if self.workers is not None:
+            self.workers.on_stop(self.stop)
+            self.workers.spawn(self._watch, name='stall watchdog')
+        else:
+            threading.Thread(target=self._watch, daemon=True,
+                             name='stall watchdog').start()
+
+    def stop(self):
+        """Stop the watchdog, the next heartbeat is the last."""
+        self._stopped.set()
+
+    def _heartbeat(self):
+        """Note how late this beat ran and schedule the next."""
+        now = time.perf_counter()
+        with self._lock:
+            late = now - self._beat - self.interval
+            self._beat = now
+            stall, self._stall = self._stall, None
+        self.beats += 1
+        if late >= BUCKETS[0]:
+            self.histogram[bisect_right(BUCKETS, late) - 1] += 1
+        if stall is not None:
+            stall['duration'] = late
+            log.warning("The main loop stalled for %.0f ms in:\n%s",
+                        late * 1e3, stall['stack'])
+        if not self._stopped.is_set():
+            self.app.after(int(self.interval * 1000), self._heartbeat)
+
+    def _watch(self):
+        """Capture the main thread's stack when the heartbeat is late."""
+        while not self._stopped.wait(self.interval / 2):
+            with self._lock:
+                late = time.perf_counter() - self._beat - self.interval
+                if late < self.threshold or self._stall is not None:
+                    continue
+                frame = sys._current_frames().get(self._main)
+                stack = ''.join(traceback.format_stack(frame)) \
+                    if frame is not None else ''
+                # The frame holds the main thread's locals, drop it.
+                del frame
+                self._stall = {'start': time.time() - late,
+                               'duration': None, 'stack': stack}
+                self.stalls.append(self._stall)
+
+    def report(self, frames=6):
+        """
+        Return the histogram and the longest stalls as lines of text.
+
+        Parameters
+        ----------
+        frames : int, optional
+            The innermost stack frames shown of each stall.  The
+            default is 6.
+
+        """
+        lines = [f"{self.beats} heartbeats, "
+                 f"{sum(self.histogram)} late by {BUCKETS[0] * 1e3:.0f} ms "
+                 f"or more"]
+        for i, count in enumerate(self.histogram):
+            upper = (f"{BUCKETS[i + 1] * 1e3:6.0f} ms"
+                     if i + 1 < len(BUCKETS) else '     more')
+            lines.append(f"  {BUCKETS[i] * 1e3:6.0f} ms - {upper} "
+                         f"{count:6d}")
+        stalls = sorted((s for s in list(self.stalls) if s['duration']),
+                        key=lambda s: -s['duration'])
+        for stall in stalls:
+            when = time.strftime('%H:%M:%S', time.localtime(stall['start']))
+            lines.append(f"Stall of {stall['duration'] * 1e3:.0f} ms at "
+                         f"{when}:")
+            # format_stack gives two lines per frame, innermost last.
+            lines.extend(stall['stack'].rstrip('\n').split('\n')
+                         [-2 * frames:])
+        return lines
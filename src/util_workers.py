@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+A service that owns every background thread and pool of the reader.
+
+The drive monitor, the library indexers and the page decoders run in
+the background.  They are started through one WorkerService so the
+application can stop all of them quickly when it exits:
+ -- threads check service.stopping, or sleep with service.wait(), and
+    return when the service stops,
+ -- functions registered with on_stop() wake threads blocked in
+    something else, such as the MountWatcher poll,
+ -- pools are shut down without waiting and their queued work is
+    cancelled, and
+ -- threads are joined with a bounded timeout, so a thread stuck on a
+    slow CD can not hold the window open.
+Threads still running after the timeout are daemons and end with the
+process.  Files they were writing are safe if they were written with
+atomic_write(), which only replaces the target once the new file is
+complete.
+
+Created on Wed Jan 21 15:50:12 2026.
+
+@author: Bob
+"""
+import os
+import threading
+import time
+
+
+class WorkerService:
+    """
+    Start, track and stop background threads and pools.
+
+    shutdown_time holds the seconds the last shutdown() took, and
+    stragglers the names of threads that had not stopped by then.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+        self._pools = {}
+        self._on_stop = []
+        self.shutdown_time = None
+        self.stragglers = []
+
+    @property
+    def stopping(self):
+        """Return True once shutdown() has been called."""
+        return self._stop.is_set()
+
+    def wait(self, timeout):
+        """
+        Sleep up to timeout seconds, or until the service stops.
+
+        Returns
+        -------
+        bool
+            True if the service is stopping.
+
+        """
+        return self._stop.wait(timeout)
+
+    def spawn(self, target, *args, name=None):
+        """
+        Start target(*args) in a background thread.
+
+        target should return soon after stopping becomes True.
+
+        Returns
+        -------
+        threading.Thread
+
+        """
+        if self.stopping:
+            raise RuntimeError("The worker service has been shut down.")
+        thread = threading.Thread(target=target, args=args, name=name,
+                                  daemon=True)
+        with self._lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            self._threads.append(thread)
+        thread.start()
+        return thread
+
+    def executor(self, name, max_workers=None, processes=False):
+        """
+        Return the pool called name, creating it on first use.
+
+        Parameters
+        ----------
+        name : str
+            The pool name, such as 'indexer' or 'decoder'.
+        max_workers : int, optional
+            The pool size.  The default is the executor's default.
+        processes : bool, optional
+            Use a process pool, for CPU bound work such as JPEG
+            encoding.  The default is a thread pool.
+
+        Returns
+        -------
+        concurrent.futures.Executor
+
+        """
+        with self._lock:
+            pool = self._pools.get(name)
+            if pool is None:
+                if self.stopping:
+                    raise RuntimeError(
+                        "The worker service has been shut down.")
+                # concurrent.futures is imported with the first pool.
+                from concurrent.futures import (ProcessPoolExecutor,
+                                                ThreadPoolExecutor)
+                if processes:
+                    pool = ProcessPoolExecutor(max_workers=max_workers)
+                else:
+                    pool = ThreadPoolExecutor(max_workers=max_workers,
+                                              thread_name_prefix=name)
+                self._pools[name] = pool
+            return pool
+
+    def on_stop(self, callback):
+        """Call callback() when the service stops, to wake a thread."""
+        with self._lock:
+            self._on_stop.append(callback)
+
+    def shutdown(self, timeout=0.1):
+        """
+        Stop every thread and pool.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            The total seconds to wait for threads to finish.  The
+            default is 0.1.
+
+        Returns
+        -------
+        list
+            The names of threads still running after timeout.
+
+        """
+        start = time.perf_counter()
+        self._stop.set()
+        with self._lock:
+            callbacks, self._on_stop = self._on_stop, []
+            pools, self._pools = list(self._pools.values()), {}
+            threads = list(self._threads)
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+        for pool in pools:
+            pool.shutdown(wait=False, cancel_futures=True)
+        deadline = start + timeout
+        current = threading.current_thread()
+        for thread in threads:
+            if thread is not current:
+                thread.join(max(0.0, deadline - time.perf_counter()))
+        self.stragglers = [t.name for t in threads if t.is_alive()]
+        self.shutdown_time = time.perf_counter() - start
+        return self.stragglers
+
+
+def atomic_write(path, data):
+    """
+    Write data to path so that readers never see a partial file.
+
+    The data is written to a temporary file in the same folder, which
+    then replaces path in one step.
+
+    Parameters
+    ----------
+    path : str or Path
+        The file to write.
+    data : bytes or str
+        The new contents.
+
+    Returns
+    -------
+    None.
+
+    """
+    import tempfile
+    folder = os.path.dirname(os.path.abspath(path))
+    mode = 'wb' if isinstance(data, (bytes, bytearray, memoryview)) else 'w'
+    fd, tmp = tempfile.mkstemp(dir=folder, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, mode) as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""
+Test setup, the modules are run from src as the reader runs them.
+
+Tests marked slow, such as the performance gate and the soak test,
+only run with --slow.
+
+Created on Mon Oct 19 10:12:40 2026.
+
+@author: Bob
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'src'))
+
+
+def pytest_addoption(parser):
+    parser.addoption('--slow', action='store_true',
+                     help="run the slow tests too")
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', "slow: a slow test, run with --slow")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption('--slow'):
+        return
+    skip = pytest.mark.skip(reason="slow, run with --slow")
+    for item in items:
+        if 'slow' in item.keywords:
+            item.add_marker(skip)
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the ngs-batch jobs and their journal.
+
+Created on Mon Oct 19 11:02:17 2026.
+
+@author: Bob
+"""
+import glob
+import json
+import os
+
+from PIL import Image
+
+import ngs_batch
+import ngs_fixture
+
+
+def _disc(tmp_path, name='cd', year=1973):
+    return ngs_fixture.make_disc(str(tmp_path / name), year, year,
+                                 months=2, pages=4, ads=0, size=(110, 150))
+
+
+def test_failed_page_does_not_stop_the_job(tmp_path):
+    """A page that fails is journaled, the others are done, status 1."""
+    disc = _disc(tmp_path)
+    pages = sorted(glob.glob(os.path.join(disc, 'IMAGES', '*', '*.JPG')))
+    with open(pages[1], 'wb') as f:
+        f.write(b'not a JPEG')
+    out = str(tmp_path / 'thumbs')
+    assert ngs_batch.main(['thumbs', disc, '-o', out, '-j', '2']) == 1
+    thumbs = glob.glob(os.path.join(out, '*', '*', '*.jpg'))
+    assert len(thumbs) == len(pages) - 1
+    journal = ngs_batch.journal_path('thumbs', disc, out)
+    with open(journal) as f:
+        entries = [json.loads(line) for line in f]
+    assert [e['key'] for e in entries if 'error' in e] == [pages[1]]
+
+
+def test_changed_arguments_are_not_resumed(tmp_path):
+    """Thumbnails of another --size are made again, not kept."""
+    disc = _disc(tmp_path)
+    out = str(tmp_path / 'thumbs')
+    assert ngs_batch.main(['thumbs', disc, '-o', out, '-j', '1']) == 0
+    assert ngs_batch.main(['thumbs', disc, '-o', out, '-j', '1',
+                           '--size', '64']) == 0
+    for thumb in glob.glob(os.path.join(out, '*', '*', '*.jpg')):
+        with Image.open(thumb) as image:
+            assert max(image.size) <= 64
+
+
+def _pages(out):
+    """Return the page count printed by stats."""
+    return int(out.split('pages:')[1].split()[0])
+
+
+def test_results_are_only_of_this_run(tmp_path, monkeypatch, capsys):
+    """Two sources counted in one folder each report their own pages."""
+    monkeypatch.chdir(tmp_path)
+    discs = [_disc(tmp_path, 'cd1', 1973), _disc(tmp_path, 'cd2', 1974)]
+    pages = len(glob.glob(os.path.join(discs[0], '**', '*.JPG'),
+                          recursive=True))
+    for disc in discs:
+        assert ngs_batch.main(['stats', disc, '-j', '1']) == 0
+        assert _pages(capsys.readouterr().out) == pages
+    # A journal given twice holds both sources, each run reports its own.
+    journal = str(tmp_path / 'shared.journal')
+    for disc in discs:
+        assert ngs_batch.main(['stats', disc, '-j', '1',
+                               '--journal', journal]) == 0
+        assert _pages(capsys.readouterr().out) == pages
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the cancellation tokens of util_cancel and their users.
+
+Created on Mon Oct 19 16:31:46 2026.
+
+@author: Bob
+"""
+import pytest
+
+import ngs_fixture
+import util_library
+from util_cancel import Cancelled, CancelToken, Generations
+from util_files import build_page_list
+from util_io import BACKGROUND, PageIOEngine
+from util_library import MagazineLibrary
+from util_monitors import TkDispatcher
+
+
+class _App:
+    """Stands in for a Tk app, without a display."""
+
+    tk = None
+
+    def bind(self, sequence, func):
+        pass
+
+    def event_generate(self, sequence, when=None):
+        pass
+
+
+def test_generations_cancel_their_tokens():
+    """A magazine change cancels page work, a volume change all work."""
+    generations = Generations()
+    issue = generations.token()
+    volume = generations.token('volume')
+    assert not issue.cancelled and not volume.cancelled
+    generations.new_issue()
+    assert issue.cancelled and not volume.cancelled
+    with pytest.raises(Cancelled):
+        issue.check()
+    volume.check()
+    current = generations.token()
+    generations.new_volume()
+    assert volume.cancelled and current.cancelled
+    assert not CancelToken.never().cancelled
+    with pytest.raises(ValueError):
+        generations.token('page')
+
+
+def test_superseded_result_is_dropped():
+    """A result of a magazine left behind never reaches the UI."""
+    generations = Generations()
+    dispatcher = TkDispatcher(_App())
+    shown = []
+    dispatcher.post(shown.append, 'old', token=generations.token())
+    generations.new_issue()
+    dispatcher.post(shown.append, 'new', token=generations.token())
+    dispatcher._run()
+    assert shown == ['new']
+    assert dispatcher.stats['dropped'] == 1
+
+
+def test_cancelled_work_stops(tmp_path, monkeypatch):
+    """Listing, scanning and queued reads stop on a cancelled token."""
+    monkeypatch.setattr(util_library, 'open_images', lambda: [])
+    ngs_fixture.make_disc(str(tmp_path), 1973, 1973, months=1, pages=2,
+                          ads=0, size=(40, 60))
+    generations = Generations()
+    token = generations.token('volume')
+    generations.new_volume()
+    with pytest.raises(Cancelled):
+        build_page_list(tmp_path / 'NGS_1973_1973' / 'IMAGES' / '273A',
+                        token=token)
+    library = MagazineLibrary(roots=[str(tmp_path)], drives=False)
+    with pytest.raises(Cancelled):
+        library.scan(token)
+    assert library.index == {} and library.volumes == []
+    engine = PageIOEngine()
+    future = engine.submit(tmp_path, len, b'page', priority=BACKGROUND,
+                           token=token)
+    with pytest.raises(Cancelled):
+        future.result(5)
+    assert engine.stats['dropped'][BACKGROUND] == 1
+    engine.close()
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the page read scheduler, util_io.
+
+Created on Mon Oct 19 14:15:26 2026.
+
+@author: Bob
+"""
+import threading
+import time
+
+import pytest
+
+import util_io
+from util_cancel import Cancelled
+from util_io import BACKGROUND, VISIBLE, PageIOEngine
+
+
+def _fail():
+    raise OSError("unreadable")
+
+
+def test_engine_counts_and_closes(tmp_path, monkeypatch):
+    """Failed reads are not done, the device cache is bounded."""
+    monkeypatch.setattr(util_io, 'DEVICE_CACHE', 4)
+    engine = PageIOEngine()
+    for i in range(10):
+        assert engine.run(tmp_path / f"{i}" / 'page.jpg', len, b'page') == 4
+    with pytest.raises(OSError):
+        engine.run(tmp_path / 'page.jpg', _fail)
+    assert engine.stats['done'][VISIBLE] == 10
+    assert engine.stats['failed'][VISIBLE] == 1
+    assert len(engine._devices) == 4
+    engine.close()
+    with pytest.raises(RuntimeError):
+        engine.submit(tmp_path / 'page.jpg', len, b'page')
+
+
+def test_visible_read_goes_first_one_read_at_a_time(monkeypatch):
+    """On a CD the page turned to is read before queued background work."""
+    monkeypatch.setattr(util_io, 'device_of', lambda path: ('cd', 'optical'))
+    engine = PageIOEngine()
+    started = threading.Event()
+    release = threading.Event()
+    lock = threading.Lock()
+    order = []
+    running = [0, 0]
+
+    def read(name):
+        with lock:
+            running[0] += 1
+            running[1] = max(running)
+        if name == 'first':
+            started.set()
+            release.wait(5)
+        else:
+            time.sleep(0.01)
+        with lock:
+            running[0] -= 1
+            order.append(name)
+
+    futures = [engine.submit('page', read, 'first', priority=BACKGROUND)]
+    assert started.wait(5)
+    futures += [engine.submit('page', read, f"background {i}",
+                              priority=BACKGROUND) for i in range(3)]
+    futures.append(engine.submit('page', read, 'visible'))
+    release.set()
+    for future in futures:
+        future.result(5)
+    engine.close()
+    assert order == ['first', 'visible', 'background 0', 'background 1',
+                     'background 2']
+    assert running[1] == 1
+
+
+def test_close_cancels_queued_reads(monkeypatch):
+    """Reads running or queued at close() raise Cancelled."""
+    monkeypatch.setattr(util_io, 'device_of', lambda path: ('cd', 'optical'))
+    engine = PageIOEngine()
+    started = threading.Event()
+    futures = [engine.submit('page', lambda: started.set() or time.sleep(1),
+                             priority=BACKGROUND)]
+    assert started.wait(5)
+    futures += [engine.submit('page', len, b'page', then=len)
+                for i in range(3)]
+    engine.close()
+    for future in futures:
+        with pytest.raises(Cancelled):
+            future.result(5)
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the ISO9660 reader of util_iso, on images made by write_iso.
+
+Created on Mon Oct 19 15:02:37 2026.
+
+@author: Bob
+"""
+import pytest
+
+from util_files import build_magazine_index, build_page_list
+from util_iso import IsoPath, as_path, close_image, open_image, write_iso
+
+LABEL = 'NGS_1973_1973'
+# {folder: [(page, bytes)]} of the fixture CD.
+FOLDERS = {
+    '273A': [('273AC01A.JPG', b'cover'), ('273A0001.JPG', b'page one'),
+             ('273A0002.JPG', b'\xff\xd8' + bytes(range(256)) * 20)],
+    '273B': [('273BC01A.JPG', b'cover of february'),
+             ('273B0001.JPG', b'x' * 5000)],
+    }
+
+
+@pytest.fixture
+def image(tmp_path):
+    root = tmp_path / LABEL
+    for folder, pages in FOLDERS.items():
+        (root / 'IMAGES' / folder).mkdir(parents=True)
+        for name, data in pages:
+            (root / 'IMAGES' / folder / name).write_bytes(data)
+    path = tmp_path / (LABEL + '.iso')
+    write_iso(root, path, LABEL)
+    yield open_image(path)
+    close_image(path)
+
+
+def test_label_and_directory_index(image):
+    """The label and every folder of the path table are read."""
+    assert image.label == LABEL
+    images = image.lookup('/IMAGES')
+    assert images.is_dir()
+    assert sorted(c.name for c in images.iterdir()) == sorted(FOLDERS)
+    index = build_magazine_index(f"{image.path}::/IMAGES", [1973])
+    assert len(index[1973]) == 2
+    assert index[1973]['February'].name == '273B'
+
+
+def test_page_list_and_page_bytes(image):
+    """Pages are listed cover first and read back as written."""
+    for folder, pages in FOLDERS.items():
+        page_list = build_page_list(f"{image.path}::/IMAGES/{folder}")
+        assert [p.name for p in page_list] == [name for name, _ in pages]
+        for page, (name, data) in zip(page_list, pages):
+            assert isinstance(page, IsoPath)
+            assert page.stat_size() == len(data)
+            assert bytes(page.read_bytes()) == data
+            with page.open() as f:
+                assert f.read() == data
+            # A page path passes through the menus as a string.
+            assert bytes(as_path(str(page)).read_bytes()) == data
+
+
+def test_missing_path(image):
+    """A path not in the image raises FileNotFoundError."""
+    with pytest.raises(FileNotFoundError):
+        image.lookup('/IMAGES/273C')
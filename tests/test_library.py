@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the merged magazine library of util_library.
+
+Created on Mon Oct 19 16:05:12 2026.
+
+@author: Bob
+"""
+import os
+import shutil
+
+import pytest
+
+import ngs_fixture
+import util_library
+from util_library import MagazineLibrary
+
+
+def _disc(root, first, last, iso=False):
+    """Write a copied CD, or only the CD image with iso."""
+    path = ngs_fixture.make_disc(str(root), first, last, months=2, pages=2,
+                                 ads=0, size=(40, 60), iso=iso)
+    if iso:
+        shutil.rmtree(os.path.splitext(path)[0])
+    return path
+
+
+@pytest.fixture
+def root(tmp_path, monkeypatch):
+    """A library folder, without the images opened by other tests."""
+    monkeypatch.setattr(util_library, 'open_images', lambda: [])
+    return tmp_path / 'library'
+
+
+def _library(root):
+    library = MagazineLibrary(roots=[str(root)], drives=False, jobs=2)
+    library.scan()
+    return library
+
+
+def test_volumes_are_merged_in_date_order(root):
+    """Magazines of a copied CD and a CD image form one index."""
+    _disc(root, 1974, 1974, iso=True)
+    _disc(root, 1973, 1973)
+    library = _library(root)
+    assert [v.label for v in library.volumes] == ['NGS_1973_1973',
+                                                  'NGS_1974_1974']
+    assert list(library.index) == [1973, 1974]
+    assert library.date_range == ['1973', '1974']
+    for yr, mo, path in library.issues():
+        volume = library.sources[(yr, mo)]
+        assert volume.label == f"NGS_{yr}_{yr}"
+        assert str(path).startswith(volume.images_path)
+        assert library.page_list(path)[0].name.endswith('C01A.JPG')
+
+
+def test_a_magazine_on_two_volumes_is_listed_once(root):
+    """The first volume found serves a magazine on two volumes."""
+    _disc(root, 1973, 1973)
+    shutil.copytree(root / 'NGS_1973_1973', root / 'NGS_1973_COPY')
+    library = _library(root)
+    assert len(library.volumes) == 2
+    assert len(list(library.issues())) == 2
+    assert {v.label for v in library.sources.values()} == {'NGS_1973_1973'}
+
+
+def test_rescan_follows_added_and_removed_volumes(root):
+    """A rescan adds and drops volumes, keeping the pages that stayed."""
+    _disc(root, 1973, 1973)
+    iso = _disc(root, 1974, 1974, iso=True)
+    library = _library(root)
+    kept = next(iter(library.index[1973].values()))
+    gone = next(iter(library.index[1974].values()))
+    pages = library.page_list(kept)
+    library.page_list(gone)
+    library.decoder.decode(pages[0])
+
+    os.remove(iso)
+    _disc(root, 1975, 1975)
+    library.scan()
+    assert list(library.index) == [1973, 1975]
+    assert [v.label for v in library.volumes] == ['NGS_1973_1973',
+                                                  'NGS_1975_1975']
+    assert str(gone) not in library._page_lists
+    # The volume that stayed is not listed or decoded again.
+    assert library.page_list(kept) is pages
+    assert library.decoder.cached(pages[0])
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the mount watcher of util_monitors.
+
+Created on Mon Oct 19 13:10:44 2026.
+
+@author: Bob
+"""
+import os
+import threading
+
+import pytest
+
+import util_monitors
+from util_monitors import (LIBRARY_CHANGED, MountWatcher, TkDispatcher,
+                           cdrom_drawer_monitor)
+from util_volumes import Volume
+
+FDS = '/proc/self/fd'
+
+
+@pytest.mark.skipif(not os.path.isdir(FDS), reason="needs /proc")
+def test_close_wakes_wait_and_closes_descriptors():
+    """close() wakes a thread in wait() and leaves no descriptor open."""
+    before = len(os.listdir(FDS))
+    watcher = MountWatcher()
+    if not watcher.active:
+        pytest.skip("no mount events on this system")
+    result = []
+    thread = threading.Thread(target=lambda: result.append(watcher.wait(30)))
+    thread.start()
+    while not watcher._waiting:
+        thread.join(0.01)
+    watcher.close()
+    thread.join(5)
+    assert result == [MountWatcher.STOPPED]
+    assert watcher.wait(1) == MountWatcher.STOPPED
+    assert len(os.listdir(FDS)) == before
+
+
+class _App:
+    """Stands in for a Tk app, without a display."""
+
+    def __init__(self):
+        self.tk = object()
+        self.events = 0
+        self.reported = []
+
+    def bind(self, sequence, func):
+        pass
+
+    def event_generate(self, sequence, when=None):
+        self.events += 1
+
+    def report_callback_exception(self, exc, val, tb):
+        self.reported.append(exc)
+
+
+def test_dispatcher_reports_a_failing_callback_and_keeps_draining():
+    """An exception is reported and the rest of the batch still runs."""
+    app = _App()
+    dispatcher = TkDispatcher(app)
+    ran = []
+    dispatcher.post(ran.append, 1)
+    dispatcher.post(lambda: 1 / 0)
+    dispatcher.post(ran.append, 2)
+    assert app.events == 1
+    dispatcher._run()
+    assert ran == [1, 2]
+    assert app.reported == [ZeroDivisionError]
+
+
+def test_dispatcher_drops_posts_after_close():
+    """post() after close() returns quietly and nothing runs."""
+    app = _App()
+    dispatcher = TkDispatcher(app)
+    ran = []
+    dispatcher.post(ran.append, 1)
+    dispatcher.close()
+    dispatcher.post(ran.append, 2)
+    dispatcher._run()
+    assert ran == []
+    assert app.events == 1
+
+
+class _Watcher:
+    """Stands in for a MountWatcher."""
+
+    active = False
+    timeout = 1
+
+    def __init__(self):
+        self.listeners = []
+
+    def close(self):
+        pass
+
+
+def test_library_changes_only_with_the_ngs_volumes(tmp_path, monkeypatch):
+    """A second NGS volume changes the library, a USB stick does not."""
+    volumes = [Volume('/dev/sr0', '/media/cd', 'NGS_1973_1976', 'iso9660')]
+    monkeypatch.setattr(util_monitors, 'list_volumes', lambda: volumes)
+    app = _App()
+    monitor = cdrom_drawer_monitor(app, _Watcher(), TkDispatcher(app))
+    monitor.path = str(tmp_path)
+    assert monitor._cd_state(rescan=True)
+    volumes.append(Volume('/dev/sdb1', '/media/usb', 'STICK', 'vfat'))
+    assert not monitor._cd_state(rescan=True)
+    volumes.append(Volume('/dev/sr1', '/media/cd1', 'NGS_1977_1980',
+                          'iso9660'))
+    assert monitor._cd_state(rescan=True)
+    assert not monitor._cd_state(rescan=True)
+    events = []
+    while not monitor.queue.empty():
+        events.append(monitor.queue.get())
+    assert events == [True, LIBRARY_CHANGED]
+    monitor.workers.shutdown()
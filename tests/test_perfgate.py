@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the performance regression gate, ngs_perfgate.
+
+Created on Mon Oct 19 10:20:05 2026.
+
+@author: Bob
+"""
+import copy
+import json
+
+import pytest
+
+import ngs_perfgate
+
+
+def _result(runs, reference):
+    return {'runs': runs, 'reference': reference, 'peak_bytes': 1000}
+
+
+def _baseline():
+    with open(ngs_perfgate.BASELINE) as f:
+        return json.load(f)
+
+
+def test_compare_relative_to_the_machine():
+    """A run slowed down as a whole is not a regression, 3x is."""
+    old = {'results': {'op': _result([1.0, 1.1, 0.9, 1.0, 1.2],
+                                     [1.0, 1.1, 0.9, 1.0, 1.2])}}
+    busy = {'op': _result([2.0, 2.2, 1.8, 2.0, 2.4],
+                          [2.0, 2.2, 1.8, 2.0, 2.4])}
+    slower = {'op': _result([3.0, 3.3, 2.7, 3.0, 3.6],
+                            [1.0, 1.1, 0.9, 1.0, 1.2])}
+    assert ngs_perfgate.compare(busy, old)[1] == []
+    assert ngs_perfgate.compare(slower, old)[1] == ['op']
+
+
+def test_stored_baseline_covers_every_operation():
+    """The committed baseline is of today's fixture and operations."""
+    baseline = _baseline()
+    assert baseline['fixture'] == json.loads(json.dumps(
+        ngs_perfgate.FIXTURE))
+    names = ['build_magazine_index', 'build_page_list', 'decode_dir_name',
+             'group_by_decade']
+    names += [f"decode_{w}x{h}" for w, h in ngs_perfgate.DECODE_SIZES]
+    assert sorted(baseline['results']) == sorted(names)
+    for result in baseline['results'].values():
+        assert len(result['runs']) == len(result['reference']) >= 5
+
+
+def test_stored_baseline_catches_a_slow_down():
+    """Runs 3x slower than the stored baseline fail, the same runs pass."""
+    baseline = _baseline()
+    same = copy.deepcopy(baseline['results'])
+    assert ngs_perfgate.compare(same, baseline)[1] == []
+    slower = copy.deepcopy(baseline['results'])
+    slower['build_page_list']['runs'] = [
+        t * 3 for t in slower['build_page_list']['runs']]
+    assert ngs_perfgate.compare(slower, baseline)[1] == ['build_page_list']
+
+
+@pytest.mark.slow
+def test_gate_passes_against_the_stored_baseline():
+    """The code as committed is not slower than the stored baseline."""
+    baseline = _baseline()
+    machine = ngs_perfgate._machine()
+    if any(baseline[key] != machine[key]
+           for key in ('python', 'machine', 'cpus')):
+        pytest.skip("the baseline was made on another machine, record "
+                    "one with ngs_perfgate.py --update")
+    assert ngs_perfgate.main([]) == 0
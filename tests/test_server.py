@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the HTTP page server, ngs_server.
+
+Created on Mon Oct 19 14:48:13 2026.
+
+@author: Bob
+"""
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+import ngs_fixture
+from ngs_batch import open_source
+from ngs_server import make_server
+
+
+@pytest.fixture
+def server(tmp_path):
+    disc = ngs_fixture.make_disc(str(tmp_path), 1973, 1973, months=1,
+                                 pages=2, ads=0, size=(110, 150))
+    server = make_server(open_source(disc), port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    yield f"http://{host}:{port}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize('width', ['abc', '0', '5000'])
+def test_bad_width_is_a_bad_request(server, width):
+    """A malformed or out of range width is answered with 400."""
+    with pytest.raises(urllib.error.HTTPError) as error:
+        urllib.request.urlopen(f"{server}/pages/1973/1/0.jpg?width={width}")
+    assert error.value.code == 400
+
+
+def test_width_is_a_rendition(server):
+    """A valid width is answered with a rendition."""
+    with urllib.request.urlopen(
+            f"{server}/pages/1973/1/0.jpg?width=50") as answer:
+        assert answer.status == 200
+        assert answer.headers['Content-Type'] == 'image/jpeg'
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the saved session, util_session.
+
+Created on Mon Oct 19 13:42:09 2026.
+
+@author: Bob
+"""
+from util_library import LibraryVolume
+from util_session import load_session, save_session, saved_page
+
+
+def test_page_is_only_restored_from_the_saved_volume(tmp_path):
+    """The saved page reopens on the saved disc, the cover on another."""
+    index = {1973: {'January': '/cd/IMAGES/273A'}}
+    save_session(index, 1973, 'January', 42, '/cd/IMAGES/273A',
+                 ['NGS_1973_1976'], folder=str(tmp_path))
+    session = load_session(str(tmp_path))
+    same = LibraryVolume('NGS_1973_1976', '/cd/IMAGES', ['1973', '1976'],
+                         'drive')
+    other = LibraryVolume('NGS_1970_1979', '/cd/IMAGES', ['1970', '1979'],
+                          'drive')
+    assert saved_page(session, {(1973, 'January'): same}) == 42
+    assert saved_page(session, {(1973, 'January'): other}) == 0
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the memory soak test, ngs_soak.
+
+Created on Mon Oct 19 11:40:52 2026.
+
+@author: Bob
+"""
+import pytest
+
+import ngs_soak
+from util_memory import probe
+from util_trace import tracer
+
+
+def test_short_soak_stays_bounded():
+    """A soak much shorter than the tracer's ring buffer passes."""
+    assert ngs_soak.main(['--turns', '300', '--no-window']) == 0
+    assert tracer.enabled
+
+
+def test_soaks_are_measured_on_their_own():
+    """A second soak in the process does not count the first's turns."""
+    assert ngs_soak.main(['--turns', '200', '--no-window']) == 0
+    first = probe.growth['page_turn'][0]
+    assert ngs_soak.main(['--turns', '200', '--no-window']) == 0
+    assert probe.growth['page_turn'][0] == first
+    assert all(n >= 0 for n in probe.live.values())
+
+
+@pytest.mark.slow
+def test_soak_of_10000_turns_stays_bounded():
+    """Turning 10,000 pages leaves the memory bounded, the full soak."""
+    assert ngs_soak.main(['--turns', '10000', '--no-window']) == 0
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the reader's startup time, util_startup.
+
+Created on Mon Oct 19 12:05:31 2026.
+
+@author: Bob
+"""
+import os
+import sys
+
+import pytest
+
+import util_startup
+
+
+@pytest.mark.skipif(sys.platform.startswith('linux')
+                    and not os.environ.get('DISPLAY'),
+                    reason="the reader needs a display")
+def test_first_window_within_budget():
+    """The reader's first window appears within 2 seconds."""
+    ok, seconds = util_startup.check_startup_budget(2.0)
+    assert ok, f"first window after {seconds:.3f}s, budget 2.000s"
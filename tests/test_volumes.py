@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the volume discovery of util_volumes.
+
+Created on Mon Oct 19 15:48:21 2026.
+
+@author: Bob
+"""
+import pytest
+
+import util_volumes
+from util_iso import write_iso
+
+MOUNTINFO = (
+    "22 1 8:1 / / rw,relatime shared:1 - ext4 /dev/sda1 rw\n"
+    "23 22 0:5 / /proc rw shared:2 - proc proc rw\n"
+    "40 22 11:0 / /media/bob/NGS_1973_1976 ro shared:3 - iso9660 "
+    "/dev/sr0 ro\n"
+    "41 22 8:2 /copies /mnt/My\\040CDs rw shared:4 - ext4 /dev/sda2 rw\n"
+    "42 22 8:3 / /mnt/Björk\\134CDs rw - ext4 /dev/sda3 rw\n"
+    "broken line\n")
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    """Start and end each test with empty volume and label caches."""
+    monkeypatch.setattr(util_volumes, '_volumes', None)
+    monkeypatch.setattr(util_volumes, '_labels', {})
+
+
+def test_read_mountinfo(tmp_path):
+    """Mounts are parsed with their escapes, broken lines skipped."""
+    path = tmp_path / 'mountinfo'
+    path.write_text(MOUNTINFO, encoding='utf-8')
+    mounts = util_volumes._read_mountinfo(str(path))
+    assert mounts[2] == ('/dev/sr0', '/media/bob/NGS_1973_1976', 'iso9660',
+                         '/')
+    assert mounts[3] == ('/dev/sda2', '/mnt/My CDs', 'ext4', '/copies')
+    # The kernel escapes spaces and backslashes, not UTF-8 names.
+    assert mounts[4][1] == '/mnt/Björk\\CDs'
+    assert len(mounts) == 5
+
+
+def test_read_pvd_label(tmp_path):
+    """The label of an ISO image is read from its volume descriptor."""
+    (tmp_path / 'cd' / 'IMAGES').mkdir(parents=True)
+    write_iso(tmp_path / 'cd', tmp_path / 'cd.iso', 'NGS_1973_1976')
+    assert util_volumes.read_pvd_label(str(tmp_path / 'cd.iso')) == \
+        'NGS_1973_1976'
+    (tmp_path / 'other').write_bytes(bytes(40000))
+    assert util_volumes.read_pvd_label(str(tmp_path / 'other')) == ''
+    assert util_volumes.read_pvd_label(str(tmp_path / 'missing')) == ''
+
+
+def test_volume_list_is_cached_until_invalidated(cache, monkeypatch):
+    """The volumes are listed once per mount event."""
+    calls = []
+    volume = util_volumes.Volume('/dev/sr0', '/media/cd', 'NGS_1973_1976',
+                                 'iso9660')
+    monkeypatch.setattr(util_volumes.sys, 'platform', 'linux')
+    monkeypatch.setattr(util_volumes, '_linux_volumes',
+                        lambda: calls.append(1) or [volume])
+    assert util_volumes.list_volumes() == [volume]
+    assert util_volumes.list_volumes() == [volume]
+    assert len(calls) == 1
+    assert util_volumes.find_volume('NGS') == volume
+    assert util_volumes.find_volume('XYZ') is None
+    util_volumes.invalidate_volume_cache()
+    util_volumes.list_volumes()
+    assert len(calls) == 2
+
+
+def test_label_is_read_once_per_volume(cache, tmp_path):
+    """A label is read again only when the volume root changed."""
+    reads = []
+
+    def read_label():
+        reads.append(1)
+        return 'NGS_1973_1976'
+    mount = str(tmp_path)
+    for i in range(3):
+        assert util_volumes._cached_label('/dev/sr0', mount,
+                                          read_label) == 'NGS_1973_1976'
+    assert len(reads) == 1
+    assert util_volumes._cached_label('/dev/sr0', mount + '/gone',
+                                      read_label) == ''
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the WorkerService and atomic_write of util_workers.
+
+Created on Mon Oct 19 16:52:09 2026.
+
+@author: Bob
+"""
+import os
+import threading
+import time
+
+import pytest
+
+import util_workers
+from util_workers import WorkerService, atomic_write
+
+
+def test_shutdown_stops_threads_and_runs_on_stop():
+    """Waiting threads wake, on_stop hooks run, threads are joined."""
+    service = WorkerService()
+    woken = threading.Event()
+    calls = []
+    threads = [service.spawn(service.wait, 30, name=f"sleeper {i}")
+               for i in range(3)]
+
+    def blocked():
+        # Blocked in something else than service.wait().
+        woken.wait(30)
+        calls.append('blocked')
+    service.spawn(blocked, name='blocked')
+    service.on_stop(lambda: 1 / 0)
+    service.on_stop(woken.set)
+    assert service.shutdown(timeout=5) == []
+    assert service.stopping
+    assert calls == ['blocked']
+    assert not any(thread.is_alive() for thread in threads)
+    assert service.shutdown_time < 5
+    with pytest.raises(RuntimeError):
+        service.spawn(time.sleep, 0)
+    with pytest.raises(RuntimeError):
+        service.executor('decoder')
+
+
+def test_shutdown_is_bounded_by_its_timeout():
+    """A thread that does not stop is reported, not waited for."""
+    service = WorkerService()
+    release = threading.Event()
+    thread = service.spawn(release.wait, 30, name='stuck')
+    pool = service.executor('indexer', 1)
+    pool.submit(release.wait, 30)
+    queued = pool.submit(time.sleep, 0)
+    start = time.perf_counter()
+    assert service.shutdown(timeout=0.1) == ['stuck']
+    assert time.perf_counter() - start < 2
+    assert queued.cancelled()
+    release.set()
+    thread.join(5)
+
+
+def test_atomic_write(tmp_path, monkeypatch):
+    """The file is replaced whole, or left as it was."""
+    path = tmp_path / 'index.json'
+    atomic_write(path, '{"a": 1}')
+    assert path.read_text() == '{"a": 1}'
+    atomic_write(str(path), b'{"b": 2}')
+    assert path.read_bytes() == b'{"b": 2}'
+
+    def fail(src, dst):
+        raise OSError("disk full")
+    monkeypatch.setattr(util_workers.os, 'replace', fail)
+    with pytest.raises(OSError):
+        atomic_write(path, 'partial')
+    assert path.read_bytes() == b'{"b": 2}'
+    assert os.listdir(tmp_path) == ['index.json']